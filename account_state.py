@@ -0,0 +1,134 @@
+import time
+import logging
+import threading
+
+# ---------------------------------------------------------------------
+# 계좌 상태 캐시
+# get_balances() 결과(잔고 / 주문 중 수량 / 평단가)를 메모리에 들고,
+# - 일정 주기(max_age)가 지나면 다음 조회 때 새로 받고
+# - 우리가 주문을 넣으면 바로 무효화해서 다음 조회에서 체결 결과를 반영한다.
+# 전략 코드는 upbit.get_balances() / get_balance() 대신 여기서 읽는다. (인증 API 호출 절약)
+# ---------------------------------------------------------------------
+ACCOUNT_MAX_AGE = 10  # 주문이 없을 때 잔고를 다시 받는 주기(초)
+ORDER_SETTLE = 3      # 주문 후 체결이 잔고에 반영될 때까지 짧은 주기로 다시 받는 시간(초)
+SETTLE_MAX_AGE = 0.5  # 위 구간 동안의 갱신 주기(초)
+
+
+def _currency(ticker):
+    """'KRW-ETH' 또는 'ETH' -> 'ETH' (pyupbit.Upbit.get_balance 와 같은 규칙)"""
+    return ticker.split("-")[1] if "-" in ticker else ticker
+
+
+class AccountState:
+    def __init__(self, upbit, max_age=ACCOUNT_MAX_AGE):
+        self.upbit = upbit
+        self.max_age = max_age
+        self.stats = {"refresh": 0, "hit": 0}
+        self._raw = []
+        self._by_currency = {}
+        self._updated_at = None
+        self._settle_until = 0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 갱신
+    # ------------------------------------------------------------------
+    def refresh(self):
+        """인증 API 로 잔고를 새로 받아온다 (실패하면 이전 값을 유지하고 예외 전파)"""
+        with self._lock:
+            balances = self.upbit.get_balances()
+            if not isinstance(balances, list):
+                # 인증 실패 등은 dict(error) 로 돌아온다
+                raise RuntimeError(f"잔고 조회 실패: {balances}")
+            self._raw = balances
+            self._by_currency = {
+                b['currency']: {
+                    "balance": float(b['balance'] or 0),
+                    "locked": float(b['locked'] or 0),
+                    "avg_buy_price": float(b['avg_buy_price'] or 0),
+                }
+                for b in balances
+            }
+            self._updated_at = time.time()
+            self.stats["refresh"] += 1
+        return self
+
+    def invalidate(self, settle=0):
+        """다음 조회 때 새로 받도록 표시
+
+        settle: 이후 몇 초 동안은 SETTLE_MAX_AGE 주기로 갱신 (시장가 주문 체결 대기)
+        """
+        with self._lock:
+            self._updated_at = None
+            self._settle_until = max(self._settle_until, time.time() + settle)
+
+    def _ensure(self, max_age=None):
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if time.time() < self._settle_until:
+                max_age = min(max_age, SETTLE_MAX_AGE)
+            if self._updated_at is None or time.time() - self._updated_at > max_age:
+                self.refresh()
+            else:
+                self.stats["hit"] += 1
+
+    def age(self):
+        """마지막 갱신 후 지난 시간(초), 받은 적이 없으면 None"""
+        return None if self._updated_at is None else time.time() - self._updated_at
+
+    # ------------------------------------------------------------------
+    # 조회 (캐시)
+    # ------------------------------------------------------------------
+    def balances(self, max_age=None):
+        """upbit.get_balances() 와 같은 모양의 목록 (quotes.calc_wealth 등에 그대로 사용)"""
+        self._ensure(max_age)
+        return self._raw
+
+    def balance(self, ticker, max_age=None):
+        """주문 가능 수량 (upbit.get_balance 대체)"""
+        self._ensure(max_age)
+        return self._by_currency.get(_currency(ticker), {}).get("balance", 0.0)
+
+    def total(self, ticker, max_age=None):
+        """보유 수량 (주문 중으로 묶인 수량 포함)"""
+        self._ensure(max_age)
+        entry = self._by_currency.get(_currency(ticker), {})
+        return entry.get("balance", 0.0) + entry.get("locked", 0.0)
+
+    def avg_buy_price(self, ticker, max_age=None):
+        self._ensure(max_age)
+        return self._by_currency.get(_currency(ticker), {}).get("avg_buy_price", 0.0)
+
+    def coin_balances(self, max_age=None):
+        """{'KRW-ETH': 보유 수량(locked 포함), ...} (KRW 제외)"""
+        self._ensure(max_age)
+        return {f"KRW-{c}": e["balance"] + e["locked"] for c, e in self._by_currency.items() if c != "KRW"}
+
+    def avg_buy_prices(self, max_age=None):
+        self._ensure(max_age)
+        return {f"KRW-{c}": e["avg_buy_price"] for c, e in self._by_currency.items() if c != "KRW"}
+
+    # ------------------------------------------------------------------
+    # 주문 (실행 후 잔고 무효화)
+    # ------------------------------------------------------------------
+    def _order(self, name, *args, **kwargs):
+        try:
+            return getattr(self.upbit, name)(*args, **kwargs)
+        finally:
+            self.invalidate(settle=ORDER_SETTLE)
+            logging.debug(f"[Account] {name}{args} -> 잔고 무효화")
+
+    def buy_market_order(self, ticker, price, *args, **kwargs):
+        return self._order("buy_market_order", ticker, price, *args, **kwargs)
+
+    def sell_market_order(self, ticker, volume, *args, **kwargs):
+        return self._order("sell_market_order", ticker, volume, *args, **kwargs)
+
+    def buy_limit_order(self, ticker, price, volume, *args, **kwargs):
+        return self._order("buy_limit_order", ticker, price, volume, *args, **kwargs)
+
+    def sell_limit_order(self, ticker, price, volume, *args, **kwargs):
+        return self._order("sell_limit_order", ticker, price, volume, *args, **kwargs)
+
+    def cancel_order(self, uuid, *args, **kwargs):
+        return self._order("cancel_order", uuid, *args, **kwargs)
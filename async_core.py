@@ -0,0 +1,254 @@
+import json
+import uuid
+import asyncio
+import logging
+import threading
+import functools
+import quotes
+import metrics
+
+# ---------------------------------------------------------------------
+# asyncio 이벤트 기반 매매 코어
+# - 가격 피드(PriceFeed)가 시세 스냅샷을 밀어주면, 종목별 작업이 바로 깨어나 전략을 평가한다.
+# - pyupbit 호출처럼 블로킹인 함수는 스레드 풀에서 돌리므로 느린 요청 하나가 다른 종목을 막지 않는다.
+# - 종목별로 "가장 최신 값" 슬롯만 두어, 처리 중에 들어온 오래된 가격은 쌓이지 않고 덮어쓴다.
+# ---------------------------------------------------------------------
+POLL_INTERVAL = 0.5  # REST 폴링 주기(초)
+
+
+async def call(fn, *args):
+    """코루틴이면 await, 일반 함수면 스레드 풀에서 실행"""
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args))
+
+
+class PriceFeed:
+    """가격 피드 인터페이스: snapshots() 가 QuoteSnapshot 을 계속 내보낸다
+
+    tickers_fn 은 매번 구독할 종목 목록을 돌려준다 (보유 종목이 바뀔 수 있으므로).
+    """
+
+    async def snapshots(self, tickers_fn):
+        raise NotImplementedError
+        yield
+
+
+class RestPollingFeed(PriceFeed):
+    """REST 일괄 조회(quotes.fetch_quotes)를 일정 주기로 반복"""
+
+    def __init__(self, interval=POLL_INTERVAL, source="trade"):
+        self.interval = interval
+        self.source = source
+
+    async def snapshots(self, tickers_fn):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            snapshot = await call(quotes.fetch_quotes, tickers_fn(), self.source)
+            yield snapshot
+            # 요청 시간과 관계없이 주기를 일정하게 유지 (밀렸으면 바로 다음 요청)
+            deadline = max(deadline + self.interval, loop.time())
+            await asyncio.sleep(deadline - loop.time())
+
+
+class UpbitWebSocketFeed(PriceFeed):
+    """업비트 웹소켓 ticker 스트림 (체결될 때마다 푸시)"""
+
+    URL = "wss://api.upbit.com/websocket/v1"
+
+    def __init__(self, reconnect_delay=3):
+        self.reconnect_delay = reconnect_delay
+
+    async def snapshots(self, tickers_fn):
+        import websockets  # pyupbit 의존성으로 함께 설치됨
+        prices = {}
+        while True:
+            codes = sorted(set(tickers_fn()))
+            try:
+                async with websockets.connect(self.URL, ping_interval=60) as ws:
+                    await ws.send(json.dumps([{"ticket": str(uuid.uuid4())}, {"type": "ticker", "codes": codes}]))
+                    while sorted(set(tickers_fn())) == codes:
+                        msg = json.loads(await ws.recv())
+                        prices[msg['code']] = msg['trade_price']
+                        yield quotes.QuoteSnapshot(dict(prices))
+            except Exception as e:
+                logging.error(f"[Feed] 웹소켓 연결 오류: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+
+
+class ReplayFeed(PriceFeed):
+    """미리 준비한 스냅샷(또는 {ticker: price} dict) 목록을 차례로 내보내는 피드"""
+
+    def __init__(self, snapshots, interval=0.0):
+        self.items = snapshots
+        self.interval = interval
+
+    async def snapshots(self, tickers_fn):
+        for item in self.items:
+            yield item if isinstance(item, quotes.QuoteSnapshot) else quotes.QuoteSnapshot(item)
+            await asyncio.sleep(self.interval)
+
+
+class _Latest:
+    """가장 최신 값 하나만 보관하는 슬롯"""
+
+    def __init__(self):
+        self.value = None
+        self.event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, value):
+        if self.event.is_set():
+            self.dropped += 1  # 아직 처리 못한 이전 값은 버린다
+        self.value = value
+        self.event.set()
+
+    async def get(self):
+        await self.event.wait()
+        self.event.clear()
+        return self.value
+
+
+class AsyncTradingCore:
+    """피드 -> (포트폴리오 판단, 종목별 판단) 을 동시에 돌리는 실행기
+
+    on_snapshot(snapshot):        스냅샷마다 한 번 (자산 계산, 9시 리셋, 시장 상태 등)
+    on_price(ticker, price, snapshot): 종목 가격이 들어올 때마다 (진입/익절/손절)
+    extra_tickers():              감시 종목 외에 시세가 필요한 종목 (보유 종목, KRW-BTC 등)
+    notifier(message):            알림 전송 함수 (백그라운드에서 순서대로 실행)
+    """
+
+    def __init__(self, tickers, feed=None, on_price=None, on_snapshot=None, extra_tickers=None, notifier=None):
+        self.tickers = list(tickers)
+        self.feed = feed or RestPollingFeed()
+        self.on_price = on_price
+        self.on_snapshot = on_snapshot
+        self.extra_tickers = extra_tickers
+        self.notifier = notifier
+        self.jobs = []
+        self.snapshot = None
+        self.stats = {"snapshots": 0, "evaluations": 0, "errors": 0}
+        self._loop = None
+        self._stop = None
+        self._slots = {}
+        self._notify_queue = None
+        self._busy = 0
+
+    def add_job(self, fn, interval, name=None):
+        """interval 초마다 fn 실행 (계좌 갱신 등)"""
+        self.jobs.append((fn, interval, name or getattr(fn, "__name__", "job")))
+
+    def notify(self, message):
+        """트레이딩 경로를 막지 않는 알림 (다른 스레드에서 불러도 됨)"""
+        if self._loop is None or self.notifier is None:
+            if self.notifier is not None:
+                self.notifier(message)
+            return
+        self._loop.call_soon_threadsafe(self._notify_queue.put_nowait, message)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def _watch_list(self):
+        extra = self.extra_tickers() if self.extra_tickers else []
+        return list(dict.fromkeys(self.tickers + list(extra)))
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._notify_queue = asyncio.Queue()
+        self._slots = {t: _Latest() for t in self.tickers}
+        self._slots["*"] = _Latest()
+
+        tasks = [asyncio.ensure_future(self._pump())]
+        tasks += [asyncio.ensure_future(self._ticker_worker(t)) for t in self.tickers]
+        tasks.append(asyncio.ensure_future(self._snapshot_worker()))
+        tasks += [asyncio.ensure_future(self._job_worker(*job)) for job in self.jobs]
+        tasks.append(asyncio.ensure_future(self._notify_worker()))
+        stop = asyncio.ensure_future(self._stop.wait())
+        tasks.append(stop)
+        try:
+            await asyncio.wait([stop, tasks[0]], return_when=asyncio.FIRST_COMPLETED)
+            # 피드가 끝났으면(리플레이 등) 남은 평가를 마저 처리하고 종료
+            while not self._stop.is_set() and (self._busy or any(s.event.is_set() for s in self._slots.values())):
+                await asyncio.sleep(0.01)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._drain_notifications()
+
+    async def _pump(self):
+        """피드 -> 슬롯 분배"""
+        async for snapshot in self.feed.snapshots(self._watch_list):
+            self.snapshot = snapshot
+            self.stats["snapshots"] += 1
+            self._slots["*"].put(snapshot)
+            for ticker in self.tickers:
+                if ticker in snapshot:
+                    self._slots[ticker].put(snapshot)
+
+    async def _snapshot_worker(self):
+        while True:
+            snapshot = await self._slots["*"].get()
+            if self.on_snapshot is not None:
+                with metrics.timer("evaluate", target="portfolio"):
+                    await self._guard("snapshot", self.on_snapshot, snapshot)
+
+    async def _ticker_worker(self, ticker):
+        slot = self._slots[ticker]
+        while True:
+            snapshot = await slot.get()
+            if self.on_price is not None:
+                self.stats["evaluations"] += 1
+                # 시세를 받은 뒤 판단을 시작하기까지 걸린 시간 (처리가 밀리면 커진다)
+                metrics.since("quote_age", snapshot.ts)
+                with metrics.timer("evaluate", target=ticker):
+                    await self._guard(ticker, self.on_price, ticker, snapshot.get(ticker), snapshot)
+
+    async def _job_worker(self, fn, interval, name):
+        while True:
+            started = self._loop.time()
+            await self._guard(name, fn)
+            await asyncio.sleep(max(0.0, interval - (self._loop.time() - started)))
+
+    async def _notify_worker(self):
+        while True:
+            message = await self._notify_queue.get()
+            await self._guard("notify", self.notifier, message)
+
+    async def _drain_notifications(self):
+        while self._notify_queue is not None and not self._notify_queue.empty():
+            await self._guard("notify", self.notifier, self._notify_queue.get_nowait())
+
+    async def _guard(self, name, fn, *args):
+        self._busy += 1
+        try:
+            return await call(fn, *args)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.error(f"[Core] {name} 처리 오류: {e}")
+            # 같은 오류가 폭주하지 않도록 잠깐 쉰다
+            await asyncio.sleep(1)
+        finally:
+            self._busy -= 1
+
+    def dropped(self):
+        """처리 전에 최신 값으로 덮어써진 스냅샷 수 (종목별)"""
+        return {t: s.dropped for t, s in self._slots.items()}
+
+
+def run(core):
+    """블로킹 진입점 (Ctrl+C 로 종료)"""
+    try:
+        asyncio.run(core.run())
+    except KeyboardInterrupt:
+        logging.info("[Core] 종료")
+
+
+# 여러 종목 스레드에서 동시에 주문 판단을 할 때 잔고를 나눠 쓰지 않도록 쓰는 잠금
+order_lock = threading.Lock()
+
@@ -1,29 +1,110 @@
-import pyupbit
+import time
+import argparse
 import numpy as np
+import candle_store
+import backtest_engine as engine
 
-# OHLCV(open, high, low, close, volume)로 당일 시가, 고가, 저가, 종가, 거래량 데이터 추출
-df = pyupbit.get_ohlcv("KRW-BTC", count=30)
 
-# 변동폭 출력 > (고가 - 저가) * k값
-df['range'] = (df['high'] - df['low']) * 0.5
+def volatility_breakout(df, k=0.5):
+    """일봉 변동성 돌파 백테스트 (종가 청산)"""
+    # 변동폭 출력 > (고가 - 저가) * k값
+    df['range'] = (df['high'] - df['low']) * k
 
-# 매수가 변동폭 > 시가 + 변동폭
-df['target'] = df['open'] + df['range'].shift(1)
+    # 매수가 변동폭 > 시가 + 변동폭
+    df['target'] = df['open'] + df['range'].shift(1)
 
-# ror(수익률), np.where(조건문, 참일때 값, 거짓일때 값)
-df['ror'] = np.where(df['high'] > df['target'],
-                     df['close'] / df['target'],
-                     1)
+    # ror(수익률), np.where(조건문, 참일때 값, 거짓일때 값)
+    df['ror'] = np.where(df['high'] > df['target'],
+                         df['close'] / df['target'],
+                         1)
 
-# 누적 수익률(hpr) > ror의 곱
-df['hpr'] = df['ror'].cumprod()
+    # 누적 수익률(hpr) > ror의 곱
+    df['hpr'] = df['ror'].cumprod()
 
-# Draw Down 계산 (고점 대비 낙폭)
-df['dd'] = (df['hpr'].cummax() - df['hpr']) / df['hpr'].cummax() * 100
+    # Draw Down 계산 (고점 대비 낙폭)
+    df['dd'] = (df['hpr'].cummax() - df['hpr']) / df['hpr'].cummax() * 100
+    return df
 
-# MDD 계산
-print("MDD(%): ", df['dd'].max())
 
-# 엑셀 출력
-df.to_excel("dd.xlsx")
-print("Backtest completed. Check dd.xlsx for results.")
+def run_daily(args):
+    # OHLCV(open, high, low, close, volume)로 당일 시가, 고가, 저가, 종가, 거래량 데이터 추출
+    store = candle_store.default_store()
+    count = args.count or 30
+    store.ensure(args.tickers[0], "day", count)
+    if args.sync:
+        store.sync(args.tickers[0], "day", count)
+    df = store.frame(args.tickers[0], "day", last=count)
+    df = volatility_breakout(df, args.k)
+
+    # MDD 계산
+    print("MDD(%): ", df['dd'].max())
+
+    # 결과 출력 (기본 parquet, --out dd.xlsx 로 엑셀 출력 가능)
+    path = candle_store.export_frame(df, args.out)
+    print(f"Backtest completed. Check {path} for results.")
+
+
+def run_strategy(args):
+    """봇 전략(bot ~ bot4)을 분봉 히스토리로 재현"""
+    strategy = engine.make_strategy(args.strategy, **dict(args.param or []))
+    interval = args.interval or strategy.interval
+    count = args.count or args.days * 1440 // engine.interval_minutes(interval)
+
+    t0 = time.perf_counter()
+    datasets = {t: engine.load_candles(t, interval, count, sync=args.sync) for t in args.tickers}
+    ref = None
+    if strategy.needs_ref:
+        ref = datasets.get("KRW-BTC") or engine.load_candles("KRW-BTC", interval, count, sync=args.sync)
+    intrabar = None
+    if args.intrabar and interval != "minute1":
+        # 결정 봉과 같은 기간의 분봉 — 익절/손절이 닿은 봉만 분봉으로 내려가 순서와 체결가를 정한다
+        minutes = count * engine.interval_minutes(interval)
+        intrabar = {t: engine.load_candles(t, "minute1", minutes, sync=args.sync) for t in args.tickers}
+    t1 = time.perf_counter()
+    results = engine.run_many(strategy, datasets, ref=ref, intrabar=intrabar)
+    t2 = time.perf_counter()
+
+    print(f"{'Ticker':<12} | {'Return(%)':>10} | {'MDD(%)':>8} | {'Trades':>6} | {'Win':>6} | {'Fees':>10}")
+    print("-" * 68)
+    for ticker, result in results.items():
+        s = result.summary()
+        print(f"{ticker:<12} | {s['return_pct']:>10.2f} | {s['mdd_pct']:>8.2f} | {s['trades']:>6} | "
+              f"{s['win_rate'] * 100:>5.1f}% | {s['fees']:>10,.0f}")
+    if intrabar:
+        stats = [r.intrabar for r in results.values()]
+        print(f"\n분봉 판정 {sum(s['resolved'] for s in stats)}건 (같은 분봉 동시 도달 {sum(s['same_minute'] for s in stats)}건, "
+              f"분봉 없음 {sum(s['missing'] for s in stats)}건)")
+    print(f"\n{strategy} | load {t1 - t0:.2f}s | backtest {t2 - t1:.3f}s")
+    return results
+
+
+def parse_param(text):
+    key, value = text.split("=", 1)
+    return key, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업비트 전략 백테스트")
+    parser.add_argument("--strategy", default="daily", choices=["daily", *engine.STRATEGIES],
+                        help="daily: 일봉 변동성 돌파 / bot ~ bot4: 각 봇 규칙")
+    parser.add_argument("--tickers", nargs="+", default=["KRW-BTC"])
+    parser.add_argument("--interval", help="봉 간격 (기본: 전략별 설정)")
+    parser.add_argument("--count", type=int, help="캔들 개수 (기본: --days 만큼)")
+    parser.add_argument("--days", type=int, default=365, help="전략 모드 백테스트 기간(일)")
+    parser.add_argument("--k", type=float, default=0.5, help="daily 모드 K 값")
+    parser.add_argument("--out", default="dd.parquet", help="daily 모드 결과 파일 (.parquet / .npz / .csv / .xlsx)")
+    parser.add_argument("--sync", action="store_true", help="로컬 캔들 저장소를 최신 구간까지 갱신 (기본: 모자랄 때만 조회)")
+    parser.add_argument("--param", type=parse_param, action="append",
+                        help="전략 파라미터 덮어쓰기 (예: --param tp=0.02)")
+    parser.add_argument("--intrabar", action="store_true",
+                        help="익절/손절 순서와 체결가를 결정 봉 안의 1분봉으로 판정")
+    args = parser.parse_args()
+
+    if args.strategy == "daily":
+        run_daily(args)
+    else:
+        run_strategy(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+import numpy as np
+import indicators
+import candle_store
+
+# ---------------------------------------------------------------------
+# 벡터화 백테스트 엔진
+# 각 봇의 진입/청산 규칙을 Strategy 로 정의하고, 지표/신호는 NumPy 배열로 한 번에 계산한다.
+# 포지션 추적은 "봉 단위"가 아니라 "거래 단위"로 돌며, 청산 시점은 구간 배열에서
+# argmax 로 첫 도달 지점을 찾는다. (거래 수만큼만 파이썬 루프를 돈다)
+# ---------------------------------------------------------------------
+UPBIT_FEE = 0.0005      # 업비트 KRW 마켓 거래 수수료 (매수/매도 각각)
+INITIAL_CASH = 1_000_000
+SCAN_CHUNK = 256        # 첫 도달 탐색 시작 구간 길이 (못 찾으면 4배씩 늘린다)
+SESSION_OFFSET = np.timedelta64(9, 'h')  # 업비트 일봉 기준 09:00 KST
+
+TRADE_DTYPE = np.dtype([
+    ('entry_ts', 'datetime64[ns]'),
+    ('exit_ts', 'datetime64[ns]'),
+    ('avg_price', 'f8'),
+    ('exit_price', 'f8'),
+    ('qty', 'f8'),
+    ('cost', 'f8'),
+    ('pnl', 'f8'),
+    ('ret', 'f8'),
+    ('fee', 'f8'),
+    ('steps', 'i4'),
+    ('reason', 'U8'),
+])
+
+
+def interval_minutes(interval):
+    """봉 간격 문자열 -> 분 ("minute15" -> 15, "day" -> 1440)"""
+    if interval.startswith("minute"):
+        return int(interval[len("minute"):])
+    return {"day": 1440, "week": 10080}[interval]
+
+
+def from_frame(df):
+    """pyupbit.get_ohlcv DataFrame -> 컬럼별 NumPy 배열 dict"""
+    return {
+        "ts": df.index.values.astype('datetime64[ns]'),
+        "open": df['open'].to_numpy(dtype=np.float64),
+        "high": df['high'].to_numpy(dtype=np.float64),
+        "low": df['low'].to_numpy(dtype=np.float64),
+        "close": df['close'].to_numpy(dtype=np.float64),
+        "volume": df['volume'].to_numpy(dtype=np.float64),
+    }
+
+
+def load_candles(ticker, interval="minute1", count=200, store=None, sync=False):
+    """로컬 캔들 저장소에서 최근 count 개를 배열 dict(memmap 뷰)로 반환
+
+    저장된 봉이 모자랄 때만 업비트에서 받아온다. sync=True 면 최신 구간도 이어 받는다.
+    """
+    store = store or candle_store.default_store()
+    if sync:
+        store.sync(ticker, interval, count)
+    data = store.ensure(ticker, interval, count)
+    if data is None or not len(data['close']):
+        raise ValueError(f"{ticker} {interval} 캔들 조회 실패")
+    return data
+
+
+# ---------------------------------------------------------------------
+# 공통 배열 헬퍼
+# ---------------------------------------------------------------------
+def session_ids(ts):
+    """09:00 KST 기준 거래일 번호"""
+    return (ts - SESSION_OFFSET).astype('datetime64[D]').astype(np.int64)
+
+
+def session_edges(ts):
+    """(세션 첫 봉 여부, 세션 마지막 봉 여부)"""
+    sid = session_ids(ts)
+    change = np.empty(len(ts), dtype=bool)
+    change[:1] = True
+    change[1:] = sid[1:] != sid[:-1]
+    last = np.empty(len(ts), dtype=bool)
+    last[:-1] = change[1:]
+    last[-1:] = True
+    return change, last
+
+
+def forming_ma(ts, close, period, unit='h'):
+    """상위 봉(기본 60분봉) 이동평균 — 진행 중인 상위 봉의 종가는 현재 close 로 대체
+
+    봇이 get_ohlcv(interval="minute60") 의 마지막 값(진행 중인 봉 포함)으로
+    rolling(period).mean() 을 계산하는 것과 같은 값.
+    """
+    n = len(close)
+    group = ts.astype(f'datetime64[{unit}]')
+    new = np.empty(n, dtype=bool)
+    new[:1] = True
+    new[1:] = group[1:] != group[:-1]
+    gid = np.cumsum(new) - 1
+    group_close = close[np.r_[np.flatnonzero(new)[1:] - 1, n - 1]]
+    csum = np.r_[0.0, np.cumsum(group_close)]
+    lo = gid - (period - 1)
+    prev_sum = csum[gid] - csum[np.maximum(lo, 0)]
+    ma = (prev_sum + close) / period
+    ma[lo < 0] = np.nan
+    return ma
+
+
+def align(src_ts, values, ts):
+    """src_ts 기준 배열을 ts 시점으로 맞춘다 (각 시점 이전의 마지막 값)"""
+    pos = np.searchsorted(src_ts, ts, side='right') - 1
+    out = values[np.maximum(pos, 0)].astype(np.float64)
+    out[pos < 0] = np.nan
+    return out
+
+
+def feature(data, name, fn, *args):
+    """파라미터와 무관한 지표 배열을 data 안에 캐시 (파라미터 스윕 시 재계산 방지)"""
+    cache = data.setdefault("_features", {})
+    if name not in cache:
+        cache[name] = fn(*args)
+    return cache[name]
+
+
+def hysteresis_state(price, ma, buffer, initial=0):
+    """ma 대비 buffer 이상 벗어났을 때만 상태를 바꾼다 (1=BULL, 0=BEAR)"""
+    code = np.full(len(price), -1, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        code[price > ma * (1 + buffer)] = 1
+        code[price < ma * (1 - buffer)] = 0
+    if len(code) and code[0] < 0:
+        code[0] = initial
+    idx = np.where(code >= 0, np.arange(len(code)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    return code[idx]
+
+
+# ---------------------------------------------------------------------
+# 전략 정의
+# signals() 는 아래 키를 가진 dict 를 돌려준다. (모두 길이 n 배열, 생략 가능)
+#   entry        : 진입 신호 (bool)
+#   entry_price  : 진입 체결가 (없으면 close)
+#   tp_mult      : 익절 기준 = 평단가 * tp_mult
+#   sl_mult      : 손절 기준 = 평단가 * sl_mult
+#   exit         : 종가 청산 신호 (bool)
+#   settle       : 세션 정산 시점 (bool), settle_price 로 평가
+#   dca          : 추가 매수 조건 (bool, 가격 조건은 dca_mult 로 따로 평가)
+# ---------------------------------------------------------------------
+class Strategy:
+    """백테스트용 전략 정의"""
+
+    name = ""
+    interval = "minute15"
+    defaults = {}
+    size = 0.3               # 진입 시 현금 대비 투입 비중
+    reentry_block = ()       # 이 사유로 청산되면 당일(세션) 재진입 금지
+    settle_min = None        # 정산 시점에 청산할 최소 수익률 (None 이면 무조건)
+    dca_mult = None          # 추가 매수 가격 조건 = 평단가 * dca_mult
+    dca_size = 1.0           # 추가 매수 금액 = 기존 매수 금액 * dca_size
+    dca_cash_cap = 0.95      # 추가 매수 금액 상한 = 현금 * dca_cash_cap
+    sl_after_dca_only = False
+    needs_ref = False        # 기준 종목(KRW-BTC) 데이터 필요 여부
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"{self.name}: 알 수 없는 파라미터 {sorted(unknown)}")
+        self.params = {**self.defaults, **params}
+
+    def signals(self, data, ref=None):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.params})"
+
+
+class VolatilityBreakout(Strategy):
+    """bot.py: 변동성 돌파 + MA2 필터, 익절 1.5% / 손절 2%, 세션 종료 시 청산"""
+
+    name = "bot"
+    interval = "minute1"
+    defaults = {"k": 0.5, "tp": 0.015, "sl": 0.02}
+    size = 0.3 * 0.9995
+    reentry_block = ("tp", "sl")
+
+    def signals(self, data, ref=None):
+        p = self.params
+        ts, o, h, l, c = data['ts'], data['open'], data['high'], data['low'], data['close']
+        first, last = session_edges(ts)
+        sid = np.cumsum(first) - 1
+        starts = np.flatnonzero(first)
+        ends = np.flatnonzero(last)
+
+        # 세션별 고가/저가/시가/종가 -> 전일 기준 목표가와 MA2
+        s_high = np.maximum.reduceat(h, starts)
+        s_low = np.minimum.reduceat(l, starts)
+        s_open = o[starts]
+        s_close = c[ends]
+        prev_close = np.r_[np.nan, s_close[:-1]]
+        prev_range = np.r_[np.nan, (s_high - s_low)[:-1]]
+        target = (prev_close + prev_range * p['k'])[sid]
+        ma2 = ((prev_close + s_open) / 2)[sid]
+
+        entry_price = np.maximum(o, target)
+        with np.errstate(invalid='ignore'):
+            entry = (h > target) & (entry_price > ma2) & ~last
+        return {
+            "entry": entry,
+            "entry_price": entry_price,
+            "tp_mult": 1 + p['tp'],
+            "sl_mult": 1 - p['sl'],
+            "settle": last,
+            "settle_price": c,
+        }
+
+
+class RsiBollinger(Strategy):
+    """bot2.py: RSI + 볼린저 밴드 하단 진입, 익절 1.5% 또는 RSI 과열, 손절 1.5%"""
+
+    name = "bot2"
+    interval = "minute15"
+    defaults = {"rsi_buy": 35, "rsi_sell": 65, "band_margin": 1.01, "tp": 0.015, "sl": 0.015}
+    size = 0.3 * 0.9995
+
+    def signals(self, data, ref=None):
+        p = self.params
+        c = data['close']
+        rsi = feature(data, "rsi14_199", indicators.rsi_array, c, 14, 199)
+        ma, std = feature(data, "bb20", indicators.rolling_mean_std, c, 20)
+        with np.errstate(invalid='ignore'):
+            entry = (rsi <= p['rsi_buy']) & (c <= (ma - std * 2) * p['band_margin'])
+            exit_ = rsi >= p['rsi_sell']
+        return {
+            "entry": entry,
+            "tp_mult": 1 + p['tp'],
+            "sl_mult": 1 - p['sl'],
+            "exit": exit_,
+        }
+
+
+class SmartDca(Strategy):
+    """bot3.py: 하락장 필터 + 과매도 1차 진입, -3% & RSI 재과매도 시 2차 매수, 동적 익절, 2차 후 -5% 손절"""
+
+    name = "bot3"
+    interval = "minute15"
+    defaults = {
+        "rsi_buy": 35, "rsi_dca": 40, "band_margin": 1.005, "bw_mult": 0.7,
+        "tp_min": 1.2, "tp_max": 3.5, "dca_drop": 0.03, "sl": 0.05,
+    }
+    size = 0.2 * 0.9995
+    sl_after_dca_only = True
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.dca_mult = 1 - self.params['dca_drop']
+
+    def signals(self, data, ref=None):
+        p = self.params
+        ts, c = data['ts'], data['close']
+        rsi = feature(data, "rsi14_99", indicators.rsi_array, c, 14, 99)
+        ma, std = feature(data, "bb20", indicators.rolling_mean_std, c, 20)
+        upper, lower = ma + std * 2, ma - std * 2
+        bandwidth = (upper - lower) / ma * 100
+        dynamic_target = np.clip(bandwidth * p['bw_mult'], p['tp_min'], p['tp_max'])
+        ma20_60 = feature(data, "ma20_60", forming_ma, ts, c, 20)
+        with np.errstate(invalid='ignore'):
+            falling = c < ma20_60
+            entry = ((rsi <= p['rsi_buy']) | (c <= lower * p['band_margin'])) & ~falling
+            dca = rsi <= p['rsi_dca']
+        return {
+            "entry": entry,
+            "tp_mult": 1 + np.nan_to_num(dynamic_target, nan=p['tp_max']) / 100,
+            "sl_mult": 1 - p['sl'],
+            "dca": dca,
+        }
+
+
+class SurvivalRegime(Strategy):
+    """bot4.py: BTC 6시간 평균 기준 BULL/BEAR 목표 익절, STRICT_SL 손절, 9시 정산, 익절 종목 당일 재진입 금지"""
+
+    name = "bot4"
+    interval = "minute15"
+    defaults = {
+        "survivor_goal": 0.012, "bull_goal": 0.025, "strict_sl": -0.05, "fee": 0.0011,
+        "rsi_buy": 30, "regime_buffer": 0.002,
+    }
+    size = 0.2
+    reentry_block = ("tp",)
+    needs_ref = True
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        # 9시 정산: 세후 수익률(p_rate - FEE) >= 0 이면 매도
+        self.settle_min = self.params['fee']
+
+    def signals(self, data, ref=None):
+        p = self.params
+        ts, o, c = data['ts'], data['open'], data['close']
+        rsi = feature(data, "rsi14_99", indicators.rsi_array, c, 14, 99)
+        ma, std = feature(data, "bb20", indicators.rolling_mean_std, c, 20)
+        lower = ma - std * 2
+
+        ref = ref if ref is not None else data
+        btc_ma6 = feature(ref, "ma6_60", forming_ma, ref['ts'], ref['close'], 6)
+        btc_close = feature(data, "ref_close", align, ref['ts'], ref['close'], ts)
+        btc_ma6 = feature(data, "ref_ma6_60", align, ref['ts'], btc_ma6, ts)
+        regime = hysteresis_state(btc_close, btc_ma6, p['regime_buffer'])
+        goal = np.where(regime == 1, p['bull_goal'], p['survivor_goal'])
+
+        first, _ = session_edges(ts)
+        with np.errstate(invalid='ignore'):
+            entry = (rsi <= p['rsi_buy']) | (c <= lower)
+        return {
+            "entry": entry,
+            "tp_mult": 1 + goal + p['fee'],
+            "sl_mult": 1 + p['strict_sl'] + p['fee'],
+            "settle": first,
+            "settle_price": o,
+            "regime": regime,
+        }
+
+
+STRATEGIES = {cls.name: cls for cls in (VolatilityBreakout, RsiBollinger, SmartDca, SurvivalRegime)}
+
+
+def make_strategy(name, **params):
+    if name not in STRATEGIES:
+        raise ValueError(f"알 수 없는 전략: {name} (가능: {', '.join(STRATEGIES)})")
+    return STRATEGIES[name](**params)
+
+
+# ---------------------------------------------------------------------
+# 시뮬레이션
+# ---------------------------------------------------------------------
+class BacktestResult:
+    """백테스트 결과: 자산 곡선, 거래 목록, 요약 지표"""
+
+    def __init__(self, name, ticker, ts, equity, trades, initial, intrabar=None):
+        self.name = name
+        self.ticker = ticker
+        self.ts = ts
+        self.equity = equity
+        self.trades = trades
+        self.initial = initial
+        self.intrabar = intrabar  # 분봉 판정 통계 (IntrabarResolver.stats, 분봉 모드가 아니면 None)
+
+    @property
+    def total_return(self):
+        return self.equity[-1] / self.initial - 1 if len(self.equity) else 0.0
+
+    @property
+    def mdd(self):
+        """최대 낙폭(%)"""
+        if not len(self.equity):
+            return 0.0
+        peak = np.maximum.accumulate(self.equity)
+        return float(((peak - self.equity) / peak).max() * 100)
+
+    @property
+    def win_rate(self):
+        return float((self.trades['pnl'] > 0).mean()) if len(self.trades) else 0.0
+
+    @property
+    def fees(self):
+        return float(self.trades['fee'].sum())
+
+    def summary(self):
+        return {
+            "strategy": self.name,
+            "ticker": self.ticker,
+            "return_pct": self.total_return * 100,
+            "mdd_pct": self.mdd,
+            "trades": len(self.trades),
+            "win_rate": self.win_rate,
+            "fees": self.fees,
+        }
+
+
+def _as_array(value, n):
+    if value is None:
+        return None
+    arr = np.asarray(value, dtype=np.float64)
+    return np.broadcast_to(arr, (n,)) if arr.ndim == 0 else arr
+
+
+def _first_hit(start, end, test):
+    """[start, end) 에서 test(a, b) 가 처음 True 인 위치 (-1 이면 없음)"""
+    a, size = start, SCAN_CHUNK
+    while a < end:
+        b = min(end, a + size)
+        hit = test(a, b)
+        if hit.any():
+            return a + int(hit.argmax())
+        a, size = b, size * 4
+    return -1
+
+
+class IntrabarResolver:
+    """결정 봉(예: 15분봉) 안의 분봉으로 익절/손절 중 먼저 닿은 쪽과 체결가 / 체결 시각을 정한다
+
+    minute: 같은 종목의 분봉 배열 dict, bar_ts: 결정 봉 시작 시각 배열.
+    결정 봉 j 는 분봉 [start[j], end[j]) 구간이며 (다음 결정 봉 시작 전까지), 각 분봉의
+    고가/저가를 한 번에 비교해 argmax 로 처음 닿은 분봉을 찾는다.
+    같은 분봉 안에서 둘 다 닿으면 시가가 이미 넘어선 쪽, 그것도 아니면 보수적으로 손절로 본다.
+    """
+
+    def __init__(self, minute, bar_ts):
+        self.ts = minute['ts']
+        self.open, self.high, self.low = minute['open'], minute['high'], minute['low']
+        bar_ts = np.asarray(bar_ts)
+        step = bar_ts[-1] - bar_ts[-2] if len(bar_ts) > 1 else np.timedelta64(1, 'm')
+        self.start = np.searchsorted(self.ts, bar_ts, side='left')
+        self.end = np.searchsorted(self.ts, np.r_[bar_ts[1:], bar_ts[-1:] + step], side='left')
+        self.stats = {"resolved": 0, "same_minute": 0, "missing": 0}
+
+    def __call__(self, j, tp_thr, sl_thr):
+        """(사유, 체결가, 체결 시각) — 결정 봉 안에 분봉이 없거나 닿은 분봉이 없으면 None"""
+        a, b = int(self.start[j]), int(self.end[j])
+        m = b - a
+        kt = _first_true(self.high[a:b] >= tp_thr, m) if tp_thr is not None else m
+        ks = _first_true(self.low[a:b] <= sl_thr, m) if sl_thr is not None else m
+        if kt >= m and ks >= m:
+            self.stats["missing"] += 1
+            return None
+        self.stats["resolved"] += 1
+        if kt == ks:
+            # 한 분봉에서 둘 다 닿음: 시가가 이미 넘어섰으면 그쪽, 아니면 순서를 알 수 없으므로 손절
+            self.stats["same_minute"] += 1
+            k = a + kt
+            if self.open[k] >= tp_thr:
+                return "tp", self.open[k], self.ts[k]
+            return "sl", min(self.open[k], sl_thr), self.ts[k]
+        if ks < kt:
+            k = a + ks
+            return "sl", min(self.open[k], sl_thr), self.ts[k]
+        k = a + kt
+        return "tp", max(self.open[k], tp_thr), self.ts[k]
+
+
+def _first_true(mask, default):
+    return int(mask.argmax()) if mask.any() else default
+
+
+def run_backtest(strategy, data, ref=None, ticker="", initial=INITIAL_CASH, fee_rate=UPBIT_FEE, exit_resolver=None,
+                 intrabar=None):
+    """한 종목에 전략을 적용해 BacktestResult 반환
+
+    같은 봉에서 익절/손절이 모두 닿으면 보수적으로 손절을 먼저 본다.
+    intrabar(같은 종목 분봉 배열 dict)를 주면 익절/손절이 닿은 결정 봉 안을 분봉으로 내려가
+    먼저 닿은 쪽과 체결가 / 체결 시각을 정한다 (IntrabarResolver).
+    exit_resolver(j, tp_thr, sl_thr) -> (사유, 체결가, 시각) | None 을 직접 줄 수도 있다.
+    """
+    ts, o, h, l, c = data['ts'], data['open'], data['high'], data['low'], data['close']
+    n = len(c)
+    if exit_resolver is None and intrabar is not None:
+        exit_resolver = IntrabarResolver(intrabar, ts)
+    sig = strategy.signals(data, ref)
+    entry = np.asarray(sig['entry'], dtype=bool)
+    entry_price = sig.get('entry_price', c)
+    tp_mult = _as_array(sig.get('tp_mult'), n)
+    sl_mult = _as_array(sig.get('sl_mult'), n)
+    exit_sig = sig.get('exit')
+    settle = sig.get('settle')
+    settle_price = sig.get('settle_price', c)
+    dca = sig.get('dca')
+    sid = session_ids(ts)
+
+    # 손절/익절 판단은 가격 / 배수 >= 평단가 꼴로 바꿔 평단가가 바뀌어도 배열을 재사용
+    tp_level = h / tp_mult if tp_mult is not None else None
+    sl_level = l / sl_mult if sl_mult is not None else None
+    settle_level = settle_price / (1 + strategy.settle_min) if strategy.settle_min is not None else None
+    dca_level = c / strategy.dca_mult if strategy.dca_mult is not None else None
+
+    entry_idx = np.flatnonzero(entry)
+    equity = np.empty(n)
+    trades = []
+    cash = float(initial)
+    filled = 0
+    cursor = 0
+
+    while True:
+        exit_ts = None
+        k = np.searchsorted(entry_idx, cursor)
+        if k >= len(entry_idx):
+            break
+        i = int(entry_idx[k])
+        equity[filled:i] = cash
+
+        price = float(entry_price[i])
+        spend = cash * strategy.size
+        qty = spend / (price * (1 + fee_rate))
+        avg, cost, fees, steps = price, spend, spend - qty * price, 1
+        cash -= spend
+        leg_start = i
+        j = i + 1
+
+        while True:
+            use_sl = sl_level is not None and (steps > 1 or not strategy.sl_after_dca_only)
+            can_dca = dca is not None and steps == 1
+
+            def test(a, b, avg=avg, use_sl=use_sl, can_dca=can_dca):
+                hit = np.zeros(b - a, dtype=bool)
+                if tp_level is not None:
+                    hit |= tp_level[a:b] >= avg
+                if use_sl:
+                    hit |= sl_level[a:b] <= avg
+                if exit_sig is not None:
+                    hit |= exit_sig[a:b]
+                if settle is not None:
+                    hit |= settle[a:b] if settle_level is None else settle[a:b] & (settle_level[a:b] >= avg)
+                if can_dca:
+                    hit |= dca[a:b] & (dca_level[a:b] <= avg)
+                return hit
+
+            j = _first_hit(j, n, test)
+            if j < 0:
+                j, reason, exit_price = n - 1, "eod", c[-1]
+                break
+
+            tp_thr = avg * tp_mult[j] if tp_level is not None else None
+            sl_thr = avg * sl_mult[j] if use_sl else None
+            tp_hit = tp_thr is not None and h[j] >= tp_thr
+            sl_hit = sl_thr is not None and l[j] <= sl_thr
+            if (tp_hit or sl_hit) and exit_resolver is not None:
+                resolved = exit_resolver(j, tp_thr if tp_hit else None, sl_thr if sl_hit else None)
+                if resolved is not None:
+                    reason, exit_price, exit_ts = resolved
+                    break
+            if sl_hit:
+                reason, exit_price = "sl", min(o[j], sl_thr)
+                break
+            if tp_hit:
+                reason, exit_price = "tp", max(o[j], tp_thr)
+                break
+            if exit_sig is not None and exit_sig[j]:
+                reason, exit_price = "signal", c[j]
+                break
+            if settle is not None and settle[j] and (settle_level is None or settle_level[j] >= avg):
+                reason, exit_price = "settle", settle_price[j]
+                break
+
+            # 추가 매수 (종가 체결) 후 평단가를 바꿔 이어서 탐색
+            equity[leg_start:j] = cash + qty * c[leg_start:j]
+            add = min(cost * strategy.dca_size, cash * strategy.dca_cash_cap)
+            add_qty = add / (c[j] * (1 + fee_rate))
+            avg = (avg * qty + c[j] * add_qty) / (qty + add_qty)
+            qty += add_qty
+            cost += add
+            fees += add - add_qty * c[j]
+            cash -= add
+            steps += 1
+            leg_start = j
+            j += 1
+            if j >= n:
+                j, reason, exit_price = n - 1, "eod", c[-1]
+                break
+
+        equity[leg_start:j] = cash + qty * c[leg_start:j]
+        proceeds = qty * exit_price * (1 - fee_rate)
+        fees += qty * exit_price * fee_rate
+        cash += proceeds
+        equity[j] = cash
+        filled = j + 1
+        trades.append((ts[i], ts[j] if exit_ts is None else exit_ts, avg, exit_price, qty, cost, proceeds - cost,
+                       proceeds / cost - 1, fees, steps, reason))
+
+        cursor = j + 1
+        if reason in strategy.reentry_block:
+            # 같은 세션에는 다시 들어가지 않는다
+            cursor = max(cursor, int(np.searchsorted(sid, sid[j], side='right')))
+
+    equity[filled:] = cash
+    return BacktestResult(strategy.name, ticker, ts, equity, np.array(trades, dtype=TRADE_DTYPE), initial,
+                          intrabar=getattr(exit_resolver, "stats", None))
+
+
+def run_many(strategy, datasets, ref=None, intrabar=None, **kwargs):
+    """여러 종목에 같은 전략 적용 -> {ticker: BacktestResult} (intrabar: {ticker: 분봉 배열 dict})"""
+    return {ticker: run_backtest(strategy, data, ref=ref, ticker=ticker,
+                                 intrabar=intrabar.get(ticker) if intrabar else None, **kwargs)
+            for ticker, data in datasets.items()}
@@ -0,0 +1,649 @@
+import gc
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import importlib
+import contextlib
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sim_exchange
+import candle_store
+
+# ---------------------------------------------------------------------
+# 봇 판단 루프 벤치마크
+# - 모의 거래소(sim_exchange)가 pyupbit 응답을 대신하므로 네트워크 / 실제 키 없이 실행
+# - 봇별로 --legacy 루프 1회와 같은 순서(시세 -> 포트폴리오 -> 종목별 판단)를 sleep 없이 반복
+#   (scan: bot4 --scan 스캐너 모드)
+# - 종목 수(3 / 30 / 200)별로 초당 반복 수, 반복당 API 호출(엔드포인트별), 지표/자산 함수 시간,
+#   반복당 메모리 할당량을 측정하고 기준 파일(bench_baseline.json)과 비교해 회귀를 판정
+#
+#   python bench.py                                   # 전체 실행 후 표 출력
+#   python bench.py --bots bot2 bot4 --tickers 3 30   # 일부만
+#   python bench.py --save bench_baseline.json        # 기준 저장 (기존 임계값 유지)
+#   python bench.py --check bench_baseline.json       # 기준 대비 회귀가 있으면 종료 코드 1
+#   python bench.py --soak                            # 장기 실행 모드 bot4 루프를 가상 24시간 돌려 메모리 증가 확인
+#   python bench.py --soak 6 --frames                 # DataFrame 캐시(기본 모드)와 비교
+#   python bench.py --shards 1 2 4                    # supervisor 샤드 워커 수별 초당 종목 판단 수 (공유 메모리 시세)
+# ---------------------------------------------------------------------
+TICKER_COUNTS = [3, 30, 200]
+ITERATIONS = 30         # 측정 반복 수
+WARMUP = 3              # 캐시 / 지표 상태를 채우는 준비 반복 (측정 제외)
+ALLOC_ITERATIONS = 5    # tracemalloc 측정 반복 수 (추적 중에는 느려서 따로 짧게)
+TICK = 1.0              # 반복 사이에 흐르는 가상 시간(초) — 실제 루프의 time.sleep(1)
+DATA_DAYS = 4           # 합성 1분봉 길이 (앞 3일은 워밍업 구간)
+
+# 회귀 판정 기준 (기준 파일에 함께 저장되며, 파일의 값을 고쳐 조정)
+THRESHOLDS = {
+    "iter_per_sec": 0.20,   # 초당 반복 수가 20% 넘게 줄면 회귀
+    "api_per_iter": 0.0,    # 반복당 API 호출 수는 늘면 안 됨
+    "alloc_kb": 0.25,       # 반복당 최대 할당량이 25% 넘게 늘면 회귀
+}
+
+# 소크 테스트 (--soak): 가상 시간으로 몇 시간씩 돌리며 RSS / 할당 블록 / GC 멈춤을 기록
+SOAK_HOURS = 24           # 기본 실행 길이 (가상 시간)
+SOAK_SAMPLE = 3600        # 이 가상 시간(초)마다 한 번 기록
+SOAK_ALLOC_TICKS = 30     # 기록할 때마다 tracemalloc 으로 틱당 할당량을 재는 반복 수
+SOAK_SETTLE = 3600        # 증가량 기준점 (캐시 / 지표 / 저널 버퍼가 다 찬 뒤부터 잼)
+SOAK_LIMITS = {
+    "rss_mb": 8.0,        # 기준점 이후 RSS 증가 한도(MB)
+    "blocks": 20000,      # 기준점 이후 파이썬 할당 블록 수 증가 한도
+    "alloc_kb": 8.0,      # 기준점 이후 틱당 최대 할당량 한도(KB, 구간별 평균 중 최대)
+}
+
+# 샤드 처리량 (--shards): 워커 프로세스 수별로 게시판(shared_market) 시세를 읽어 담당 종목을 판단하는 속도
+SHARD_TICKERS = 200       # 전체 종목 수 (워커 수로 나눔)
+SHARD_SECONDS = 5.0       # 측정 시간(초)
+SHARD_PUBLISH = 0.01      # 시세 게시 주기(초)
+
+BASE_TICKERS = ["KRW-BTC", "KRW-ETH", "KRW-SOL", "KRW-DOGE"]
+BASE_PRICES = [9e7, 4e6, 2e5, 200.0]
+
+
+# ---------------------------------------------------------------------
+# 합성 데이터
+# ---------------------------------------------------------------------
+def synthetic_minutes(seed, price, days=DATA_DAYS, start="2024-05-01 00:00"):
+    """랜덤 워크 1분봉 (backtest_engine 배열 형식) — 시드가 같으면 항상 같은 데이터"""
+    rng = np.random.default_rng(seed)
+    n = days * 1440
+    ts = (pd.Timestamp(start) + pd.to_timedelta(np.arange(n), "min")).values
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.0015, n)))
+    open_ = np.r_[price, close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.random(n) * 0.001)
+    low = np.minimum(open_, close) * (1 - rng.random(n) * 0.001)
+    return {"ts": ts, "open": open_, "high": high, "low": low, "close": close, "volume": np.ones(n)}
+
+
+def universe(count):
+    """기본 종목(BTC/ETH/SOL/DOGE) + 합성 종목 KRW-X000... 으로 count 개 이상"""
+    extra = [f"KRW-X{i:03d}" for i in range(max(0, count - len(BASE_TICKERS) + 1))]
+    return BASE_TICKERS + extra
+
+
+def make_datasets(tickers, days=DATA_DAYS):
+    datasets = {}
+    for i, ticker in enumerate(tickers):
+        price = BASE_PRICES[i] if i < len(BASE_PRICES) else 10 ** (1 + i % 5)
+        datasets[ticker] = synthetic_minutes(i, price, days=days)
+    return datasets
+
+
+def pick_tickers(default, count, pool):
+    """봇 기본 종목을 먼저, 모자라면 합성 종목으로 채워 count 개"""
+    rest = [t for t in pool if t not in default and t != "KRW-BTC"]
+    return (list(default) + rest)[:count]
+
+
+# ---------------------------------------------------------------------
+# 봇별 설정: 반복 1회 / 시간 측정 대상 함수
+# ---------------------------------------------------------------------
+def _setup_bot(mod, tickers):
+    mod.TICKERS = tickers
+    mod.states.clear()
+
+    def step():
+        mod.check_session()
+        asks = mod.quotes.fetch_quotes(mod.TICKERS, source="ask")
+        mod.exit_session(asks)
+        for ticker in mod.TICKERS:
+            mod.check_ticker(ticker, asks.get(ticker), ts=asks.ts)
+    return step
+
+
+def _setup_bot2(mod, tickers):
+    mod.TICKERS = tickers
+    mod.states.clear()
+    for ticker in tickers:
+        mod.states[ticker] = {'holding': False, 'purchase_price': 0, 'trade_count_today': 0}
+
+    def step():
+        mod.check_day()
+        snapshot = mod.quotes.fetch_quotes(mod.TICKERS)
+        for ticker in mod.TICKERS:
+            mod.check_ticker(ticker, snapshot.get(ticker), snapshot.ts)
+    return step
+
+
+def _setup_bot3(mod, tickers):
+    mod.TICKERS = tickers
+    mod.states.clear()
+    for ticker in tickers:
+        mod.states[ticker] = {'step': 1 if mod.get_balance_info(ticker)['balance'] > 0 else 0}
+
+    def step():
+        mod.check_report()
+        snapshot = mod.quotes.fetch_quotes(mod.TICKERS)
+        for ticker in mod.TICKERS:
+            mod.check_ticker(ticker, snapshot.get(ticker), snapshot.ts)
+    return step
+
+
+def _setup_bot4(mod, tickers):
+    mod.TICKERS = tickers
+    state = mod.init_state()
+
+    def step():
+        mod.refresh_account(state)
+        snapshot = mod.quotes.fetch_quotes(mod.TICKERS + list(state['coin_bals']) + ["KRW-BTC"])
+        mod.check_portfolio(state, snapshot)
+        if not state['target_achieved']:
+            for ticker in mod.TICKERS:
+                mod.check_ticker(state, ticker, snapshot.get(ticker), snapshot.ts)
+    return step
+
+
+def _setup_scan(mod, tickers):
+    """bot4 --scan: 스캐너가 전 종목을 한 번에 계산하고 후보만 check_ticker"""
+    market_scanner = mod.scanner.MarketScanner(tickers)
+    market_scanner.warmup()
+    mod.TICKERS = market_scanner.tickers
+    state = mod.init_state()
+
+    def step():
+        mod.refresh_account(state)
+        snapshot = mod.quotes.fetch_quotes(mod.TICKERS + list(state['coin_bals']) + ["KRW-BTC"])
+        mod.check_portfolio(state, snapshot)
+        if not state['target_achieved']:
+            held = [t for t, amt in state['coin_bals'].items() if t in mod.TICKERS and amt > 1e-8]
+            for ticker in dict.fromkeys(held + market_scanner.candidates(snapshot, rsi_max=30)):
+                mod.check_ticker(state, ticker, snapshot.get(ticker), snapshot.ts)
+    return step
+
+
+# 이름: (봇 모듈, 설정 함수, 시간 측정 대상 함수)
+BOTS = {
+    "bot": ("bot", _setup_bot, ["get_start_time", "get_current_price", "get_balance"]),
+    "bot2": ("bot2", _setup_bot2, ["get_indicators", "get_rsi", "get_balance"]),
+    "bot3": ("bot3", _setup_bot3, ["get_indicators", "get_balance_info", "get_total_equity"]),
+    "bot4": ("bot4", _setup_bot4, ["get_market_state", "get_indicators", "get_total_wealth"]),
+    "scan": ("bot4", _setup_scan, ["get_market_state", "get_indicators", "get_total_wealth"]),
+}
+
+
+class _Timed:
+    """모듈 함수를 감싸 호출 수 / 누적 시간을 센다 (봇 코드는 전역 이름으로 부르므로 교체만으로 측정됨)"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.fn(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+def _load_bot(name):
+    """봇 모듈을 새로 실행 (모듈 수준의 로그인 / 잔고 캐시가 현재 모의 거래소를 잡도록)"""
+    module = sys.modules.get(name)
+    return importlib.reload(module) if module is not None else importlib.import_module(name)
+
+
+# ---------------------------------------------------------------------
+# 측정
+# ---------------------------------------------------------------------
+def run_case(name, count, iterations=ITERATIONS, warmup=WARMUP, alloc_iterations=ALLOC_ITERATIONS):
+    """봇 하나 x 종목 수 하나 측정 결과 dict"""
+    import quotes
+    import indicators
+
+    module_name, setup, timed_names = BOTS[name]
+    pool = universe(count)
+    exchange = sim_exchange.SimExchange(make_datasets(pool), latency=0)
+    sim_exchange.install(exchange)
+    # 이전 측정의 지표 상태 / 마켓 목록 캐시 / 봇 상태 저널 / 거래 기록이 남지 않도록
+    sim_exchange.use_state_dir()
+    sim_exchange.use_journal_dir()
+    indicators._states.clear()
+    quotes._krw_markets = None
+    try:
+        mod = _load_bot(module_name)
+        tickers = pick_tickers(list(mod.TICKERS), count, pool)
+        step = setup(mod, tickers)
+        timed = {n: _Timed(getattr(mod, n)) for n in timed_names}
+        for n, wrapper in timed.items():
+            setattr(mod, n, wrapper)
+
+        for _ in range(warmup):
+            step()
+            exchange.clock.sleep(TICK)
+        for wrapper in timed.values():
+            wrapper.reset()
+        calls_before = dict(exchange.calls)
+
+        elapsed = 0.0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            step()
+            elapsed += time.perf_counter() - started
+            exchange.clock.sleep(TICK)
+        calls = {k: (v - calls_before.get(k, 0)) / iterations for k, v in exchange.calls.items()
+                 if v != calls_before.get(k, 0)}
+        functions = {
+            n: {"calls_per_iter": w.calls / iterations, "ms_per_iter": w.seconds / iterations * 1000}
+            for n, w in timed.items()
+        }
+
+        # 할당량: 반복 1회 동안의 최대 추적 메모리 증가분 / 반복 후 남은 증가분
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for _ in range(alloc_iterations):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                step()
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+                exchange.clock.sleep(TICK)
+        finally:
+            tracemalloc.stop()
+    finally:
+        sim_exchange.uninstall()
+
+    return {
+        "bot": name,
+        "tickers": len(tickers),
+        "iter_per_sec": iterations / elapsed if elapsed else 0.0,
+        "ms_per_iter": elapsed / iterations * 1000,
+        "api_per_iter": sum(calls.values()),
+        "api_calls": dict(sorted(calls.items())),
+        "functions": functions,
+        "alloc_kb": float(np.mean(peaks)) / 1024 if peaks else 0.0,
+        "retained_kb": float(np.mean(retained)) / 1024 if retained else 0.0,
+        "orders": exchange.stats["orders"],
+    }
+
+
+@contextlib.contextmanager
+def _sim_workdir(workdir):
+    """봇 로그 / 지표 파일은 workdir 에 쌓이고, 측정 중에는 INFO 로그를 끈다"""
+    os.environ.update(sim_exchange.SIM_ENV)
+    saved_tz = sim_exchange._set_tz(sim_exchange.SIM_TZ)
+    cwd = os.getcwd()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+        os.chdir(cwd)
+        sim_exchange._set_tz(saved_tz)
+
+
+def run_all(bots, counts, iterations=ITERATIONS, workdir="sim_runs"):
+    results = {}
+    with _sim_workdir(workdir):
+        for name in bots:
+            for count in counts:
+                result = run_case(name, count, iterations)
+                results[f"{name}@{count}"] = result
+                print(format_row(result), flush=True)
+    return results
+
+
+# ---------------------------------------------------------------------
+# 소크 테스트: 장기 실행 모드에서 메모리가 늘지 않는지 (가상 시간 24시간)
+# ---------------------------------------------------------------------
+def _rss_mb():
+    """현재 RSS(MB) — /proc 이 없으면 최대 RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _GcPauses:
+    """gc.callbacks 로 수집 1회당 멈춘 시간을 잰다 (구간별 최대 / 합계)"""
+
+    def __init__(self):
+        self.max = 0.0
+        self.total = 0.0
+        self.count = 0
+        self._started = 0.0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._started
+        self.count += 1
+        self.total += pause
+        self.max = max(self.max, pause)
+
+    def take(self):
+        result = {"gc_count": self.count, "gc_max_ms": self.max * 1000, "gc_total_ms": self.total * 1000}
+        self.max = self.total = 0.0
+        self.count = 0
+        return result
+
+
+def run_soak(name="bot4", hours=SOAK_HOURS, count=3, ring=True, workdir="sim_runs", limits=None):
+    """봇 루프를 가상 시간 hours 시간 동안 1초 간격으로 돌리며 구간별 메모리 기록, 결과 dict
+
+    ring=True 면 장기 실행 모드(candle_cache 링 버퍼), False 면 기본 DataFrame 캐시.
+    """
+    import quotes
+    import indicators
+    import candle_cache
+
+    limits = {**SOAK_LIMITS, **(limits or {})}
+    module_name, setup, _ = BOTS[name]
+    pool = universe(count)
+    days = sim_exchange.WARMUP_DAYS + int(np.ceil(hours / 24)) + 1
+    exchange = sim_exchange.SimExchange(make_datasets(pool, days=days), latency=0)
+    ticks = int(hours * 3600 / TICK)
+    cache = candle_cache._default_cache
+    saved_ring = cache.ring
+    pauses = _GcPauses()
+    samples = []
+    with _sim_workdir(workdir):
+        sim_exchange.install(exchange)
+        sim_exchange.use_state_dir()
+        sim_exchange.use_journal_dir()
+        cache.ring = ring
+        cache.invalidate()
+        indicators._states.clear()
+        quotes._krw_markets = None
+        gc.callbacks.append(pauses)
+        try:
+            mod = _load_bot(module_name)
+            step = setup(mod, pick_tickers(list(mod.TICKERS), count, pool))
+            every = int(SOAK_SAMPLE / TICK)
+            started = time.perf_counter()
+            for tick in range(1, ticks + 1):
+                step()
+                exchange.clock.sleep(TICK)
+                if tick % every and tick != ticks:
+                    continue
+                # 구간 끝: 틱당 할당량을 잠깐 재고 RSS / 블록 수 / GC 멈춤 기록
+                peaks = []
+                tracemalloc.start()
+                try:
+                    for _ in range(SOAK_ALLOC_TICKS):
+                        tracemalloc.reset_peak()
+                        before = tracemalloc.get_traced_memory()[0]
+                        step()
+                        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+                        exchange.clock.sleep(TICK)
+                finally:
+                    tracemalloc.stop()
+                gc_stats = pauses.take()
+                gc.collect()
+                pauses.take()  # 방금 강제 수집은 빼고 루프 중 자동 수집만 센다
+                elapsed, started = time.perf_counter() - started, time.perf_counter()
+                sample = {
+                    "hour": tick * TICK / 3600,
+                    "rss_mb": _rss_mb(),
+                    "blocks": sys.getallocatedblocks(),
+                    "alloc_kb": float(np.mean(peaks)) / 1024,
+                    "ms_per_tick": elapsed / (every + SOAK_ALLOC_TICKS) * 1000,
+                    **gc_stats,
+                }
+                samples.append(sample)
+                print(format_soak_row(sample), flush=True)
+        finally:
+            gc.callbacks.remove(pauses)
+            cache.ring = saved_ring
+            cache.invalidate()
+            sim_exchange.uninstall()
+
+    settled = [s for s in samples if s["hour"] * 3600 >= SOAK_SETTLE] or samples
+    first, last = settled[0], samples[-1]
+    measured = {
+        "rss_mb": last["rss_mb"] - first["rss_mb"],
+        "blocks": last["blocks"] - first["blocks"],
+        "alloc_kb": max(s["alloc_kb"] for s in settled),
+    }
+    problems = [f"{k}: {measured[k]:,.1f} (한도 {limits[k]:,})" for k in limits if measured[k] > limits[k]]
+    return {"bot": name, "tickers": count, "hours": hours, "ring": ring, "samples": samples,
+            "measured": measured, "orders": exchange.stats["orders"], "problems": problems}
+
+
+# ---------------------------------------------------------------------
+# 샤드 처리량: supervisor 워커와 같은 경로(게시판 시세 -> StrategyEngine 판단)를 워커 수별로
+# 게시판에 신규 매수 중지를 걸어 두어 주문 없이 판단만 반복한다.
+# ---------------------------------------------------------------------
+def _bars(data, interval):
+    """합성 1분봉 -> interval 봉 (pyupbit 모양 DataFrame)"""
+    df = pd.DataFrame({c: data[c] for c in ("open", "high", "low", "close", "volume")}, index=pd.DatetimeIndex(data["ts"]))
+    bars = df.resample(candle_store.interval_delta(interval)).agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    bars["value"] = bars["close"] * bars["volume"]
+    return bars
+
+
+def _shard_worker(meta, strategy, tickers, seconds, ready, go, out):
+    import candle_cache
+    import shared_market
+    import strategies
+    import strategy_engine
+    logging.disable(logging.INFO)
+    board = shared_market.MarketBoard.attach(meta)
+    cache = candle_cache._default_cache
+    cache.fetch, cache.store = board.get_ohlcv, None
+    engine = strategy_engine.StrategyEngine(None, [strategies.make_strategy(strategy, 1e6, tickers=tickers)],
+                                            buy_gate=lambda *args: not board.halted)
+    engine.allocate(krw=1e6)
+    for s in engine.strategies:
+        engine._dispatch(s, "on_start")
+    engine.check_candles()
+    watch = list(dict.fromkeys(tickers + engine._watch_list()))
+    ready.put(True)
+    go.wait()
+    evals, snapshots, start = 0, 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        snapshot = board.snapshot(watch)
+        engine._on_snapshot(snapshot)
+        for ticker in tickers:
+            engine._on_price(ticker, snapshot.get(ticker), snapshot)
+        evals += len(tickers)
+        snapshots += 1
+    elapsed = time.perf_counter() - start
+    out.put({"evals_per_sec": evals / elapsed, "snapshots_per_sec": snapshots / elapsed})
+    board.close()
+
+
+def run_shards(workers=(1, 2, 4), count=SHARD_TICKERS, seconds=SHARD_SECONDS, strategy="bot4"):
+    """워커 수별 초당 종목 판단 수 (전 워커 합) — 종목은 supervisor 와 같이 정렬 후 번갈아 나눈다"""
+    import multiprocessing
+    import quotes
+    import shared_market
+    import strategies
+    tickers = universe(count)[:count]
+    datasets = make_datasets(tickers)
+    probe = strategies.make_strategy(strategy, 0.0, tickers=tickers)
+    subs = {}
+    for ticker, interval, n in probe.subscriptions():
+        subs[interval] = max(subs.get(interval, 0), n)
+    board = shared_market.MarketBoard(sorted(set(tickers) | set(probe.extra_tickers)), subs)
+    for ticker in board.tickers:
+        for interval in subs:
+            board.publish_candles(ticker, interval, _bars(datasets[ticker], interval))
+    last = {t: float(datasets[t]["close"][-1]) for t in board.tickers}
+    board.halt(True)
+    ctx = multiprocessing.get_context("spawn")
+    rng = np.random.default_rng(0)
+    results = []
+    try:
+        for n in workers:
+            ready, out, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+            universe_sorted = sorted(tickers)
+            procs = [ctx.Process(target=_shard_worker, args=(board.meta, strategy, universe_sorted[i::n], seconds, ready, go, out))
+                     for i in range(n)]
+            for p in procs:
+                p.start()
+            for _ in procs:
+                ready.get(timeout=300)
+            go.set()
+            deadline = time.perf_counter() + seconds + 1.0
+            while time.perf_counter() < deadline:
+                for t in last:
+                    last[t] *= 1 + rng.normal(0, 0.0005)
+                board.publish_quotes(quotes.QuoteSnapshot(dict(last)))
+                time.sleep(SHARD_PUBLISH)
+            rows = [out.get(timeout=60) for _ in procs]
+            for p in procs:
+                p.join()
+            total = sum(r["evals_per_sec"] for r in rows)
+            results.append({"workers": n, "tickers": count, "evals_per_sec": total,
+                            "speedup": total / results[0]["evals_per_sec"] if results else 1.0,
+                            "snapshots_per_sec": min(r["snapshots_per_sec"] for r in rows)})
+            print(format_shard_row(results[-1]), flush=True)
+    finally:
+        board.close()
+    return results
+
+
+# ---------------------------------------------------------------------
+# 출력 / 기준 비교
+# ---------------------------------------------------------------------
+def format_row(r):
+    funcs = ", ".join(f"{n} {f['ms_per_iter']:.2f}ms" for n, f in r["functions"].items() if f["calls_per_iter"])
+    calls = ", ".join(f"{k} {v:.2f}" for k, v in r["api_calls"].items())
+    return (f"{r['bot']:>5} x{r['tickers']:<4} {r['iter_per_sec']:9.2f} it/s {r['ms_per_iter']:9.2f} ms/it | "
+            f"API {r['api_per_iter']:7.2f}/it ({calls}) | alloc {r['alloc_kb']:9.1f} KB/it | {funcs}")
+
+
+def format_soak_row(s):
+    return (f"{s['hour']:6.1f}h | RSS {s['rss_mb']:8.1f} MB | blocks {s['blocks']:>10,} | "
+            f"alloc {s['alloc_kb']:7.1f} KB/tick | {s['ms_per_tick']:6.2f} ms/tick | "
+            f"GC {s['gc_count']:>5}회 max {s['gc_max_ms']:6.2f}ms total {s['gc_total_ms']:8.1f}ms")
+
+
+def format_shard_row(r):
+    return (f"workers {r['workers']:>2} x{r['tickers']:<4} {r['evals_per_sec']:12,.0f} evals/s "
+            f"(x{r['speedup']:.2f}) | 워커당 최소 {r['snapshots_per_sec']:8.1f} snapshots/s")
+
+
+def compare(results, baseline):
+    """기준 대비 회귀 목록 (메시지 문자열)"""
+    thresholds = {**THRESHOLDS, **baseline.get("thresholds", {})}
+    problems = []
+    for key, base in baseline.get("results", {}).items():
+        cur = results.get(key)
+        if cur is None:
+            continue
+        if cur["iter_per_sec"] < base["iter_per_sec"] * (1 - thresholds["iter_per_sec"]):
+            problems.append(f"{key}: 초당 반복 {base['iter_per_sec']:.2f} -> {cur['iter_per_sec']:.2f}")
+        # 반복 수가 나눠떨어지지 않는 주기 호출(1분 캐시 등)의 반올림 차이는 허용
+        if cur["api_per_iter"] > base["api_per_iter"] * (1 + thresholds["api_per_iter"]) + 0.05:
+            problems.append(f"{key}: 반복당 API 호출 {base['api_per_iter']:.2f} -> {cur['api_per_iter']:.2f}")
+        if cur["alloc_kb"] > base["alloc_kb"] * (1 + thresholds["alloc_kb"]):
+            problems.append(f"{key}: 반복당 할당 {base['alloc_kb']:.1f}KB -> {cur['alloc_kb']:.1f}KB")
+    return problems
+
+
+def save_baseline(path, results, iterations):
+    thresholds = dict(THRESHOLDS)
+    if os.path.exists(path):
+        with open(path) as f:
+            thresholds.update(json.load(f).get("thresholds", {}))
+    baseline = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "iterations": iterations,
+        },
+        "thresholds": thresholds,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="봇 판단 루프 벤치마크 (모의 거래소 사용)")
+    parser.add_argument("--bots", nargs="+", choices=list(BOTS), default=list(BOTS))
+    parser.add_argument("--tickers", nargs="+", type=int, default=TICKER_COUNTS, help="종목 수")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--workdir", default="sim_runs", help="봇 로그 / 지표 파일이 쌓일 디렉터리")
+    parser.add_argument("--out", help="측정 결과 JSON 경로")
+    parser.add_argument("--save", help="기준 파일로 저장 (기존 파일의 임계값은 유지)")
+    parser.add_argument("--check", help="기준 파일과 비교해 회귀가 있으면 종료 코드 1")
+    parser.add_argument("--soak", type=float, nargs="?", const=SOAK_HOURS, metavar="HOURS",
+                        help="소크 테스트: --bots 첫 봇(기본 bot4)을 가상 HOURS 시간 동안 실행 (메모리 증가 시 종료 코드 1)")
+    parser.add_argument("--frames", action="store_true", help="소크 테스트를 장기 실행 모드 대신 DataFrame 캐시로")
+    parser.add_argument("--shards", type=int, nargs="+", metavar="WORKERS",
+                        help="샤드 처리량: 워커 수별 초당 종목 판단 수 (--tickers 첫 값이 전체 종목 수, 기본 200)")
+    args = parser.parse_args()
+
+    if args.shards:
+        results = run_shards(args.shards, count=args.tickers[0] if args.tickers != TICKER_COUNTS else SHARD_TICKERS)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=1)
+        return
+
+    if args.soak:
+        bot = args.bots[0] if args.bots != list(BOTS) else "bot4"
+        result = run_soak(bot, args.soak, count=args.tickers[0] if args.tickers != TICKER_COUNTS else 3,
+                          ring=not args.frames, workdir=args.workdir)
+        measured = result["measured"]
+        print(f"기준점 이후 증가: RSS {measured['rss_mb']:+.1f} MB, blocks {measured['blocks']:+,} | "
+              f"틱당 최대 할당 {measured['alloc_kb']:.1f} KB (주문 {result['orders']}건)")
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(result, f, indent=1)
+        for problem in result["problems"]:
+            print(f"[메모리 증가] {problem}")
+        if result["problems"]:
+            sys.exit(1)
+        return
+
+    results = run_all(args.bots, args.tickers, args.iterations, args.workdir)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.save:
+        save_baseline(args.save, results, args.iterations)
+    if args.check:
+        with open(args.check) as f:
+            problems = compare(results, json.load(f))
+        for problem in problems:
+            print(f"[회귀] {problem}")
+        if problems:
+            sys.exit(1)
+        print("기준 대비 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
 import time
+import threading
 import pyupbit
 import datetime
 import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
+import argparse
+import async_core
+import account_state
+import rate_limiter
+import order_tracker
+import order_batch
+import metrics
+import candle_cache
+import candle_clock
+import quotes
+import state_journal
+import trade_journal
 
 # 로깅 설정
 logging.basicConfig(
@@ -27,35 +40,25 @@ K_VALUE = 0.5
 
 def get_target_price(ticker, k):
     """변동성 돌파 전략으로 매수 목표가 조회"""
-    df = pyupbit.get_ohlcv(ticker, interval="day", count=2)
+    df = candle_cache.get_ohlcv(ticker, interval="day", count=2)
     target_price = df.iloc[0]['close'] + (df.iloc[0]['high'] - df.iloc[0]['low']) * k
     return target_price
 
-def get_start_time(ticker):
-    """시작 시간 조회"""
-    df = pyupbit.get_ohlcv(ticker, interval="day", count=1)
-    if df is not None:
-        return df.index[0]
-    return None
+def get_start_time(ticker=None):
+    """시작 시간 (업비트 일봉 시작 09:00 KST — 조회 없이 계산)"""
+    return candle_clock.session_window()[0]
 
 def get_ma2(ticker):
     """2일 이동 평균선 조회"""
-    df = pyupbit.get_ohlcv(ticker, interval="day", count=2)
+    df = candle_cache.get_ohlcv(ticker, interval="day", count=2)
     if df is not None:
         ma2 = df['close'].rolling(window=2).mean().iloc[-1]
         return ma2
     return None
 
 def get_balance(ticker):
-    """잔고 조회"""
-    balances = upbit.get_balances()
-    for b in balances:
-        if b['currency'] == ticker:
-            if b['balance'] is not None:
-                return float(b['balance'])
-            else:
-                return 0
-    return 0
+    """잔고 조회 (잔고 캐시, 주문 직후에는 새로 조회)"""
+    return account.balance(ticker)
 
 def get_current_price(ticker):
     """현재가 조회"""
@@ -63,119 +66,239 @@ def get_current_price(ticker):
 
 # 로그인
 try:
+    rate_limiter.install()  # 모든 pyupbit 요청을 그룹별 토큰 버킷으로 조절 (봇 여러 개가 같은 예산 공유)
     upbit = pyupbit.Upbit(ACCESS_KEY, SECRET_KEY)
+    account = account_state.AccountState(upbit)  # 잔고 캐시 (주문 시 자동 무효화)
+    tracker = order_tracker.OrderTracker(upbit)  # 주문 uuid 로 체결 확인
     logging.info("Trading Bot Started (BTC, ETH, SOL) - Strategy Update: MA2, TP 1.5%, SL 2.0%")
 except Exception as e:
     logging.error(f"Login Failed: {e}")
     exit()
 
-# 코인별 상태 관리를 위한 딕셔너리
-states = {}
+# 코인별 상태 관리를 위한 딕셔너리 (재시작 시 보유 여부 / 매수가 / 당일 거래 완료를 저널에서 복원)
+journal = state_journal.StateJournal("bot")
+trades = trade_journal.TradeJournal("bot")  # 신호 판단 / 주문 / 체결 기록 (trade_journal.py 로 집계)
+batch = order_batch.BatchExecutor(account, tracker, journal=trades)  # 마감 전량 매도를 한 번에 전송
+PERSISTED = ('holding', 'purchase_price', 'trade_completed_today')
+journal.load()
+states = {t: dict(s) for t, s in journal.group('states').items()}
+
+def save_state(ticker):
+    """종목 하나의 복원 대상 상태 저널 기록 (바뀐 경우에만 기록)"""
+    s = states[ticker]
+    journal.set(f'states/{ticker}', {k: s[k] for k in PERSISTED})
+
+def update_daily_data(today=None):
+    """하루에 한 번, 매수 목표가와 이동평균선 등을 갱신
 
-def update_daily_data():
-    """하루에 한 번, 매수 목표가와 이동평균선 등을 갱신"""
+    새 일봉이 아직 없는 종목이 있으면 False (스케줄러가 잠시 뒤 다시 실행). 그 종목은 그때까지 매수하지 않는다.
+    """
+    today = today or state_journal.session_date()
+    start = candle_clock.session_window()[0]
+    # 날짜가 바뀐 경우에만 당일 거래 완료 플래그 리셋 (같은 날 재시작이면 유지해 재진입 방지)
+    same_day = journal.get('day') == today
+    fresh = True
     for ticker in TICKERS:
         try:
-            time.sleep(0.1) # API 호출 제한 방지
+            # 09:00 직후에는 오늘 일봉이 아직 안 생겨 전날까지의 두 봉으로 계산될 수 있다
+            df = candle_cache.get_ohlcv(ticker, interval="day", count=2)
+            ready = df is not None and not df.empty and df.index[-1] >= start
+            fresh = fresh and ready
             states[ticker] = {
                 'holding': states.get(ticker, {}).get('holding', False), # 기존 보유 상태 유지
                 'purchase_price': states.get(ticker, {}).get('purchase_price', 0),
-                'trade_completed_today': False, # 날짜 바뀌면 리셋
-                'target_price': get_target_price(ticker, K_VALUE),
-                'ma2': get_ma2(ticker)
+                'trade_completed_today': same_day and states.get(ticker, {}).get('trade_completed_today', False),
+                'target_price': get_target_price(ticker, K_VALUE) if ready else None,
+                'ma2': get_ma2(ticker) if ready else None
             }
             logging.info(f"Updated daily data for {ticker}: Target={states[ticker]['target_price']}, MA2={states[ticker]['ma2']}")
         except Exception as e:
+            fresh = False
             logging.error(f"Failed to update daily data for {ticker}: {e}")
+    journal.set('day', today)
+    for ticker in states:
+        save_state(ticker)
+    return fresh
 
-# 초기 데이터 설정
-current_day = datetime.datetime.now().day
-update_daily_data()
-
-# 자동매매 시작
-while True:
-    try:
-        now = datetime.datetime.now()
-        
-        # 날짜가 바뀌면 데이터 갱신 및 플래그 초기화
-        if now.day != current_day:
-            current_day = now.day
-            logging.info("New day started. Updating daily data...")
-            update_daily_data()
-
-        # 공통 시작 시간 (API 호출 최소화 위해 대략적인 시간 계산 혹은 1분 1회 체크가 좋으나, 여기선 간단히 BTC 기준으로 캐싱 가능)
-        # 하지만 안전을 위해 매번 체크하되, 에러 시 무시
-        try:
-            # start_time은 잘 안 바뀌므로 BTC 조회 비용 감수 (1초 1회는 허용 범위)
-            # 더 최적화하려면 이것도 변수에 저장 가능하나, 업비트 점검 등으로 시간이 밀릴 수 있어 조회 유지
-            start_time = get_start_time("KRW-BTC") 
-            end_time = start_time + datetime.timedelta(days=1)
-        except:
-            time.sleep(1)
+session = {'start_time': None, 'end_time': None, 'exit_at': None}
+
+def start_session():
+    """세션(09:00 KST) 시작 시 1회: 일일 데이터 갱신 및 플래그 초기화"""
+    logging.info("New session started. Updating daily data...")
+    return update_daily_data(state_journal.session_date())
+
+# 일봉 경계(09:00 KST)마다 한 번 (가동 시 1회 포함)
+scheduler = candle_clock.BoundaryScheduler()
+scheduler.every("day", start_session)
+
+def check_session():
+    """세션이 바뀌었으면 일일 데이터 갱신 + 오늘 매매 구간(시작/종료 시각) 계산 (네트워크 조회 없음)"""
+    scheduler.run_pending()
+    session['start_time'], session['end_time'] = candle_clock.session_window()
+    session['exit_at'] = candle_clock.next_bar("day") - 10  # 마감 일괄 매도 시작 시각 (epoch, 08:59:50)
+
+# 매도는 exit_session(스냅샷 워커)과 check_ticker(종목 워커 — 익절 / 손절 / 마감)가 같은 시각에 겹칠 수 있으므로
+# 보유 해제를 먼저 표시한 쪽만 주문을 보낸다
+exit_lock = threading.Lock()
+
+def claim_exit(ticker):
+    """매도할 종목을 보유 해제로 표시 (이미 다른 쪽에서 가져갔으면 False)"""
+    with exit_lock:
+        state = states.get(ticker)
+        if not state or not state['holding']:
+            return False
+        state['holding'] = False
+        state['purchase_price'] = 0
+        return True
+
+def exit_session(snapshot):
+    """마감 구간이면 보유 종목 전체를 한 번에 시장가 매도 (스냅샷마다 check_ticker 보다 먼저, 평소에는 시각 비교만)"""
+    if session['exit_at'] is None or time.time() < session['exit_at']:
+        return
+    exits = []
+    for ticker in TICKERS:
+        state = states.get(ticker)
+        current_price = snapshot.get(ticker)
+        # 시세가 빠진 종목은 check_ticker 에서 종목별로 처리
+        if not state or not state['holding'] or not current_price:
             continue
+        balance = get_balance(ticker.split("-")[1])
+        if not claim_exit(ticker):
+            continue  # 종목 워커가 먼저 매도
+        exits.append(order_batch.exit_order(ticker, balance, "session_end", current_price))
+        save_state(ticker)
+    if exits:
+        logging.info(f"End of session. Market exit {', '.join(o['ticker'] for o in exits)}.")
+        batch.sell(exits, callback=lambda result: logging.info("Session exit fills\n" + order_batch.report(result)))
+
+def check_ticker(ticker, current_price, now=None, ts=None):
+    """종목 하나의 매수 / 익절 / 손절 / 마감 매도 판단 (ts: 시세 수신 시각, 신호 -> 주문 지연 계측용)"""
+    now = now or datetime.datetime.now()
+    signal_at = ts or time.time()
+    start_time, end_time = session['start_time'], session['end_time']
+    if start_time is None or ticker not in states:
+        return
+    current_price = current_price or get_current_price(ticker)
+    state = states[ticker]
+
+    # 09:00:00 ~ 다음날 08:59:50 (매수/보유 구간)
+    if start_time < now < end_time - datetime.timedelta(seconds=10):
+        # 1. 매매 로직
+        if not state['holding'] and not state['trade_completed_today']:
+            # 캐싱된 값 사용 (API 호출 X)
+            target_price = state['target_price']
+            ma2 = state['ma2']
 
-        for ticker in TICKERS:
-            # 09:00:00 ~ 다음날 08:59:50 (매수/보유 구간)
-            if start_time < now < end_time - datetime.timedelta(seconds=10):
-                current_price = get_current_price(ticker)
-                state = states[ticker]
-
-                # 1. 매매 로직
-                if not state['holding'] and not state['trade_completed_today']:
-                    # 캐싱된 값 사용 (API 호출 X)
-                    target_price = state['target_price']
-                    ma2 = state['ma2']
-                    
-                    # target_price나 ma2가 계산 오류로 None일 수 있음
-                    if target_price is not None and ma2 is not None:
-                        if target_price < current_price and ma2 < current_price:
-                            krw = get_balance("KRW")
-                            buy_amount = krw * 0.3
-                            if buy_amount > 5000:
-                                logging.info(f"Target Met! Buying {ticker}. Price: {current_price}")
-                                upbit.buy_market_order(ticker, buy_amount * 0.9995)
+            # target_price나 ma2가 계산 오류로 None일 수 있음
+            if target_price is not None and ma2 is not None:
+                breakout = target_price < current_price and ma2 < current_price
+                trades.signal(ticker, "buy" if breakout else "hold", current_price, value=target_price, ref=ma2, ts=ts)
+                if breakout:
+                    # 여러 종목이 동시에 돌파해도 원화 잔고는 한 번에 하나씩 사용
+                    with async_core.order_lock:
+                        krw = get_balance("KRW")
+                        buy_amount = krw * 0.3
+                        if buy_amount > 5000:
+                            logging.info(f"Target Met! Buying {ticker}. Price: {current_price}")
+                            order = account.buy_market_order(ticker, buy_amount * 0.9995)
+                            trades.order(ticker, "bid", order, reason="breakout", price=current_price, funds=buy_amount * 0.9995)
+                            fill = tracker.wait(order)
+                            trades.fill(fill, reason="breakout", ticker=ticker)
+                            if fill is not None and fill['volume']:
+                                # 익절/손절 기준은 주문 전 호가가 아닌 실제 체결 평균가
                                 state['holding'] = True
-                                state['purchase_price'] = current_price
-                                time.sleep(1)
-
-                # 2. 실시간 감시 (보유 중일 때)
-                elif state['holding']:
-                    # 익절: 1.5% 수익 (수정됨)
-                    if current_price >= state['purchase_price'] * 1.015:
-                        coin_symbol = ticker.split("-")[1]
-                        balance = get_balance(coin_symbol)
-                        
-                        # 잔고가 너무 작으면(매도 후 남은 찌꺼기) 무시
-                        if balance * current_price > 5000:
-                            logging.info(f"Take Profit! {ticker} (1.5% hit). Selling at {current_price}")
-                            upbit.sell_market_order(ticker, balance)
-                            state['holding'] = False
-                            state['trade_completed_today'] = True
-
-                    # 손절: 2% 손실 (수정됨)
-                    elif current_price <= state['purchase_price'] * 0.98:
-                        coin_symbol = ticker.split("-")[1]
-                        balance = get_balance(coin_symbol)
-                        
-                        if balance * current_price > 5000:
-                            logging.warn(f"Stop Loss! {ticker} (2% hit). Selling at {current_price}")
-                            upbit.sell_market_order(ticker, balance)
-                            state['holding'] = False
-                            state['trade_completed_today'] = True
-            
-            # 마감 전량 매도
-            else:
-                state = states[ticker]
-                if state['holding']:
-                    coin_symbol = ticker.split("-")[1]
-                    balance = get_balance(coin_symbol)
-                    if balance * get_current_price(ticker) > 5000:
-                        logging.info(f"End of session. Market exit {ticker}.")
-                        upbit.sell_market_order(ticker, balance)
-                    state['holding'] = False
-                    state['purchase_price'] = 0
-            
-        time.sleep(1)
-    except Exception as e:
-        logging.error(f"Error occurred: {e}")
-        time.sleep(5)
+                                state['purchase_price'] = fill['avg_price']
+                                logging.info(f"Filled {ticker}: {fill['volume']:.8g} @ {fill['avg_price']:,.4f} (fee {fill['fee']:,.2f})")
+
+        # 2. 실시간 감시 (보유 중일 때)
+        elif state['holding']:
+            exit_reason = ("tp" if current_price >= state['purchase_price'] * 1.015
+                           else "sl" if current_price <= state['purchase_price'] * 0.98 else "")
+            trades.signal(ticker, "sell" if exit_reason else "hold", current_price, value=state['purchase_price'],
+                          reason=exit_reason, ts=ts)
+            # 익절: 1.5% 수익 (수정됨)
+            if exit_reason == "tp":
+                coin_symbol = ticker.split("-")[1]
+                balance = get_balance(coin_symbol)
+
+                # 잔고가 너무 작으면(매도 후 남은 찌꺼기) 무시
+                if balance * current_price > 5000 and claim_exit(ticker):
+                    logging.info(f"Take Profit! {ticker} (1.5% hit). Selling at {current_price}")
+                    trades.order(ticker, "ask", account.sell_market_order(ticker, balance), reason="tp",
+                                 price=current_price, volume=balance, tracker=tracker)
+                    metrics.since("tick_to_order", signal_at, reason="tp")
+                    state['trade_completed_today'] = True
+
+            # 손절: 2% 손실 (수정됨)
+            elif exit_reason == "sl":
+                coin_symbol = ticker.split("-")[1]
+                balance = get_balance(coin_symbol)
+
+                if balance * current_price > 5000 and claim_exit(ticker):
+                    logging.warn(f"Stop Loss! {ticker} (2% hit). Selling at {current_price}")
+                    trades.order(ticker, "ask", account.sell_market_order(ticker, balance), reason="sl",
+                                 price=current_price, volume=balance, tracker=tracker)
+                    metrics.since("tick_to_order", signal_at, reason="sl")
+                    state['trade_completed_today'] = True
+
+    # 마감 전량 매도 (보통은 exit_session 에서 전 종목을 한 번에 처리하고, 여기서는 남은 종목만)
+    else:
+        if state['holding']:
+            coin_symbol = ticker.split("-")[1]
+            balance = get_balance(coin_symbol)
+            # exit_session 이 이미 일괄 매도에 넣었으면 건너뜀
+            if claim_exit(ticker) and balance * current_price > 5000:
+                logging.info(f"End of session. Market exit {ticker}.")
+                trades.order(ticker, "ask", account.sell_market_order(ticker, balance), reason="session_end",
+                             price=current_price, volume=balance, tracker=tracker)
+
+    # 보유 / 당일 거래 완료가 바뀌었으면 저널 기록 (그대로면 쓰지 않음)
+    save_state(ticker)
+
+def run_bot():
+    """기존 방식: 1초마다 전 종목을 순서대로 판단 (--legacy)"""
+    while True:
+        try:
+            try:
+                check_session()
+            except:
+                time.sleep(1)
+                continue
+
+            with metrics.timer("loop"):
+                # 이번 틱의 매도호가를 전 종목 한 번에 조회
+                asks = quotes.fetch_quotes(TICKERS, source="ask")
+                exit_session(asks)
+                for ticker in TICKERS:
+                    check_ticker(ticker, asks.get(ticker), ts=asks.ts)
+
+            time.sleep(1)
+        except Exception as e:
+            logging.error(f"Error occurred: {e}")
+            time.sleep(5)
+
+def on_snapshot(snapshot):
+    """스냅샷마다 한 번: 세션 갱신 + 마감 일괄 매도"""
+    check_session()
+    exit_session(snapshot)
+
+def run_bot_async(feed=None):
+    """이벤트 방식: 매도호가가 들어오는 즉시 종목별로 판단"""
+    check_session()
+    core = async_core.AsyncTradingCore(
+        TICKERS,
+        feed=feed or async_core.RestPollingFeed(source="ask"),
+        on_snapshot=on_snapshot,
+        on_price=lambda ticker, price, snapshot: check_ticker(ticker, price, ts=snapshot.ts),
+    )
+    async_core.run(core)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="변동성 돌파 봇")
+    parser.add_argument("--legacy", action="store_true", help="기존 while 루프 방식으로 실행")
+    args = parser.parse_args()
+    metrics.start(summary_path="bot_metrics.json")  # METRICS_PORT=9100 이면 /metrics 엔드포인트도 열림
+    if args.legacy:
+        run_bot()
+    else:
+        run_bot_async()
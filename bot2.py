@@ -5,6 +5,17 @@ import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
+import argparse
+import async_core
+import account_state
+import rate_limiter
+import order_tracker
+import metrics
+import candle_cache
+import indicators
+import quotes
+import state_journal
+import trade_journal
 
 # 로깅 설정
 logging.basicConfig(
@@ -23,51 +34,47 @@ SECRET_KEY = os.getenv("UPBIT_SECRET_KEY")
 
 TICKERS = ["KRW-BTC", "KRW-ETH", "KRW-SOL"]
 
-def get_rsi(ticker, interval="minute15", count=200):
-    """RSI 지표 계산"""
-    df = pyupbit.get_ohlcv(ticker, interval=interval, count=count)
-    delta = df['close'].diff()
-    ups, downs = delta.copy(), delta.copy()
-    ups[ups < 0] = 0
-    downs[downs > 0] = 0
-
-    period = 14
-    au = ups.ewm(com=period-1, min_periods=period).mean()
-    ad = downs.abs().ewm(com=period-1, min_periods=period).mean()
-    rs = au / ad
-    rsi = 100 - (100 / (1 + rs))
-    return rsi.iloc[-1]
-
-def get_indicators(ticker):
+def _max_age(price):
+    """실시간 가격이 있으면 캔들은 봉 마감 때만 조회 (진행 중인 봉은 그 가격으로 계산)"""
+    return candle_cache.UNTIL_CLOSE if price else candle_cache.DEFAULT_MAX_AGE
+
+def get_rsi(ticker, interval="minute15", count=200, price=None):
+    """RSI 지표 계산 (증분 엔진, 최근 count 개 캔들 기준)"""
+    df = candle_cache.get_candles(ticker, interval=interval, count=count, max_age=_max_age(price))
+    state = indicators.get_state(ticker, interval, rsi_window=count - 1)
+    return state.update(df).snapshot(price)['rsi']
+
+def get_indicators(ticker, price=None):
     """볼린저 밴드 지표 조회"""
-    df = pyupbit.get_ohlcv(ticker, interval="minute15", count=20)
-    ma20 = df['close'].rolling(window=20).mean()
-    std = df['close'].rolling(window=20).std()
-    upper_band = ma20 + (std * 2)
-    lower_band = ma20 - (std * 2)
+    df = candle_cache.get_candles(ticker, interval="minute15", count=20, max_age=_max_age(price))
+    snap = indicators.get_state(ticker, "minute15", bb_window=20, bb_k=2).update(df).snapshot(price)
     
     return {
-        "current_price": df['close'].iloc[-1],
-        "lower_band": lower_band.iloc[-1],
-        "upper_band": upper_band.iloc[-1]
+        "current_price": snap['current_price'],
+        "lower_band": snap['lower_band'],
+        "upper_band": snap['upper_band']
     }
 
 def get_balance(ticker):
-    """잔고 조회"""
-    balances = upbit.get_balances()
-    for b in balances:
-        if b['currency'] == ticker:
-            return float(b['balance']) if b['balance'] is not None else 0
-    return 0
+    """잔고 조회 (잔고 캐시, 주문 직후에는 새로 조회)"""
+    return account.balance(ticker)
 
 # 로그인
 try:
+    rate_limiter.install()  # 모든 pyupbit 요청을 그룹별 토큰 버킷으로 조절 (봇 여러 개가 같은 예산 공유)
     upbit = pyupbit.Upbit(ACCESS_KEY, SECRET_KEY)
+    account = account_state.AccountState(upbit)  # 잔고 캐시 (주문 시 자동 무효화)
+    tracker = order_tracker.OrderTracker(upbit)  # 주문 uuid 로 체결 확인
     logging.info("Bot2 Started: RSI + Bollinger Band Scalping Strategy")
 except Exception as e:
     logging.error(f"Login Failed: {e}")
     exit()
 
+# 재시작 시 보유 여부 / 매수가 / 거래 횟수를 저널에서 복원 (보유 중이던 종목에 다시 진입하지 않도록)
+journal = state_journal.StateJournal("bot2")
+trades = trade_journal.TradeJournal("bot2")  # 신호 판단 / 주문 / 체결 기록 (trade_journal.py 로 집계)
+saved = journal.load()
+
 states = {}
 for ticker in TICKERS:
     states[ticker] = {
@@ -75,67 +82,119 @@ for ticker in TICKERS:
         'purchase_price': 0,
         'trade_count_today': 0
     }
+    states[ticker].update(journal.get(f'states/{ticker}', {}))
 
-current_day = datetime.datetime.now().day
-
-while True:
-    try:
-        now = datetime.datetime.now()
-        
-        # 날짜 바뀌면 거래 횟수 리셋
-        if now.day != current_day:
-            current_day = now.day
-            for ticker in TICKERS:
-                states[ticker]['trade_count_today'] = 0
-            logging.info("New day started. Trade counts reset.")
+session = {'current_day': saved.get('current_day', datetime.datetime.now().day)}
 
+def check_day(now=None):
+    """날짜 바뀌면 거래 횟수 리셋"""
+    now = now or datetime.datetime.now()
+    if now.day != session['current_day']:
+        session['current_day'] = now.day
         for ticker in TICKERS:
-            try:
-                info = get_indicators(ticker)
-                rsi = get_rsi(ticker)
-                state = states[ticker]
-                
-                # 매수 로직: RSI가 35 이하이면서 가격이 볼린저 밴드 하단 근처일 때
-                if not state['holding']:
-                    if rsi <= 35 and info['current_price'] <= info['lower_band'] * 1.01:
-                        krw = get_balance("KRW")
-                        buy_amount = krw * 0.3 # 가용 자금의 30% 투자
-                        if buy_amount > 5000:
-                            logging.info(f"[BUY] {ticker} | Price: {info['current_price']} | RSI: {rsi:.2f}")
-                            upbit.buy_market_order(ticker, buy_amount * 0.9995)
-                            state['holding'] = True
-                            state['purchase_price'] = info['current_price']
-                            time.sleep(1)
-
-                # 매도 로직: 익절 1.5% 또는 RSI가 65 이상으로 과열될 때
-                elif state['holding']:
-                    current_price = info['current_price']
-                    profit_rate = (current_price / state['purchase_price'] - 1) * 100
-                    
-                    # 1. 익절: 1.5% 수익 OR RSI 65 이상
-                    if profit_rate >= 1.5 or rsi >= 65:
-                        coin_symbol = ticker.split("-")[1]
-                        balance = get_balance(coin_symbol)
-                        if balance * current_price > 5000:
-                            logging.info(f"[SELL-Profit] {ticker} | Rate: {profit_rate:.2f}% | RSI: {rsi:.2f}")
-                            upbit.sell_market_order(ticker, balance)
-                            state['holding'] = False
-
-                    # 2. 손절: 1.5% 손실 (안전 장치)
-                    elif profit_rate <= -1.5:
-                        coin_symbol = ticker.split("-")[1]
-                        balance = get_balance(coin_symbol)
-                        if balance * current_price > 5000:
-                            logging.warn(f"[SELL-Loss] {ticker} | Rate: {profit_rate:.2f}%")
-                            upbit.sell_market_order(ticker, balance)
-                            state['holding'] = False
-                
-                time.sleep(0.5) # API 호출 제한 방지
-            except Exception as e:
-                logging.error(f"Error in {ticker}: {e}")
-                time.sleep(1)
-
-        time.sleep(1)
-    except Exception as e:
-        logging.error(f"Main Loop Error: {e}")
-        time.sleep(5)
+            states[ticker]['trade_count_today'] = 0
+        journal.set('current_day', session['current_day'])
+        logging.info("New day started. Trade counts reset.")
+
+def check_ticker(ticker, price=None, ts=None):
+    """종목 하나의 매수 / 익절 / 손절 판단 (price: 피드의 실시간 가격, 없으면 캔들 종가)"""
+    signal_at = ts or time.time()
+    with metrics.timer("indicators"):
+        info = get_indicators(ticker, price)
+        rsi = get_rsi(ticker, price=price)
+    state = states[ticker]
+    current_price = price or info['current_price']
+
+    # 매수 로직: RSI가 35 이하이면서 가격이 볼린저 밴드 하단 근처일 때
+    if not state['holding']:
+        entry = rsi <= 35 and current_price <= info['lower_band'] * 1.01
+        trades.signal(ticker, "buy" if entry else "hold", current_price, value=rsi, ref=info['lower_band'], ts=ts)
+        if entry:
+            # 여러 종목이 동시에 진입해도 원화 잔고는 한 번에 하나씩 사용
+            with async_core.order_lock:
+                krw = get_balance("KRW")
+                buy_amount = krw * 0.3 # 가용 자금의 30% 투자
+                if buy_amount > 5000:
+                    logging.info(f"[BUY] {ticker} | Price: {current_price} | RSI: {rsi:.2f}")
+                    order = account.buy_market_order(ticker, buy_amount * 0.9995)
+                    trades.order(ticker, "bid", order, reason="rsi_band", price=current_price, funds=buy_amount * 0.9995)
+                    fill = tracker.wait(order)
+                    trades.fill(fill, reason="rsi_band", ticker=ticker)
+                    if fill is not None and fill['volume']:
+                        # 익절/손절 기준은 주문 전 가격이 아닌 실제 체결 평균가
+                        state['holding'] = True
+                        state['purchase_price'] = fill['avg_price']
+                        logging.info(f"[FILL] {ticker} | {fill['volume']:.8g} @ {fill['avg_price']:,.4f} | Fee: {fill['fee']:,.2f}")
+
+    # 매도 로직: 익절 1.5% 또는 RSI가 65 이상으로 과열될 때
+    elif state['holding']:
+        profit_rate = (current_price / state['purchase_price'] - 1) * 100
+        exit_reason = "tp" if profit_rate >= 1.5 or rsi >= 65 else "sl" if profit_rate <= -1.5 else ""
+        trades.signal(ticker, "sell" if exit_reason else "hold", current_price, value=rsi,
+                      ref=state['purchase_price'], reason=exit_reason, ts=ts)
+
+        # 1. 익절: 1.5% 수익 OR RSI 65 이상
+        if exit_reason == "tp":
+            coin_symbol = ticker.split("-")[1]
+            balance = get_balance(coin_symbol)
+            if balance * current_price > 5000:
+                logging.info(f"[SELL-Profit] {ticker} | Rate: {profit_rate:.2f}% | RSI: {rsi:.2f}")
+                trades.order(ticker, "ask", account.sell_market_order(ticker, balance), reason="tp",
+                             price=current_price, volume=balance, tracker=tracker)
+                metrics.since("tick_to_order", signal_at, reason="tp")
+                state['holding'] = False
+
+        # 2. 손절: 1.5% 손실 (안전 장치)
+        elif exit_reason == "sl":
+            coin_symbol = ticker.split("-")[1]
+            balance = get_balance(coin_symbol)
+            if balance * current_price > 5000:
+                logging.warn(f"[SELL-Loss] {ticker} | Rate: {profit_rate:.2f}%")
+                trades.order(ticker, "ask", account.sell_market_order(ticker, balance), reason="sl",
+                             price=current_price, volume=balance, tracker=tracker)
+                metrics.since("tick_to_order", signal_at, reason="sl")
+                state['holding'] = False
+
+    # 상태가 바뀌었으면 저널 기록 (그대로면 쓰지 않음)
+    journal.set(f'states/{ticker}', state)
+
+def run_bot():
+    """기존 방식: 종목을 순서대로 돌며 판단 (--legacy)"""
+    while True:
+        try:
+            with metrics.timer("loop"):
+                check_day()
+
+                # 이번 틱 시세를 전 종목 한 번에 조회 (지표 캔들은 봉 마감 때만 다시 받음)
+                snapshot = quotes.fetch_quotes(TICKERS)
+                for ticker in TICKERS:
+                    try:
+                        check_ticker(ticker, snapshot.get(ticker), snapshot.ts)
+                    except Exception as e:
+                        logging.error(f"Error in {ticker}: {e}")
+                        time.sleep(1)
+
+            time.sleep(1)
+        except Exception as e:
+            logging.error(f"Main Loop Error: {e}")
+            time.sleep(5)
+
+def run_bot_async(feed=None):
+    """이벤트 방식: 종목별 작업이 동시에 돌며 가격이 들어오는 즉시 판단"""
+    core = async_core.AsyncTradingCore(
+        TICKERS,
+        feed=feed,
+        on_snapshot=lambda snapshot: check_day(),
+        on_price=lambda ticker, price, snapshot: check_ticker(ticker, price, snapshot.ts),
+    )
+    async_core.run(core)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RSI + 볼린저 밴드 스캘핑 봇")
+    parser.add_argument("--legacy", action="store_true", help="기존 while 루프 방식으로 실행")
+    args = parser.parse_args()
+    metrics.start(summary_path="bot2_metrics.json")  # METRICS_PORT=9100 이면 /metrics 엔드포인트도 열림
+    if args.legacy:
+        run_bot()
+    else:
+        run_bot_async()
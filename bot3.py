@@ -5,7 +5,18 @@ import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
-import requests
+import candle_cache
+import indicators
+import quotes
+import argparse
+import async_core
+import account_state
+import rate_limiter
+import notifier
+import order_tracker
+import metrics
+import state_journal
+import trade_journal
 
 # [최종병기 bot3.5] 로깅 설정
 logging.basicConfig(
@@ -27,50 +38,41 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 TICKERS = ["KRW-BTC", "KRW-ETH", "KRW-SOL"]
 last_report_date = None 
 
+# 백그라운드 전송 (몰린 메시지는 한 통으로 합침, 매매 루프는 기다리지 않음)
+telegram = notifier.TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, prefix="🤖 [Bot3.5-Survivor]\n")
+
 def send_telegram(message):
-    """텔레그램 메시지 전송"""
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    params = {"chat_id": TELEGRAM_CHAT_ID, "text": f"🤖 [Bot3.5-Survivor]\n{message}"}
-    try:
-        requests.get(url, params=params)
-    except Exception as e:
-        logging.error(f"텔레그램 전송 실패: {e}")
+    """텔레그램 메시지 전송 예약"""
+    telegram.send(message)
 
-def get_indicators(ticker):
-    """지표 계산 (15분봉 기준 + 하락장 필터)"""
+def get_indicators(ticker, price=None):
+    """지표 계산 (15분봉 기준 + 하락장 필터)
+
+    price: 실시간 가격. 있으면 캔들은 봉 마감 때만 조회하고 진행 중인 봉은 이 가격으로 계산
+    """
     try:
-        df = pyupbit.get_ohlcv(ticker, interval="minute15", count=100)
-        if df is None or df.empty: return None
+        max_age = candle_cache.UNTIL_CLOSE if price else candle_cache.DEFAULT_MAX_AGE
+        df = candle_cache.get_candles(ticker, interval="minute15", count=100, max_age=max_age)
+        if df is None or not len(df): return None
         
         # [안전장치] 60분봉 20일 이평선으로 대추세 확인 (역배열 매수 방지)
-        df_60 = pyupbit.get_ohlcv(ticker, interval="minute60", count=40)
-        ma20_60 = df_60['close'].rolling(window=20).mean().iloc[-1]
-        is_falling_market = df['close'].iloc[-1] < ma20_60
-        
-        # RSI 계산
-        delta = df['close'].diff()
-        ups, downs = delta.copy(), delta.copy()
-        ups[ups < 0], downs[downs > 0] = 0, 0
-        period = 14
-        au = ups.ewm(com=period-1, min_periods=period).mean()
-        ad = downs.abs().ewm(com=period-1, min_periods=period).mean()
-        rsi = 100 - (100 / (1 + au / ad))
+        # 60분봉은 봉이 마감될 때만 다시 조회
+        df_60 = candle_cache.get_candles(ticker, interval="minute60", count=40, max_age=candle_cache.UNTIL_CLOSE)
+        ma20_60 = indicators.get_moving_average(ticker, "minute60", 20).update(df_60).value(price)
         
-        # 볼린저 밴드
-        ma20 = df['close'].rolling(window=20).mean()
-        std = df['close'].rolling(window=20).std()
-        upper_band = ma20 + (std * 2)
-        lower_band = ma20 - (std * 2)
+        # RSI(14) + 볼린저 밴드(20, 2) 증분 계산 (새로 확정된 봉만 반영)
+        snap = indicators.get_state(ticker, "minute15", rsi_window=99).update(df).snapshot(price)
+        is_falling_market = snap['current_price'] < ma20_60
         
         # 변동성 기반 동적 익절 목표
-        bandwidth = (upper_band.iloc[-1] - lower_band.iloc[-1]) / ma20.iloc[-1] * 100
+        bandwidth = snap['bandwidth']
         # 장이 조용하면 1.2%, 변동성이 크면 최대 3.5%까지 익절 목표 상향
         dynamic_target = max(1.2, min(3.5, bandwidth * 0.7))
         
         return {
-            "current_price": df['close'].iloc[-1],
-            "rsi": rsi.iloc[-1],
-            "lower_band_safety": lower_band.iloc[-1] * 1.005, # 0.5% 유격으로 진입 빈도 확보
+            "current_price": snap['current_price'],
+            "rsi": snap['rsi'],
+            "lower_band_safety": snap['lower_band'] * 1.005, # 0.5% 유격으로 진입 빈도 확보
             "dynamic_target": dynamic_target,
             "is_falling_market": is_falling_market
         }
@@ -79,34 +81,26 @@ def get_indicators(ticker):
         return None
 
 def get_balance_info(ticker):
-    """코인 잔고 및 평단가 조회"""
+    """코인 잔고 및 평단가 조회 (잔고 캐시)"""
     try:
-        balances = upbit.get_balances()
-        symbol = ticker.split("-")[1]
-        for b in balances:
-            if b['currency'] == symbol:
-                return {"balance": float(b['balance']), "avg_buy_price": float(b['avg_buy_price'])}
-        return {"balance": 0, "avg_buy_price": 0}
+        return {"balance": account.balance(ticker), "avg_buy_price": account.avg_buy_price(ticker)}
     except: return {"balance": 0, "avg_buy_price": 0}
 
 def get_total_equity():
     """총 자산 가치(KRW) 계산"""
     try:
-        balances = upbit.get_balances()
-        total = 0
-        for b in balances:
-            if b['currency'] == "KRW":
-                total += float(b['balance']) + float(b['locked'])
-            else:
-                price = pyupbit.get_current_price(f"KRW-{b['currency']}")
-                if price:
-                    total += (float(b['balance']) + float(b['locked'])) * price
-        return total
+        balances = account.balances()
+        # 보유 종목 시세는 한 번의 요청으로 조회
+        snapshot = quotes.fetch_quotes(quotes.held_tickers(balances))
+        return quotes.calc_wealth(balances, snapshot)
     except: return 0
 
 # 로그인 및 가동 시작
 try:
+    rate_limiter.install()  # 모든 pyupbit 요청을 그룹별 토큰 버킷으로 조절 (봇 여러 개가 같은 예산 공유)
     upbit = pyupbit.Upbit(ACCESS_KEY, SECRET_KEY)
+    account = account_state.AccountState(upbit)  # 잔고/평단가 캐시 (주문 시 자동 무효화)
+    tracker = order_tracker.OrderTracker(upbit)  # 주문 uuid 로 체결 확인
     msg = "🚀 봇 가동 시작!\n- 하락장 필터 작동\n- RSI 35/볼밴 진입\n- 9시 보고서 활성"
     logging.info(msg)
     send_telegram(msg)
@@ -114,77 +108,138 @@ except Exception as e:
     logging.error(f"로그인 실패: {e}")
     exit()
 
-# 상태 초기화
+# 상태 초기화 (재시작이면 저널의 추매 단계 / 보고일 복원 — 2차 매수를 이미 한 종목에 다시 추매하지 않도록)
+journal = state_journal.StateJournal("bot3")
+trades = trade_journal.TradeJournal("bot3")  # 신호 판단 / 주문 / 체결 / 일일 정산 기록 (trade_journal.py 로 집계)
+saved = journal.load()
+last_report_date = saved.get('last_report_date')
 states = {}
 for ticker in TICKERS:
     coin = get_balance_info(ticker)
-    states[ticker] = {'step': 1 if coin['balance'] > 0 else 0}
+    saved_step = journal.get(f'states/{ticker}', {}).get('step', 0)
+    states[ticker] = {'step': max(saved_step, 1) if coin['balance'] > 0 else 0}
 
-while True:
-    try:
-        now = datetime.datetime.now()
-        
-        # [보고서] 매일 아침 9시 자산 현황 보고
-        if now.hour == 9 and now.minute == 0 and last_report_date != now.date():
-            equity = get_total_equity()
-            send_telegram(f"📅 일일 자산 요약\n현재 총 자산: {equity:,.0f} KRW")
-            last_report_date = now.date()
-
-        for ticker in TICKERS:
-            info = get_indicators(ticker)
-            if not info: continue
-            
-            curr_price = info['current_price']
-            coin = get_balance_info(ticker)
-            state = states[ticker]
-            
-            if coin['balance'] > 0:
-                profit_rate = (curr_price / coin['avg_buy_price'] - 1) * 100
-            else:
-                state['step'] = 0
-                profit_rate = 0
-
-            # [1] 1차 매수 진입 (추세 확인 + 과매도)
-            if state['step'] == 0:
-                # RSI 35 이하이거나 볼밴 하단 터치 시 + 단기 하락세가 멈췄을 때
-                if (info['rsi'] <= 35 or curr_price <= info['lower_band_safety']) and not info['is_falling_market']:
-                    krw = upbit.get_balance("KRW")
-                    if krw > 10000:
-                        buy_money = krw * 0.2 # 1차 비중 20%
-                        upbit.buy_market_order(ticker, buy_money * 0.9995)
+def check_report(now=None):
+    """[보고서] 매일 아침 9시 자산 현황 보고"""
+    global last_report_date
+    now = now or datetime.datetime.now()
+    if now.hour == 9 and now.minute == 0 and last_report_date != now.date():
+        equity = get_total_equity()
+        send_telegram(f"📅 일일 자산 요약\n현재 총 자산: {equity:,.0f} KRW")
+        trades.settle(equity)
+        last_report_date = now.date()
+        journal.set('last_report_date', last_report_date)
+
+def check_ticker(ticker, price=None, ts=None):
+    """종목 하나의 진입 / 추매 / 익절 / 손절 판단 (price: 피드의 실시간 가격, 없으면 캔들 종가)"""
+    signal_at = ts or time.time()
+    with metrics.timer("indicators"):
+        info = get_indicators(ticker, price)
+    if not info: return
+
+    curr_price = price or info['current_price']
+    coin = get_balance_info(ticker)
+    state = states[ticker]
+
+    if coin['balance'] > 0:
+        profit_rate = (curr_price / coin['avg_buy_price'] - 1) * 100
+    else:
+        state['step'] = 0
+        profit_rate = 0
+    decision, reason = "hold", ""
+
+    # [1] 1차 매수 진입 (추세 확인 + 과매도)
+    if state['step'] == 0:
+        # RSI 35 이하이거나 볼밴 하단 터치 시 + 단기 하락세가 멈췄을 때
+        if (info['rsi'] <= 35 or curr_price <= info['lower_band_safety']) and not info['is_falling_market']:
+            decision, reason = "buy", "entry"
+            # 여러 종목이 동시에 진입해도 원화 잔고는 한 번에 하나씩 사용
+            with async_core.order_lock:
+                krw = account.balance("KRW")
+                if krw > 10000:
+                    buy_money = krw * 0.2 # 1차 비중 20%
+                    order = account.buy_market_order(ticker, buy_money * 0.9995)
+                    trades.order(ticker, "bid", order, reason="entry", price=curr_price, funds=buy_money * 0.9995)
+                    fill = tracker.wait(order)
+                    trades.fill(fill, reason="entry", ticker=ticker)
+                    if fill is not None and fill['volume']:
                         state['step'] = 1
-                        send_telegram(f"🟢 [{ticker}] 진입\n가격: {curr_price:,}원\n목표익절: {info['dynamic_target']:.1f}%")
-                        time.sleep(2)
-
-            # [2] 2차 매수 (추매/DCA)
-            elif state['step'] == 1:
-                # 평단가 대비 3% 이상 하락 & RSI 40 이하로 다시 눌렸을 때
-                if curr_price <= coin['avg_buy_price'] * 0.97 and info['rsi'] <= 40:
-                    krw = upbit.get_balance("KRW")
-                    if krw > 10000:
-                        buy_money = (coin['balance'] * coin['avg_buy_price']) * 1.0 # 1차만큼 더 삼
-                        upbit.buy_market_order(ticker, min(buy_money, krw * 0.95))
+                        send_telegram(f"🟢 [{ticker}] 진입\n체결가: {fill['avg_price']:,.4f}원 x {fill['volume']:.8g}\n목표익절: {info['dynamic_target']:.1f}%")
+
+    # [2] 2차 매수 (추매/DCA)
+    elif state['step'] == 1:
+        # 평단가 대비 3% 이상 하락 & RSI 40 이하로 다시 눌렸을 때
+        if curr_price <= coin['avg_buy_price'] * 0.97 and info['rsi'] <= 40:
+            decision, reason = "buy", "dca"
+            with async_core.order_lock:
+                krw = account.balance("KRW")
+                if krw > 10000:
+                    buy_money = (coin['balance'] * coin['avg_buy_price']) * 1.0 # 1차만큼 더 삼
+                    order = account.buy_market_order(ticker, min(buy_money, krw * 0.95))
+                    trades.order(ticker, "bid", order, reason="dca", price=curr_price, funds=min(buy_money, krw * 0.95))
+                    fill = tracker.wait(order)
+                    trades.fill(fill, reason="dca", ticker=ticker)
+                    if fill is not None and fill['volume']:
                         state['step'] = 2
-                        send_telegram(f"🟡 [{ticker}] 전략적 추매\n수익률: {profit_rate:.2f}%\n평단가 관리 완료")
-                        time.sleep(2)
-
-            # [3] 매도 (익절/손절)
-            if coin['balance'] > 0:
-                # 익절: 동적 목표 달성 시
-                if profit_rate >= info['dynamic_target']:
-                    upbit.sell_market_order(ticker, coin['balance'])
-                    state['step'] = 0
-                    send_telegram(f"🔵 [{ticker}] 익절 완료!\n수익: +{profit_rate:.2f}% ✨")
-                
-                # 손절: 2차 매수 후에도 평단가 대비 5% 하락 시 (최후의 보루)
-                elif state['step'] == 2 and profit_rate <= -5.0:
-                    upbit.sell_market_order(ticker, coin['balance'])
-                    state['step'] = 0
-                    send_telegram(f"🔴 [{ticker}] 손절 완료 (원금보호)\n손실: {profit_rate:.2f}% 🚨")
-
-            time.sleep(0.5)
-        time.sleep(1)
-        
-    except Exception as e:
-        logging.error(f"메인 루프 에러: {e}")
-        time.sleep(10)
\ No newline at end of file
+                        send_telegram(f"🟡 [{ticker}] 전략적 추매\n수익률: {profit_rate:.2f}%\n추매 체결가: {fill['avg_price']:,.4f}원\n새 평단가: {account.avg_buy_price(ticker):,.4f}원")
+
+    # [3] 매도 (익절/손절)
+    if coin['balance'] > 0:
+        # 익절: 동적 목표 달성 시
+        if profit_rate >= info['dynamic_target']:
+            decision, reason = "sell", "tp"
+            trades.order(ticker, "ask", account.sell_market_order(ticker, coin['balance']), reason="tp",
+                         price=curr_price, volume=coin['balance'], tracker=tracker)
+            metrics.since("tick_to_order", signal_at, reason="tp")
+            state['step'] = 0
+            send_telegram(f"🔵 [{ticker}] 익절 완료!\n수익: +{profit_rate:.2f}% ✨")
+
+        # 손절: 2차 매수 후에도 평단가 대비 5% 하락 시 (최후의 보루)
+        elif state['step'] == 2 and profit_rate <= -5.0:
+            decision, reason = "sell", "sl"
+            trades.order(ticker, "ask", account.sell_market_order(ticker, coin['balance']), reason="sl",
+                         price=curr_price, volume=coin['balance'], tracker=tracker)
+            metrics.since("tick_to_order", signal_at, reason="sl")
+            state['step'] = 0
+            send_telegram(f"🔴 [{ticker}] 손절 완료 (원금보호)\n손실: {profit_rate:.2f}% 🚨")
+
+    trades.signal(ticker, decision, curr_price, value=info['rsi'], ref=info['lower_band_safety'], reason=reason, ts=ts)
+    # 추매 단계가 바뀌었으면 저널 기록 (그대로면 쓰지 않음)
+    journal.set(f'states/{ticker}', state)
+
+def run_bot():
+    """기존 방식: 종목을 순서대로 돌며 판단 (--legacy)"""
+    while True:
+        try:
+            with metrics.timer("loop"):
+                check_report()
+
+                # 이번 틱 시세를 전 종목 한 번에 조회 (지표 캔들은 봉 마감 때만 다시 받음)
+                snapshot = quotes.fetch_quotes(TICKERS)
+                for ticker in TICKERS:
+                    check_ticker(ticker, snapshot.get(ticker), snapshot.ts)
+            time.sleep(1)
+
+        except Exception as e:
+            logging.error(f"메인 루프 에러: {e}")
+            time.sleep(10)
+
+def run_bot_async(feed=None):
+    """이벤트 방식: 종목별 작업이 동시에 돌며 가격이 들어오는 즉시 판단"""
+    core = async_core.AsyncTradingCore(
+        TICKERS,
+        feed=feed,
+        on_snapshot=lambda snapshot: check_report(),
+        on_price=lambda ticker, price, snapshot: check_ticker(ticker, price, snapshot.ts),
+    )
+    async_core.run(core)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart DCA 봇")
+    parser.add_argument("--legacy", action="store_true", help="기존 while 루프 방식으로 실행")
+    args = parser.parse_args()
+    metrics.start(summary_path="bot3_metrics.json")  # METRICS_PORT=9100 이면 /metrics 엔드포인트도 열림
+    if args.legacy:
+        run_bot()
+    else:
+        run_bot_async()
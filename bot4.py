@@ -1,9 +1,24 @@
 import time
+import threading
 import pyupbit
 import datetime
 import os
 import logging
-import requests
+import argparse
+import async_core
+import account_state
+import rate_limiter
+import http_pool
+import notifier
+import order_tracker
+import order_batch
+import metrics
+import candle_cache
+import quotes
+import indicators
+import scanner
+import state_journal
+import trade_journal
 from dotenv import load_dotenv
 
 # [Bot4 - V4.2 Ultimate Survival Edition]
@@ -36,22 +51,20 @@ SURVIVOR_GOAL = 0.012       # 하락/횡보장 최소 목표 (+1.2%)
 BULL_GOAL = 0.025          # 상승장 최소 목표 (+2.5%)
 STRICT_SL = -0.05          # 개별 종목 절대 손절선 (-5%)
 
+# 백그라운드 전송 (몰린 메시지는 한 통으로 합침, 매매 루프는 기다리지 않음)
+telegram = notifier.TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, prefix="🚨 [Survival-V4.2]\n")
+
 def send_telegram(message):
     logging.info(f"[Telegram] {message}")
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    params = {"chat_id": TELEGRAM_CHAT_ID, "text": f"🚨 [Survival-V4.2]\n{message}"}
-    try:
-        requests.get(url, params=params, timeout=5)
-    except:
-        pass
+    telegram.send(message)
 
-def get_market_state(current_state):
+def get_market_state(current_state, snapshot=None):
     """상승장인지 하락/횡보장인지 판단 (BTC 기준, 0.2% 버퍼를 두어 잦은 변경 방지)"""
     try:
-        # 1시간봉 기준 최근 6시간 평균선 확인
-        df = pyupbit.get_ohlcv("KRW-BTC", interval="minute60", count=6)
-        ma6 = df['close'].rolling(window=6).mean().iloc[-1]
-        curr_p = pyupbit.get_current_price("KRW-BTC")
+        curr_p = snapshot.get("KRW-BTC") if snapshot else pyupbit.get_current_price("KRW-BTC")
+        # 1시간봉 기준 최근 6시간 평균선 확인 (캔들은 봉 마감 때만 조회, 진행 중인 봉은 실시간 가격)
+        df = candle_cache.get_candles("KRW-BTC", interval="minute60", count=6, max_age=candle_cache.UNTIL_CLOSE)
+        ma6 = indicators.get_moving_average("KRW-BTC", "minute60", 6).update(df).value(curr_p)
         
         BUFFER = 0.002 # 0.2% 여유폭
         
@@ -68,168 +81,352 @@ def get_market_state(current_state):
     except:
         return "BEAR"
 
-def get_indicators(ticker):
-    """15분봉 RSI 및 볼린저 밴드 하단"""
+def get_indicators(ticker, price=None):
+    """15분봉 RSI 및 볼린저 밴드 하단 (price: 실시간 가격 — 있으면 캔들은 봉 마감 때만 조회)"""
     try:
-        df = pyupbit.get_ohlcv(ticker, interval="minute15", count=100)
-        delta = df['close'].diff()
-        ups, downs = delta.copy(), delta.copy()
-        ups[ups < 0], downs[downs > 0] = 0, 0
-        au = ups.ewm(com=13, min_periods=14).mean()
-        ad = downs.abs().ewm(com=13, min_periods=14).mean()
-        rsi = 100 - (100 / (1 + au / ad))
-        lower_band = df['close'].rolling(window=20).mean() - (df['close'].rolling(window=20).std() * 2)
-        return rsi.iloc[-1], lower_band.iloc[-1]
+        with metrics.timer("indicators"):
+            max_age = candle_cache.UNTIL_CLOSE if price else candle_cache.DEFAULT_MAX_AGE
+            df = candle_cache.get_candles(ticker, interval="minute15", count=100, max_age=max_age)
+            snap = indicators.get_state(ticker, "minute15", rsi_window=99).update(df).snapshot(price)
+        return snap['rsi'], snap['lower_band']
     except: return None, None
 
-def get_total_wealth(upbit):
+def get_total_wealth(account, snapshot=None):
     try:
-        balances = upbit.get_balances()
-        total = 0
-        for b in balances:
-            price = pyupbit.get_current_price(f"KRW-{b['currency']}") if b['currency'] != "KRW" else 1
-            if price: total += (float(b['balance']) + float(b['locked'])) * price
-        return total
+        balances = account.balances()
+        if snapshot is None:
+            snapshot = quotes.fetch_quotes(quotes.held_tickers(balances))
+        return quotes.calc_wealth(balances, snapshot)
     except: return 0
 
-def get_coin_balances(upbit):
+def get_coin_balances(account):
     try:
-        balances = upbit.get_balances()
-        return {f"KRW-{b['currency']}": float(b['balance']) + float(b['locked']) for b in balances if b['currency'] != "KRW"}
+        return account.coin_balances()
     except: return {}
 
 # ---------------------------------------------------------------------
 # 실행 엔진
 # ---------------------------------------------------------------------
+rate_limiter.install()  # 모든 pyupbit 요청을 그룹별 토큰 버킷으로 조절 (봇 여러 개가 같은 예산 공유)
 upbit = pyupbit.Upbit(ACCESS_KEY, SECRET_KEY)
+account = account_state.AccountState(upbit)  # 잔고/평단가 캐시 (주문 시 자동 무효화)
+tracker = order_tracker.OrderTracker(upbit)  # 주문 uuid 로 체결 확인
+journal = state_journal.StateJournal("bot4")  # 재시작해도 기준 자산 / 당일 익절 종목 / 정산일 유지
+trades = trade_journal.TradeJournal("bot4")  # 신호 판단 / 주문 / 체결 / 9시 정산 기록 (trade_journal.py 로 집계)
+batch = order_batch.BatchExecutor(account, tracker, journal=trades)  # 9시 장정리 / 목표 달성 매도를 한 번에 전송
+# 비동기 모드에서는 스냅샷 판단(9시 리셋 / 목표 달성) / 종목별 판단 / 잔고 갱신 작업이 서로 다른 스레드에서
+# 같은 state 를 읽고 쓴다. 잠금은 state 를 읽고 바꾸는 동안만 잡고(조회 / 주문 / 체결 대기는 잠금 밖),
+# 주문을 보내는 종목은 state['busy'] 에 표시해 다른 워커가 같은 물량으로 주문하지 않게 한다.
+state_lock = threading.RLock()
+FEE = 0.0011               # 업비트 수수료 (매수/매도 합산 + 여유치)
+# 재시작 시 복원하는 상태 (나머지는 계좌에서 다시 읽음)
+PERSISTED = ('base_asset', 'last_reset_date', 'target_achieved', 'daily_profits_done',
+             'm_state', 'current_target', 'current_indiv_tp')
 
-def run_bot():
-    base_asset = get_total_wealth(upbit)
-    last_reset_date = datetime.datetime.now().date()
-    target_achieved = False
-    daily_profits_done = set()  # 당일 익절 완료된 종목 추적
-    FEE = 0.0011               # 업비트 수수료 (매수/매도 합산 + 여유치)
-    
+def init_state():
+    """가동 시 기준 자산 / 시장 모드 / 보유 현황을 읽어 봇 상태 dict 를 만든다"""
+    saved = journal.load()
     # 가동 시 시장 모드 판단
     m_state = get_market_state("BEAR")
-    current_target = BULL_GOAL if m_state == "BULL" else SURVIVOR_GOAL
-    current_indiv_tp = BULL_GOAL if m_state == "BULL" else SURVIVOR_GOAL # 개별 익절가도 시장에 맞춤
-
-    send_telegram(f"🔥 생존 프로토콜 V4.2 가동\n- 현재 시장: {m_state} 모드\n- 목표 수익률: {current_target*100:.1f}%\n- 종목별 손절선: {STRICT_SL*100}%")
+    state = {
+        'base_asset': get_total_wealth(account),
+        'last_reset_date': state_journal.session_date(),  # 9시 전에 켜도 그날 9시 정산은 한다
+        'target_achieved': False,
+        'daily_profits_done': set(),  # 당일 익절 완료된 종목 추적
+        'm_state': m_state,
+        'current_target': BULL_GOAL if m_state == "BULL" else SURVIVOR_GOAL,
+        'current_indiv_tp': BULL_GOAL if m_state == "BULL" else SURVIVOR_GOAL,  # 개별 익절가도 시장에 맞춤
+        'resetting': False,  # 9시 정산 중 (종목 판단 쉼)
+        'busy': set(),       # 주문을 보내는 중인 종목
+        'orders': 0,         # 끝난 주문 수 (잔고 조회 중 주문이 끝났으면 그 조회 결과는 버린다)
+    }
+    if saved.get('base_asset'):
+        # 재시작: 기준 자산을 현재 자산으로 다시 잡으면 일일 손익 판정이 틀어지므로 저장된 값 사용
+        state.update({k: saved[k] for k in PERSISTED if k in saved})
+        send_telegram(f"♻️ 상태 복원\n- 자산 기준: {state['base_asset']:,.0f}원 (정산일 {state['last_reset_date']})\n"
+                      f"- 시장: {state['m_state']} 모드 / 목표 달성: {state['target_achieved']}\n"
+                      f"- 당일 익절 종목: {', '.join(sorted(state['daily_profits_done'])) or '-'}")
+    save_state(state)
+    send_telegram(f"🔥 생존 프로토콜 V4.2 가동\n- 현재 시장: {state['m_state']} 모드\n- 목표 수익률: {state['current_target']*100:.1f}%\n- 종목별 손절선: {STRICT_SL*100}%")
 
     # 가동 시 잔고 정보 로드 (상태 출항용)
-    balances = upbit.get_balances() 
-    initial_coin_bals = {f"KRW-{b['currency']}": float(b['balance']) + float(b['locked']) for b in balances if b['currency'] != "KRW"}
-    initial_avg_buy_prices = {f"KRW-{b['currency']}": float(b['avg_buy_price']) for b in balances if b['currency'] != "KRW"}
+    refresh_account(state)
 
     # 가동 시 이미 보유 중인 코인이 있다면 기준가 출력
-    for t, amt in initial_coin_bals.items():
+    for t, amt in state['coin_bals'].items():
         if t in TICKERS and amt > 1e-8:
-            avg_p = initial_avg_buy_prices.get(t, 0)
+            avg_p = state['avg_buy_prices'].get(t, 0)
             if avg_p > 0:
-                target_p = avg_p * (1 + current_indiv_tp + FEE)
+                target_p = avg_p * (1 + state['current_indiv_tp'] + FEE)
                 stop_p = avg_p * (1 + STRICT_SL + FEE)
-                send_telegram(f"🔍 [보유 확인] {t}\n- 평단가: {avg_p:,}원\n- 익절가: {target_p:,.0f}원 (+{current_indiv_tp*100:.1f}%)\n- 손절가: {stop_p:,.0f}원 ({STRICT_SL*100:.1f}%)")
+                send_telegram(f"🔍 [보유 확인] {t}\n- 평단가: {avg_p:,}원\n- 익절가: {target_p:,.0f}원 (+{state['current_indiv_tp']*100:.1f}%)\n- 손절가: {stop_p:,.0f}원 ({STRICT_SL*100:.1f}%)")
+    return state
+
+def save_state(state):
+    """복원 대상 상태를 저널에 기록 (바뀐 값만 쓰므로 매 루프 불러도 됨, state_lock 안에서 호출)"""
+    journal.update({k: state[k] for k in PERSISTED})
+
+def refresh_account(state):
+    """잔고 캐시에서 보유 수량 / 평단가 / 원화 잔고 읽기 (주기가 지났거나 주문 직후에만 API 조회)
+
+    조회는 잠금 밖에서 한다. 조회하는 동안 주문이 나갔거나 끝났으면 주문 전 잔고일 수 있으므로 반영하지 않고 False.
+    """
+    with state_lock:
+        orders = state['orders']
+    coin_bals, avg_buy_prices, krw_bal = account.coin_balances(), account.avg_buy_prices(), account.balance("KRW")
+    with state_lock:
+        if state['busy'] or state['orders'] != orders:
+            return False
+        state['coin_bals'], state['avg_buy_prices'], state['krw_bal'] = coin_bals, avg_buy_prices, krw_bal
+    return True
+
+def release(state, ticker):
+    """주문 끝: 종목 표시 해제 (state_lock 안에서 호출)"""
+    state['busy'].discard(ticker)
+    state['orders'] += 1
+
+def settle_day(state, snapshot, now):
+    """9시 정산: 장정리 매도 / 생존 판정 / 새 기준 자산 (정산 중에는 종목 판단이 쉰다)"""
+    with state_lock:
+        if state['resetting']:
+            return
+        state['resetting'] = True
+        # 주문 중인 종목은 그 주문이 물량을 정리하므로 장정리 대상에서 뺀다
+        coin_bals = {t: amt for t, amt in state['coin_bals'].items() if t in TICKERS and t not in state['busy']}
+        avg_buy_prices = dict(state['avg_buy_prices'])
+        base_asset = state['base_asset']
+        indiv_tp = state['current_indiv_tp']
+    try:
+        # 스냅샷에 시세가 빠진 보유 종목은 따로 조회 (없는 채로 정산하면 그 종목은 그날 장정리 / 보고에서 빠진다)
+        missing = [t for t in coin_bals if avg_buy_prices.get(t, 0) > 0 and not snapshot.get(t)]
+        if missing:
+            snapshot = quotes.QuoteSnapshot({**snapshot.prices, **quotes.fetch_quotes(missing).prices}, snapshot.ts)
+            if not all(snapshot.get(t) for t in missing):
+                logging.warning(f"9시 정산 보류: 시세 없음 {missing} (다음 스냅샷에서 다시 시도)")
+                return
+        current_wealth = get_total_wealth(account, snapshot)
+        final_profit_rate = (current_wealth / base_asset) - 1 if base_asset > 0 else 0
+        trades.settle(current_wealth, reason="daily")
+
+        # [생존 판독] 하루 1.2% 수익 못 내면 시스템 종료 경고
+        if final_profit_rate < 0.012:
+            send_telegram(f"⚠️ [생존 실패] 일일 수익률 {final_profit_rate*100:.2f}%로 목표(1.2%) 미달.\n약속대로 시스템을 종료(삭제) 대기 모드로 전환합니다. 💀")
+
+        # 장정리 대상을 먼저 모아 한 번에 매도 (종목별로 차례차례 보내지 않음)
+        exits, rates = [], []
+        for t, amt in coin_bals.items():
+            avg_p = avg_buy_prices.get(t, 0)
+            if avg_p > 0:
+                curr_p = snapshot.get(t)
+                p_rate = (curr_p / avg_p) - 1 - FEE
+                if p_rate >= 0 or p_rate <= STRICT_SL:
+                    exits.append(order_batch.exit_order(t, amt, "reset", curr_p))
+                    rates.append(f"- {t}: {p_rate*100:.2f}%")
+                else:
+                    target_p = avg_p * (1 + indiv_tp + FEE)
+                    stop_p = avg_p * (1 + STRICT_SL + FEE)
+                    send_telegram(f"🌅 9시 전략적 보유: {t}\n- 현재 수익률: {p_rate*100:.2f}%\n- 다음 목표가: {target_p:,.0f}원\n- 다음 손절가: {stop_p:,.0f}원")
+            else:
+                exits.append(order_batch.exit_order(t, amt, "reset"))
+        if exits:
+            # 새 기준 자산을 잡기 전에 체결까지 확인 (체결이 끝나면 잔고 캐시도 주문 후 무효화되어 있다)
+            result = batch.sell(exits)
+            send_telegram("🌅 9시 장정리 매도\n" + "\n".join(rates + [order_batch.report(result)]))
+
+        new_base = get_total_wealth(account)
+        with state_lock:
+            state['base_asset'] = new_base
+            state['target_achieved'] = False
+            state['daily_profits_done'] = set() # 일일 종목별 익절 기록 초기화
+            state['last_reset_date'] = state_journal.session_date(now)
+            state['orders'] += 1  # 장정리 전에 시작한 잔고 조회는 반영하지 않음
+            save_state(state)
+        refresh_account(state)
+        send_telegram(f"📅 새 날 시작\n- 자산 기준: {new_base:,.0f}원")
+    finally:
+        with state_lock:
+            state['resetting'] = False
+
+def check_portfolio(state, snapshot, now=None):
+    """9시 리셋 / 시장 상태 / 전체 목표 달성 판단 (스냅샷마다 한 번)"""
+    now = now or datetime.datetime.now()
+
+    # 9시 리셋 및 생존 판정 (재시작 등으로 9시를 놓쳤으면 바로 정산)
+    with state_lock:
+        due = state_journal.session_date(now) > state['last_reset_date']
+        m_state = state['m_state']
+    if due:
+        settle_day(state, snapshot, now)
+
+    # [실시간 시장 상태 갱신] 6시간 추세 실시간 반영 (버퍼 적용)
+    new_m_state = get_market_state(m_state, snapshot)
+    current_wealth = get_total_wealth(account, snapshot)
+    exits = None
+    with state_lock:
+        if new_m_state != state['m_state']:
+            state['m_state'] = new_m_state
+            state['current_target'] = BULL_GOAL if new_m_state == "BULL" else SURVIVOR_GOAL
+            state['current_indiv_tp'] = BULL_GOAL if new_m_state == "BULL" else SURVIVOR_GOAL
+            send_telegram(f"📉 시장 추세 변화 감지: {new_m_state} 모드로 전환\n- 새로운 목표 수익률: {state['current_target']*100:.1f}%")
+
+        base_asset = state['base_asset']
+        profit_rate = (current_wealth / base_asset) - 1 if base_asset > 0 else 0
+
+        # [조건 충족 시 즉시 종료 - 익절]
+        if profit_rate >= state['current_target'] and not state['target_achieved'] and not state['resetting']:
+            state['target_achieved'] = True  # 이후 종목 판단은 바로 반환
+            message = f"✅ {state['m_state']} 목표 달성! ({profit_rate*100:.2f}%)\n현 자산: {current_wealth:,.0f}원\n내일까지 휴식합니다."
+            # 주문 중인 종목은 그 주문이 물량을 정리하므로 빼고, 나머지는 다음 잔고 갱신 전에 다시 팔지 않도록 0 으로
+            coin_bals = state['coin_bals']
+            exits = [order_batch.exit_order(t, amt, "goal", snapshot.get(t)) for t, amt in coin_bals.items()
+                     if t in TICKERS and t not in state['busy']]
+            for o in exits:
+                coin_bals[o['ticker']] = 0
+        save_state(state)
+
+    if exits is not None:
+        # 전 종목 매도를 한 번에 보내고, 체결은 백그라운드에서 모아 한 통으로 알림
+        batch.sell(exits, callback=lambda result: send_telegram("\n".join(filter(None, (message, order_batch.report(result))))))
+        with state_lock:
+            state['orders'] += 1
+
+def check_ticker(state, ticker, curr_p, ts=None):
+    """종목 하나의 진입 / 익절 / 손절 판단 (ts: 시세 수신 시각, 신호 -> 주문 지연 계측용)"""
+    if not curr_p:
+        return
+    signal_at = ts or time.time()
+    # 판단에 쓸 값만 잠금 안에서 복사 (지표 계산 / 주문 / 체결 대기는 잠금 밖)
+    with state_lock:
+        if state['target_achieved'] or state['resetting'] or ticker in state['busy']:
+            return
+        amount = state['coin_bals'].get(ticker, 0)
+        avg_buy_price = state['avg_buy_prices'].get(ticker, 0)
+        profits_done = ticker in state['daily_profits_done']
+        indiv_tp = state['current_indiv_tp']
+
+    # 매수: RSI 30 이하 과매도 구간 사냥 (오늘 익절하지 않은 종목만)
+    if amount < 1e-8 and not profits_done:
+        rsi, l_band = get_indicators(ticker, curr_p)
+        entry = rsi is not None and (rsi <= 30 or curr_p <= l_band)
+        trades.signal(ticker, "buy" if entry else "hold", curr_p, value=rsi, ref=l_band, ts=ts)
+        if entry:
+            # 여러 종목이 동시에 진입해도 같은 원화 잔고를 나눠 쓰지 않도록 주문은 하나씩
+            with async_core.order_lock:
+                with state_lock:
+                    if (state['target_achieved'] or state['resetting'] or ticker in state['busy']
+                            or state['coin_bals'].get(ticker, 0) >= 1e-8 or state['krw_bal'] <= 5000):
+                        return
+                    funds = state['krw_bal'] * 0.2
+                    state['busy'].add(ticker)
+                fill = None
+                try:
+                    # 체결 완료까지 주문 상태를 조회한 뒤 잔고(평단가) 갱신
+                    order = account.buy_market_order(ticker, funds)
+                    trades.order(ticker, "bid", order, reason="rsi_band", price=curr_p, funds=funds)
+                    fill = tracker.wait(order)
+                    trades.fill(fill, reason="rsi_band", ticker=ticker)
+                finally:
+                    with state_lock:
+                        release(state, ticker)
+                        if fill is not None and fill['volume']:
+                            # 잔고 갱신이 밀려도 같은 종목을 다시 사지 않도록 체결 수량을 바로 반영
+                            state['coin_bals'][ticker] = fill['volume']
+                            state['avg_buy_prices'].setdefault(ticker, fill['avg_price'])
+                refresh_account(state)
+            if fill is None or not fill['volume']:
+                return
+            with state_lock:
+                avg_p = state['avg_buy_prices'].get(ticker) or fill['avg_price']
+            target_p = avg_p * (1 + indiv_tp + FEE)
+            stop_p = avg_p * (1 + STRICT_SL + FEE)
+            send_telegram(f"🎣 [{ticker}] 매수 완료\n- 매수가: {fill['avg_price']:,.4f}원 x {fill['volume']:.8g} (RSI:{rsi:.1f}, 수수료 {fill['fee']:,.0f}원)\n- 익절 목표: {target_p:,.0f}원\n- 손절 기준: {stop_p:,.0f}원")
+
+    # 매도: 실시간 업비트 평단가 기반 익절/손절
+    elif amount > 1e-8:
+        if avg_buy_price == 0: return # 평단가 정보를 가져올 수 없는 경우 무시
+
+        p_rate = (curr_p / avg_buy_price) - 1
+
+        # 실제 수익은 수수료를 제외해야 함
+        actual_p_rate = p_rate - FEE
+        exit_reason = "tp" if actual_p_rate >= indiv_tp else "sl" if actual_p_rate <= STRICT_SL else ""
+        trades.signal(ticker, "sell" if exit_reason else "hold", curr_p, value=actual_p_rate, ref=avg_buy_price,
+                      reason=exit_reason, ts=ts)
+        if not exit_reason:
+            return
+
+        # 그 사이 9시 정산 / 목표 달성 매도가 같은 물량을 가져갔으면 건너뜀
+        with state_lock:
+            if state['target_achieved'] or state['resetting'] or ticker in state['busy']:
+                return
+            volume = state['coin_bals'].get(ticker, 0)
+            if volume < 1e-8:
+                return
+            state['coin_bals'][ticker] = 0  # 다음 잔고 갱신 전에 같은 물량을 다시 팔지 않도록
+            state['busy'].add(ticker)
+        try:
+            trades.order(ticker, "ask", account.sell_market_order(ticker, volume), reason=exit_reason,
+                         price=curr_p, volume=volume, tracker=tracker)
+            metrics.since("tick_to_order", signal_at, reason=exit_reason)
+        finally:
+            with state_lock:
+                release(state, ticker)
+
+        if exit_reason == "tp":
+            with state_lock:
+                state['daily_profits_done'].add(ticker)
+                save_state(state)
+            send_telegram(f"💰 [{ticker}] 익절 완료\n- 평단가: {avg_buy_price:,}원\n- 매도가: {curr_p:,}원\n- 세후 수익률: +{actual_p_rate*100:.2f}%")
+        else:
+            send_telegram(f"💀 [{ticker}] 방어적 손절\n- 평단가: {avg_buy_price:,}원\n- 매도가: {curr_p:,}원\n- 세후 수익률: {actual_p_rate*100:.2f}%")
+
+def run_bot():
+    """기존 방식: 한 루프에서 순서대로 조회/판단 (--legacy)"""
+    state = init_state()
+
+    while True:
+        try:
+            with metrics.timer("loop"):
+                refresh_account(state)
+                # 이번 틱에 쓸 시세를 한 번에 조회 (감시 종목 + 보유 종목 + 시장 판단용 BTC)
+                snapshot = quotes.fetch_quotes(TICKERS + list(state['coin_bals']) + ["KRW-BTC"])
+                check_portfolio(state, snapshot)
+
+                if not state['target_achieved']:
+                    for ticker in TICKERS:
+                        check_ticker(state, ticker, snapshot.get(ticker), snapshot.ts)
+
+            if not state['target_achieved']:
+                time.sleep(1)
+            else:
+                time.sleep(60)
+
+        except Exception as e:
+            logging.error(f"Error: {e}")
+            time.sleep(10)
+
+def run_scan(market_scanner):
+    """스캐너 모드: KRW 전 종목 지표를 한 번에 계산해 과매도 후보만 진입 판단 (--scan)"""
+    global TICKERS
+    TICKERS = market_scanner.tickers  # 9시 장정리 / 목표 달성 매도 대상도 스캔 종목 전체
+    market_scanner.warmup()
+    state = init_state()
 
     while True:
         try:
-            now = datetime.datetime.now()
-            # 업비트 실시간 잔고 및 평단가 정보 한 번에 가져오기
-            balances = upbit.get_balances() 
-            coin_bals = {f"KRW-{b['currency']}": float(b['balance']) + float(b['locked']) for b in balances if b['currency'] != "KRW"}
-            avg_buy_prices = {f"KRW-{b['currency']}": float(b['avg_buy_price']) for b in balances if b['currency'] != "KRW"}
-            
-            # 9시 리셋 및 생존 판정
-            if now.hour == 9 and now.minute == 0 and now.second < 10 and last_reset_date != now.date():
-                current_wealth = get_total_wealth(upbit)
-                final_profit_rate = (current_wealth / base_asset) - 1 if base_asset > 0 else 0
-                
-                # [생존 판독] 하루 1.2% 수익 못 내면 시스템 종료 경고
-                if final_profit_rate < 0.012:
-                    send_telegram(f"⚠️ [생존 실패] 일일 수익률 {final_profit_rate*100:.2f}%로 목표(1.2%) 미달.\n약속대로 시스템을 종료(삭제) 대기 모드로 전환합니다. 💀")
-                
-                for t, amt in coin_bals.items():
-                    if t in TICKERS:
-                        avg_p = avg_buy_prices.get(t, 0)
-                        if avg_p > 0:
-                            curr_p = pyupbit.get_current_price(t)
-                            p_rate = (curr_p / avg_p) - 1 - FEE
-                            if p_rate >= 0 or p_rate <= STRICT_SL:
-                                upbit.sell_market_order(t, amt)
-                                send_telegram(f"🌅 9시 장정리 매도: {t}\n수익률: {p_rate*100:.2f}%")
-                            else:
-                                target_p = avg_p * (1 + current_indiv_tp + FEE)
-                                stop_p = avg_p * (1 + STRICT_SL + FEE)
-                                send_telegram(f"🌅 9시 전략적 보유: {t}\n- 현재 수익률: {p_rate*100:.2f}%\n- 다음 목표가: {target_p:,.0f}원\n- 다음 손절가: {stop_p:,.0f}원")
-                        else:
-                            upbit.sell_market_order(t, amt)
-
-                time.sleep(5)
-                base_asset = get_total_wealth(upbit)
-                target_achieved = False
-                daily_profits_done = set() # 일일 종목별 익절 기록 초기화
-                last_reset_date = now.date()
-                send_telegram(f"📅 새 날 시작\n- 자산 기준: {base_asset:,.0f}원")
-
-            # [실시간 시장 상태 갱신] 6시간 추세 실시간 반영 (버퍼 적용)
-            new_m_state = get_market_state(m_state)
-            if new_m_state != m_state:
-                m_state = new_m_state
-                current_target = BULL_GOAL if m_state == "BULL" else SURVIVOR_GOAL
-                current_indiv_tp = BULL_GOAL if m_state == "BULL" else SURVIVOR_GOAL
-                send_telegram(f"📉 시장 추세 변화 감지: {m_state} 모드로 전환\n- 새로운 목표 수익률: {current_target*100:.1f}%")
-
-            current_wealth = get_total_wealth(upbit)
-            profit_rate = (current_wealth / base_asset) - 1 if base_asset > 0 else 0
-            
-            # [조건 충족 시 즉시 종료 - 익절]
-            if profit_rate >= current_target and not target_achieved:
-                target_achieved = True
-                for t, amt in coin_bals.items():
-                    if t in TICKERS: upbit.sell_market_order(t, amt)
-                send_telegram(f"✅ {m_state} 목표 달성! ({profit_rate*100:.2f}%)\n현 자산: {current_wealth:,.0f}원\n내일까지 휴식합니다.")
-
-            if not target_achieved:
-                krw_bal = upbit.get_balance("KRW")
-                
-                for ticker in TICKERS:
-                    curr_p = pyupbit.get_current_price(ticker)
-                    if not curr_p: continue
-                    
-                    # 매수: RSI 30 이하 과매도 구간 사냥 (오늘 익절하지 않은 종목만)
-                    if (ticker not in coin_bals or coin_bals[ticker] < 1e-8) and ticker not in daily_profits_done:
-                        rsi, l_band = get_indicators(ticker)
-                        if rsi is not None and (rsi <= 30 or curr_p <= l_band):
-                            if krw_bal > 5000:
-                                upbit.buy_market_order(ticker, krw_bal * 0.2)
-                                time.sleep(1) # 체결 대기
-                                # 새로 산 코인의 평단가 확인
-                                new_bal = upbit.get_balances()
-                                avg_p = next((float(b['avg_buy_price']) for b in new_bal if f"KRW-{b['currency']}" == ticker), 0)
-                                if avg_p > 0:
-                                    target_p = avg_p * (1 + current_indiv_tp + FEE)
-                                    stop_p = avg_p * (1 + STRICT_SL + FEE)
-                                    send_telegram(f"🎣 [{ticker}] 매수 완료\n- 매수가: {avg_p:,}원 (RSI:{rsi:.1f})\n- 익절 목표: {target_p:,.0f}원\n- 손절 기준: {stop_p:,.0f}원")
-                                krw_bal = upbit.get_balance("KRW")
-                    
-                    # 매도: 실시간 업비트 평단가 기반 익절/손절
-                    elif ticker in coin_bals and coin_bals[ticker] > 1e-8:
-                        avg_buy_price = avg_buy_prices.get(ticker, 0)
-                        if avg_buy_price == 0: continue # 평단가 정보를 가져올 수 없는 경우 무시
-                        
-                        p_rate = (curr_p / avg_buy_price) - 1
-                        
-                        # 실제 수익은 수수료를 제외해야 함
-                        actual_p_rate = p_rate - FEE
-                        
-                        if actual_p_rate >= current_indiv_tp:
-                            upbit.sell_market_order(ticker, coin_bals[ticker])
-                            send_telegram(f"💰 [{ticker}] 익절 완료\n- 평단가: {avg_buy_price:,}원\n- 매도가: {curr_p:,}원\n- 세후 수익률: +{actual_p_rate*100:.2f}%")
-                            daily_profits_done.add(ticker)
-                        elif actual_p_rate <= STRICT_SL:
-                            upbit.sell_market_order(ticker, coin_bals[ticker])
-                            send_telegram(f"💀 [{ticker}] 방어적 손절\n- 평단가: {avg_buy_price:,}원\n- 매도가: {curr_p:,}원\n- 세후 수익률: {actual_p_rate*100:.2f}%")
-                            
+            with metrics.timer("loop"):
+                refresh_account(state)
+                snapshot = quotes.fetch_quotes(TICKERS + list(state['coin_bals']) + ["KRW-BTC"])
+                check_portfolio(state, snapshot)
+
+                if not state['target_achieved']:
+                    # 보유 종목은 익절/손절, 나머지는 check_ticker 진입 조건(RSI 30 / 볼밴 하단)에 걸린 후보만
+                    held = [t for t, amt in state['coin_bals'].items() if t in TICKERS and amt > 1e-8]
+                    shortlist = market_scanner.candidates(snapshot, rsi_max=30)
+                    for ticker in dict.fromkeys(held + shortlist):
+                        check_ticker(state, ticker, snapshot.get(ticker), snapshot.ts)
+
+            if not state['target_achieved']:
                 time.sleep(1)
             else:
                 time.sleep(60)
@@ -238,5 +435,31 @@ def run_bot():
             logging.error(f"Error: {e}")
             time.sleep(10)
 
+def run_bot_async(feed=None):
+    """이벤트 방식: 시세/잔고/알림을 동시에 처리하고 종목별로 바로 판단"""
+    state = init_state()
+    core = async_core.AsyncTradingCore(
+        TICKERS,
+        feed=feed,
+        on_snapshot=lambda snapshot: check_portfolio(state, snapshot),
+        on_price=lambda ticker, price, snapshot: check_ticker(state, ticker, price, snapshot.ts),
+        extra_tickers=lambda: list(state['coin_bals']) + ["KRW-BTC"],
+    )
+    core.add_job(lambda: refresh_account(state), 1, name="account")
+    core.add_job(lambda: logging.info(f"[RateLimit]\n{rate_limiter.get_scheduler().report()}\n"
+                                      f"[HttpPool]\n{http_pool.get_pool().report()}"), 600, name="rate_report")
+    async_core.run(core)
+
 if __name__ == "__main__":
-    run_bot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bot4 Survival Edition")
+    parser.add_argument("--legacy", action="store_true", help="기존 while 루프 방식으로 실행")
+    parser.add_argument("--feed", choices=["rest", "ws"], default="rest", help="가격 피드 (rest: 0.5초 폴링, ws: 웹소켓)")
+    parser.add_argument("--scan", action="store_true", help="TICKERS 대신 KRW 마켓 전체를 스캔")
+    args = parser.parse_args()
+    metrics.start(summary_path="bot4_metrics.json")  # METRICS_PORT=9100 이면 /metrics 엔드포인트도 열림
+    if args.scan:
+        run_scan(scanner.MarketScanner())
+    elif args.legacy:
+        run_bot()
+    else:
+        run_bot_async(async_core.UpbitWebSocketFeed() if args.feed == "ws" else None)
@@ -0,0 +1,206 @@
+import os
+import time
+import logging
+import threading
+import pandas as pd
+import pyupbit
+import candle_store
+import candle_clock
+import ring_buffer
+
+# ---------------------------------------------------------------------
+# 캔들(OHLCV) 메모리 캐시
+# (ticker, interval) 별로 히스토리를 메모리에 들고 있고,
+# 갱신 시에는 최신 캔들 몇 개(직전 확정봉 + 진행 중인 봉)만 받아와 덮어쓴다.
+# - 장기 실행 모드(BOT_LONG_RUN=1): 히스토리를 DataFrame 대신 고정 크기 링 버퍼(ring_buffer.CandleRing)에
+#   보관해 봉이 바뀔 때마다 DataFrame 을 새로 합치지 않는다. get_candles() 는 지표 상태가 바로 읽는
+#   재사용 뷰를, get_ohlcv() 는 요청 시에만 만든 DataFrame 복사본을 돌려준다.
+# ---------------------------------------------------------------------
+MAX_DEPTH = 400        # 키 하나당 보관하는 최대 캔들 수 (초과분은 오래된 것부터 삭제)
+TAIL_COUNT = 2         # 갱신 시 받아오는 최신 캔들 수
+DEFAULT_MAX_AGE = 1.0  # 이 시간(초) 안에 재호출되면 네트워크 요청 없이 캐시 반환
+UNTIL_CLOSE = "bar"    # max_age 대신 쓰면 봉 경계를 지났을 때만 갱신 (진행 중인 봉은 호출자가 실시간 가격으로 반영)
+LONG_RUN = os.getenv("BOT_LONG_RUN", "0") == "1"  # 장기 실행 모드 (PM2 로 몇 주씩 돌릴 때)
+
+
+class CandleCache:
+    def __init__(self, max_depth=MAX_DEPTH, tail_count=TAIL_COUNT, fetch=None, store=None, ring=False):
+        self.max_depth = max_depth
+        self.tail_count = tail_count
+        self.fetch = fetch or pyupbit.get_ohlcv
+        self.store = store  # candle_store.CandleStore — 있으면 워밍업 히스토리를 디스크에서 읽는다
+        self.ring = ring       # True 면 히스토리를 링 버퍼에 보관 (바꾼 뒤에는 invalidate())
+        self._frames = {}      # (ticker, interval) -> DataFrame (링 모드에서는 CandleRing)
+        self._last_bar = {}    # (ticker, interval) -> 마지막 캔들의 봉 시작 epoch
+        self._depth = {}       # (ticker, interval) -> 보관 깊이 (요청된 최대 count)
+        self._loaded = {}      # (ticker, interval) -> 전체 조회 때 요청한 깊이
+        self._fetched_at = {}  # (ticker, interval) -> 마지막 갱신 시각
+        self._views = {}       # (ticker, interval) -> {count: 최근 count 개 슬라이스} (갱신 전까지 같은 객체 반환)
+        self._ring_views = {}  # (ticker, interval) -> {count: CandleView} (링 모드, 계속 같은 객체)
+        # (ticker, interval) 마다 잠금 — 한 종목의 캔들 조회(네트워크)가 다른 종목 조회를 막지 않도록
+        self._lock = threading.Lock()  # _key_locks 보호용 (잠깐만 잡는다)
+        self._key_locks = {}
+        self.stats = {"full": 0, "tail": 0, "hit": 0}
+
+    def get_ohlcv(self, ticker, interval="day", count=200, max_age=DEFAULT_MAX_AGE):
+        """pyupbit.get_ohlcv 와 같은 모양의 DataFrame 반환 (최근 count 개)"""
+        key = (ticker, interval)
+        with self._key_lock(key):
+            data = self._refresh(key, count, max_age)
+            if data is None:
+                return None
+            # 데이터가 그대로면 같은 객체를 돌려줘 지표 쪽에서 바로 건너뛸 수 있게 한다
+            views = self._views.setdefault(key, {})
+            view = views.get(count)
+            if view is None:
+                view = views[count] = data.frame(count) if self.ring else data.iloc[-count:]
+        return view
+
+    def get_candles(self, ticker, interval="day", count=200, max_age=DEFAULT_MAX_AGE):
+        """지표 상태(indicators)에 넘길 최근 count 개 캔들
+
+        링 모드에서는 DataFrame 을 만들지 않고 링 버퍼를 그대로 읽는 CandleView(같은 키/개수면 항상 같은 객체),
+        아니면 get_ohlcv 와 같은 DataFrame.
+        """
+        if not self.ring:
+            return self.get_ohlcv(ticker, interval=interval, count=count, max_age=max_age)
+        key = (ticker, interval)
+        with self._key_lock(key):
+            ring = self._refresh(key, count, max_age)
+            if ring is None:
+                return None
+            views = self._ring_views.setdefault(key, {})
+            view = views.get(count)
+            if view is None or view.ring is not ring:
+                view = views[count] = ring_buffer.CandleView(ring, count)
+        return view
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+        return lock
+
+    def _refresh(self, key, count, max_age):
+        """필요하면 전체 / 최신 캔들을 다시 받아 보관 중인 히스토리 반환 (키 잠금 안에서 호출)"""
+        depth = min(max(count, self._depth.get(key, 0)), self.max_depth)
+        self._depth[key] = depth
+        data = self._frames.get(key)
+        if data is None or self._loaded.get(key, 0) < depth:
+            data = self._load_full(key, depth)
+        elif self._expired(key, max_age):
+            data = self._load_tail(key, data, depth)
+        else:
+            self.stats["hit"] += 1
+        return data
+
+    def _expired(self, key, max_age):
+        now = time.time()
+        age = now - self._fetched_at[key]
+        if max_age != UNTIL_CLOSE:
+            return age >= max_age
+        bar = candle_clock.bar_start(key[1], now)
+        if self._fetched_at[key] < bar:
+            return True  # 마지막 조회 이후 봉이 마감됨
+        # 경계 직후 거래가 없어 새 봉이 아직 안 생겼으면 잠시 뒤 다시 조회
+        return self._last_bar[key] < bar and age >= candle_clock.RETRY
+
+    def invalidate(self, ticker=None, interval=None):
+        """캐시 삭제 (인자가 없으면 전체)"""
+        for key in list(self._frames):
+            if (ticker is None or key[0] == ticker) and (interval is None or key[1] == interval):
+                with self._key_lock(key):
+                    self._frames.pop(key, None)
+                    self._fetched_at.pop(key, None)
+                    self._last_bar.pop(key, None)
+                    self._loaded.pop(key, None)
+                    self._views.pop(key, None)
+                    self._ring_views.pop(key, None)
+
+    def _load_full(self, key, depth):
+        ticker, interval = key
+        df = self._load_from_store(key, depth) if self.store is not None else None
+        if df is None:
+            df = self.fetch(ticker, interval=interval, count=depth)
+        self.stats["full"] += 1
+        if df is None or df.empty:
+            return self._frames.get(key)
+        self._loaded[key] = depth
+        self._store(key, df, depth)
+        return self._frames[key]
+
+    def _load_from_store(self, key, depth):
+        """저장소의 확정봉 + 최신 캔들(tail)로 히스토리 구성 (빠진 구간만 네트워크 조회)"""
+        ticker, interval = key
+        try:
+            self.store.sync(ticker, interval, depth)
+            hist = self.store.frame(ticker, interval, last=depth)
+        except Exception as e:
+            logging.error(f"[CandleCache] 저장소 읽기 실패 ({ticker} {interval}): {e}")
+            return None
+        tail = self.fetch(ticker, interval=interval, count=self.tail_count)
+        if hist.empty or tail is None or tail.empty or tail.index[0] > hist.index[-1] + candle_store.interval_delta(interval):
+            return None
+        return pd.concat([hist[hist.index < tail.index[0]], tail])
+
+    def _load_tail(self, key, data, depth):
+        ticker, interval = key
+        tail = self.fetch(ticker, interval=interval, count=self.tail_count)
+        self.stats["tail"] += 1
+        if tail is None or tail.empty:
+            # 갱신 실패 시 이전 데이터를 돌려주고, 다음 호출에서 다시 시도
+            logging.warning(f"[CandleCache] {ticker} {interval} 갱신 실패, 캐시 데이터 사용")
+            return data
+
+        # 받아온 구간이 캐시와 이어지지 않으면(오래 멈춰 있었던 경우) 전체 재조회
+        last = data.last_ts if self.ring else data.index[-1]
+        if (tail.index[0].value if self.ring else tail.index[0]) > last:
+            return self._load_full(key, depth)
+
+        if self.ring:
+            data.merge(tail)  # 제자리에서 덮어쓰기 (새 DataFrame 을 합치지 않음)
+            self._stored(key, data)
+            return data
+        merged = pd.concat([data[data.index < tail.index[0]], tail])
+        self._store(key, merged, depth)
+        return self._frames[key]
+
+    def _store(self, key, df, depth):
+        if self.ring:
+            ring = self._frames.get(key)
+            if ring is None or ring.capacity < depth or ring.columns != tuple(df.columns):
+                ring = ring_buffer.CandleRing(depth, df.columns)
+            ring.load(df)
+            self._stored(key, ring)
+            return
+        if len(df) > depth:
+            df = df.iloc[-depth:]
+        self._stored(key, df)
+
+    def _stored(self, key, data):
+        self._frames[key] = data
+        self._fetched_at[key] = time.time()
+        if self.ring:
+            self._last_bar[key] = data.last_ts / 1e9 - candle_clock.KST_SECONDS
+        else:
+            self._last_bar[key] = candle_clock.candle_epoch(data.index[-1])
+        self._views[key] = {}
+
+
+# 모든 봇이 같이 쓰는 기본 캐시
+_default_cache = CandleCache(store=candle_store.default_store() if candle_store.STORE_DIR else None, ring=LONG_RUN)
+
+
+def get_ohlcv(ticker, interval="day", count=200, max_age=DEFAULT_MAX_AGE):
+    """기본 캐시를 통한 캔들 조회"""
+    return _default_cache.get_ohlcv(ticker, interval=interval, count=count, max_age=max_age)
+
+
+def get_candles(ticker, interval="day", count=200, max_age=DEFAULT_MAX_AGE):
+    """기본 캐시를 통한 지표용 캔들 조회 (장기 실행 모드면 링 버퍼 뷰)"""
+    return _default_cache.get_candles(ticker, interval=interval, count=count, max_age=max_age)
+
+
+def get_stats():
+    return dict(_default_cache.stats)
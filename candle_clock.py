@@ -0,0 +1,91 @@
+import time
+import logging
+import datetime
+import candle_store
+
+# ---------------------------------------------------------------------
+# 봉 경계 / 세션 시각 계산 (네트워크 조회 없음)
+# - 업비트 분봉/일봉 경계는 UTC epoch 기준으로 나눠떨어진다 (일봉 09:00 KST = 00:00 UTC).
+#   주봉은 월요일 09:00 KST 시작.
+# - 확정봉으로만 계산하는 작업(목표가, 이동평균, 지표 워밍업 등)은 경계마다 한 번만 돌리고,
+#   경계 사이에는 실시간 가격으로 진행 중인 봉만 반영하면 된다.
+# - 시각은 time.time() 기준 (모의 거래소의 가상 시계를 그대로 따름)
+# ---------------------------------------------------------------------
+KST_SECONDS = 9 * 3600        # pyupbit 캔들 인덱스(KST, tz 없음) <-> UTC epoch
+WEEK_OFFSET = 4 * 86400       # epoch 0 (1970-01-01) 은 목요일 -> 월요일 기준으로 맞춤
+RETRY = 5.0                   # 경계 작업이 실패하면(새 봉 없음 등) 같은 봉 안에서 다시 시도할 간격(초)
+
+
+def interval_seconds(interval):
+    return candle_store.interval_delta(interval).total_seconds()
+
+
+def bar_start(interval, now=None):
+    """now(epoch) 가 속한 봉의 시작 시각 (epoch)"""
+    now = time.time() if now is None else now
+    seconds = interval_seconds(interval)
+    offset = WEEK_OFFSET if interval == "week" else 0
+    return now - (now - offset) % seconds
+
+
+def next_bar(interval, now=None):
+    """다음 봉이 시작되는 시각 (epoch) = 지금 봉이 마감되는 시각"""
+    return bar_start(interval, now) + interval_seconds(interval)
+
+
+def candle_epoch(ts):
+    """pyupbit 캔들 인덱스(KST, tz 없음) -> 봉 시작 epoch"""
+    return (ts - datetime.datetime(1970, 1, 1)).total_seconds() - KST_SECONDS
+
+
+def to_kst(epoch):
+    """epoch -> 캔들 인덱스와 같은 기준의 시각 (KST, tz 없음)"""
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=epoch + KST_SECONDS)
+
+
+def session_window(now=None):
+    """오늘 업비트 세션 (시작, 종료) — 일봉 캔들 인덱스와 같은 09:00 KST, tz 없음"""
+    start = to_kst(bar_start("day", now))
+    return start, start + datetime.timedelta(days=1)
+
+
+class BoundaryScheduler:
+    """봉 경계(새 봉 시작)마다 한 번씩 실행할 작업 목록
+
+    scheduler = BoundaryScheduler()
+    scheduler.every("day", update_daily_data)  # 09:00 KST 마다 (가동 시 1회 포함)
+    scheduler.run_pending()                    # 매 틱 호출 — 경계가 아니면 시각 비교만 한다
+
+    작업이 False 를 반환하거나 예외를 내면 같은 봉 안에서 RETRY 초 뒤 다시 실행한다.
+    """
+
+    def __init__(self, retry=RETRY):
+        self.retry = retry
+        self.jobs = []
+
+    def every(self, interval, fn, name=None, run_now=True):
+        """interval 봉이 새로 시작될 때마다 fn() 실행 (run_now=False 면 가동 직후의 봉은 건너뜀)"""
+        job = {"interval": interval, "fn": fn, "name": name or getattr(fn, "__name__", interval),
+               "bar": None if run_now else bar_start(interval), "retry_at": 0.0, "runs": 0}
+        self.jobs.append(job)
+        return job
+
+    def run_pending(self, now=None):
+        """경계를 지난 작업만 실행하고 실행한 작업 수 반환"""
+        now = time.time() if now is None else now
+        ran = 0
+        for job in self.jobs:
+            bar = bar_start(job["interval"], now)
+            if job["bar"] == bar or now < job["retry_at"]:
+                continue
+            try:
+                done = job["fn"]() is not False
+            except Exception as e:
+                logging.error(f"[Scheduler] {job['name']} 실패: {e}")
+                done = False
+            ran += 1
+            if done:
+                job["bar"], job["runs"] = bar, job["runs"] + 1
+            else:
+                job["retry_at"] = now + self.retry
+        return ran
@@ -0,0 +1,247 @@
+import os
+import logging
+import datetime
+import contextlib
+import numpy as np
+import pandas as pd
+import pyupbit
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+# ---------------------------------------------------------------------
+# 로컬 캔들 저장소 (종목/봉 간격별 컬럼 파일, append-only)
+#   candles/KRW-BTC/minute1/ts.i8, open.f8, high.f8, low.f8, close.f8, volume.f8, value.f8
+# - 확정된 봉만 저장하고, 동기화 시에는 빠진 구간만 받아온다.
+# - 읽기는 np.memmap 뷰라 수백만 개 분봉도 복사 없이 바로 열린다.
+# ---------------------------------------------------------------------
+STORE_DIR = os.getenv("CANDLE_STORE_DIR", "candles")
+COLUMNS = ("open", "high", "low", "close", "volume", "value")
+KST = datetime.timedelta(hours=9)
+FETCH_PERIOD = 0.1  # 페이지(200개) 단위 조회 사이 대기 (pyupbit 기본값)
+
+
+def interval_delta(interval):
+    if interval.startswith("minute"):
+        return datetime.timedelta(minutes=int(interval[len("minute"):]))
+    return {"day": datetime.timedelta(days=1), "week": datetime.timedelta(weeks=1)}[interval]
+
+
+def now_kst():
+    """pyupbit 캔들 인덱스와 같은 기준(KST, tz 없음)의 현재 시각"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + KST
+
+
+class CandleStore:
+    def __init__(self, root=STORE_DIR, fetch=None):
+        self.root = root
+        self.fetch = fetch or pyupbit.get_ohlcv
+
+    # ------------------------------------------------------------------
+    # 파일 입출력
+    # ------------------------------------------------------------------
+    def _dir(self, ticker, interval):
+        return os.path.join(self.root, ticker, interval)
+
+    def _path(self, ticker, interval, col):
+        return os.path.join(self._dir(ticker, interval), f"{col}.i8" if col == "ts" else f"{col}.f8")
+
+    @contextlib.contextmanager
+    def _locked(self, ticker, interval):
+        """같은 저장소를 쓰는 여러 봇 프로세스가 동시에 동기화하지 않도록 파일 잠금"""
+        os.makedirs(self._dir(ticker, interval), exist_ok=True)
+        with open(os.path.join(self._dir(ticker, interval), ".lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def count(self, ticker, interval):
+        """저장된 봉 개수 (ts 파일 기준)"""
+        path = self._path(ticker, interval, "ts")
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _repair(self, ticker, interval):
+        """쓰기 도중 중단되어 컬럼 길이가 어긋났으면 ts 기준으로 잘라낸다"""
+        n = self.count(ticker, interval)
+        for col in COLUMNS:
+            path = self._path(ticker, interval, col)
+            if os.path.exists(path) and os.path.getsize(path) != n * 8:
+                with open(path, "r+b") as f:
+                    f.truncate(n * 8)
+
+    def _write(self, ticker, interval, df, mode, suffix=""):
+        os.makedirs(self._dir(ticker, interval), exist_ok=True)
+        # 값 컬럼을 먼저 쓰고 ts 를 마지막에 쓴다 (ts 길이 = 유효한 행 수)
+        for col in COLUMNS:
+            values = df[col].to_numpy(dtype=np.float64) if col in df else np.full(len(df), np.nan)
+            with open(self._path(ticker, interval, col) + suffix, mode) as f:
+                f.write(values.tobytes())
+        with open(self._path(ticker, interval, "ts") + suffix, mode) as f:
+            f.write(df.index.values.astype("datetime64[ns]").astype(np.int64).tobytes())
+
+    def last_ts(self, ticker, interval):
+        n = self.count(ticker, interval)
+        if n == 0:
+            return None
+        ts = np.memmap(self._path(ticker, interval, "ts"), dtype=np.int64, mode="r", offset=(n - 1) * 8, shape=(1,))
+        return pd.Timestamp(int(ts[0]))
+
+    def first_ts(self, ticker, interval):
+        if self.count(ticker, interval) == 0:
+            return None
+        ts = np.memmap(self._path(ticker, interval, "ts"), dtype=np.int64, mode="r", shape=(1,))
+        return pd.Timestamp(int(ts[0]))
+
+    def append(self, ticker, interval, df):
+        """마지막 저장 시점 이후의 확정봉만 뒤에 붙인다"""
+        self._repair(ticker, interval)
+        last = self.last_ts(ticker, interval)
+        df = _closed_only(df, interval)
+        if last is not None:
+            df = df[df.index > last]
+        if not df.empty:
+            self._write(ticker, interval, df, "ab")
+        return len(df)
+
+    def prepend(self, ticker, interval, df):
+        """과거 구간 보충 — 앞쪽 추가는 파일을 새로 써서 교체한다 (드물게 발생)"""
+        first = self.first_ts(ticker, interval)
+        if first is not None:
+            df = df[df.index < first]
+        if df.empty:
+            return 0
+        merged = pd.concat([df, self.frame(ticker, interval)])
+        self._write(ticker, interval, merged, "wb", suffix=".tmp")
+        for col in COLUMNS + ("ts",):
+            path = self._path(ticker, interval, col)
+            os.replace(path + ".tmp", path)
+        return len(df)
+
+    # ------------------------------------------------------------------
+    # 읽기 (복사 없는 뷰)
+    # ------------------------------------------------------------------
+    def load(self, ticker, interval, start=None, end=None, last=None):
+        """컬럼별 np.memmap 뷰 dict (backtest_engine 배열 형식)
+
+        start/end: 기간 (KST), last: 최근 N 개만
+        """
+        self._repair(ticker, interval)
+        n = self.count(ticker, interval)
+        if n == 0:
+            return None
+        ts = np.memmap(self._path(ticker, interval, "ts"), dtype=np.int64, mode="r", shape=(n,)).view("datetime64[ns]")
+        lo, hi = 0, n
+        if start is not None:
+            lo = int(np.searchsorted(ts, np.datetime64(pd.Timestamp(start), "ns")))
+        if end is not None:
+            hi = int(np.searchsorted(ts, np.datetime64(pd.Timestamp(end), "ns"), side="right"))
+        if last is not None:
+            lo = max(lo, hi - last)
+        data = {"ts": ts[lo:hi]}
+        for col in COLUMNS:
+            arr = np.memmap(self._path(ticker, interval, col), dtype=np.float64, mode="r", shape=(n,))
+            data[col] = arr[lo:hi]
+        return data
+
+    def frame(self, ticker, interval, **kwargs):
+        """pyupbit.get_ohlcv 와 같은 모양의 DataFrame (봇 지표 워밍업용)"""
+        data = self.load(ticker, interval, **kwargs)
+        if data is None:
+            return pd.DataFrame(columns=list(COLUMNS))
+        return pd.DataFrame({col: data[col] for col in COLUMNS}, index=pd.DatetimeIndex(data["ts"]))
+
+    # ------------------------------------------------------------------
+    # 동기화
+    # ------------------------------------------------------------------
+    def sync(self, ticker, interval, count=200):
+        """최신 구간까지 이어 붙이고, 저장된 봉이 count 개보다 적으면 과거도 보충"""
+        with self._locked(ticker, interval):
+            return self._sync(ticker, interval, count)
+
+    def _sync(self, ticker, interval, count):
+        step = interval_delta(interval)
+        last = self.last_ts(ticker, interval)
+        added = 0
+
+        if last is None:
+            # +1: 진행 중인 봉은 저장되지 않는다
+            df = self.fetch(ticker, interval=interval, count=count + 1, period=FETCH_PERIOD)
+            if df is not None:
+                added += self.append(ticker, interval, df)
+        else:
+            # 마지막 저장봉 이후 확정된 봉 수 (+1 은 진행 중인 봉, 저장 시 제외됨)
+            new_closed = int((now_kst() - last.to_pydatetime()) / step) - 1
+            if new_closed > 0:
+                df = self.fetch(ticker, interval=interval, count=new_closed + 1, period=FETCH_PERIOD)
+                if df is not None:
+                    # 받아온 구간이 저장분과 이어지지 않으면(상장 폐지 구간 등) 그대로 붙인다
+                    added += self.append(ticker, interval, df)
+
+        shortfall = count - self.count(ticker, interval)
+        if shortfall > 0 and self.count(ticker, interval) > 0:
+            # pyupbit 의 to 인자는 UTC 기준
+            to = (self.first_ts(ticker, interval).to_pydatetime() - KST).strftime("%Y-%m-%d %H:%M:%S")
+            df = self.fetch(ticker, interval=interval, count=shortfall, to=to, period=FETCH_PERIOD)
+            if df is not None and not df.empty:
+                added += self.prepend(ticker, interval, df)
+        if added:
+            logging.info(f"[CandleStore] {ticker} {interval}: {added} candles synced ({self.count(ticker, interval)} total)")
+        return added
+
+    def ensure(self, ticker, interval, count):
+        """저장된 봉이 count 개 이상이면 네트워크 요청 없이 넘어간다 (반복 백테스트용)"""
+        if self.count(ticker, interval) < count:
+            self.sync(ticker, interval, count)
+        return self.load(ticker, interval, last=count)
+
+
+def _closed_only(df, interval):
+    """아직 진행 중인 봉(마지막 행)은 저장하지 않는다"""
+    if df is None or df.empty:
+        return df if df is not None else pd.DataFrame(columns=list(COLUMNS))
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df[df.index + interval_delta(interval) <= now_kst()]
+
+
+def export_frame(df, path):
+    """DataFrame 내보내기 — 확장자로 형식 결정 (.parquet / .feather / .npz / .csv / .xlsx)
+
+    parquet/feather 는 pyarrow 가 없으면 .npz 로 대신 저장한다. 실제 저장 경로를 반환.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".parquet":
+            df.to_parquet(path)
+            return path
+        if ext == ".feather":
+            df.reset_index().to_feather(path)
+            return path
+    except ImportError:
+        path = os.path.splitext(path)[0] + ".npz"
+        logging.warning(f"pyarrow 가 없어 {path} 로 저장합니다")
+        ext = ".npz"
+    if ext == ".npz":
+        np.savez(path, index=df.index.values, **{str(c): df[c].to_numpy() for c in df.columns})
+    elif ext == ".csv":
+        df.to_csv(path)
+    elif ext == ".xlsx":
+        df.to_excel(path)  # openpyxl 필요 (선택)
+    else:
+        raise ValueError(f"지원하지 않는 형식: {path}")
+    return path
+
+
+_default_store = None
+
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = CandleStore()
+    return _default_store
@@ -1,28 +1,171 @@
+import sys
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 import pyupbit
-import pandas as pd
+import rate_limiter
+import quotes
+import candle_clock
+import state_journal
 
+# ---------------------------------------------------------------------
+# 변동성 돌파 현황판 (실시간 갱신)
+# - 현재가: 전 종목을 시세 요청 1건으로 한 번에 조회 (50종목 이상도 왕복 1번)
+# - 목표가 / MA5: 세션(09:00 KST)마다 한 번, 종목별 일봉을 스레드 풀로 동시에 조회
+# - 보유 / 익절가 / 손절가: 실행 중인 엔진(또는 bot.py)의 상태 저널을 읽기 전용으로 읽음
+# - 요청은 rate_limiter 를 거치므로 같이 돌고 있는 봇과 요청 예산을 나눠 쓴다
+# ---------------------------------------------------------------------
 TICKERS = ["KRW-BTC", "KRW-ETH", "KRW-SOL", "KRW-XRP", "KRW-DOGE"]
 K_VALUE = 0.5
+TP = 0.015                # 익절 (bot.py / strategies.VolatilityBreakout 과 같은 값)
+SL = 0.02                 # 손절
+REFRESH = 1.0             # 화면 갱신 주기(초)
+WORKERS = 8               # 일봉 동시 조회 스레드 수
+ENGINE_JOURNAL = "engine" # strategy_engine 상태 저널 이름
+BOT_JOURNAL = "bot"       # bot.py 단독 실행 시 상태 저널 이름
+CLEAR = "\x1b[H\x1b[J"    # 커서를 맨 위로 + 화면 지우기 (제자리 갱신)
 
-print(f"{'Ticker':<12} | {'Current':<12} | {'Target':<12} | {'MA5':<12} | {'Status'}")
-print("-" * 70)
 
-for ticker in TICKERS:
-    try:
-        df = pyupbit.get_ohlcv(ticker, interval="day", count=6)
-        curr_price = pyupbit.get_current_price(ticker)
-        
+def fmt_price(p):
+    if p is None:
+        return "-"
+    return f"{p:,.0f}" if p >= 100 else f"{p:,.4g}"
+
+
+class StatusBoard:
+    def __init__(self, tickers, k=K_VALUE, strategy="bot", workers=WORKERS):
+        self.tickers = list(tickers)
+        self.k = k
+        self.strategy = strategy
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="daily")
+        self.daily = {}  # ticker -> {"target", "ma5"}
+        self.engine = state_journal.StateJournal(ENGINE_JOURNAL)
+        self.bot = state_journal.StateJournal(BOT_JOURNAL)
+        self.scheduler = candle_clock.BoundaryScheduler()
+        self.scheduler.every("day", self.load_daily)
+
+    # ------------------------------------------------------------------
+    # 데이터
+    # ------------------------------------------------------------------
+    def _fetch_daily(self, ticker):
+        try:
+            df = pyupbit.get_ohlcv(ticker, interval="day", count=6)
+        except Exception:
+            return None
+        if df is None or len(df) < 6:
+            return None
         yesterday = df.iloc[-2]
-        today_open = df.iloc[-1]['open']
-        target = today_open + (yesterday['high'] - yesterday['low']) * K_VALUE
-        ma5 = df['close'].rolling(window=5).mean().iloc[-2]
-        
-        status = "Needs Breakout"
-        if curr_price > target and curr_price > ma5:
-            status = "READY TO BUY"
-        elif curr_price <= ma5:
-            status = "Below MA5 (Downtrend)"
-            
-        print(f"{ticker:<12} | {curr_price:>12,.0f} | {target:>12,.0f} | {ma5:>12,.0f} | {status}")
-    except Exception as e:
-        print(f"{ticker:<12} | Error: {e}")
+        return {
+            "start": df.index[-1],
+            "target": df.iloc[-1]['open'] + (yesterday['high'] - yesterday['low']) * self.k,
+            "ma5": df['close'].iloc[-6:-1].mean(),
+        }
+
+    def load_daily(self):
+        """전 종목 목표가 / MA5 동시 조회 (새 일봉이 아직 없는 종목이 있으면 False -> 잠시 뒤 재시도)"""
+        start = candle_clock.session_window()[0]
+        fresh = True
+        for ticker, info in zip(self.tickers, self.pool.map(self._fetch_daily, self.tickers)):
+            if info is None or info["start"] < start:
+                fresh = False
+            if info is not None:
+                self.daily[ticker] = info
+        return fresh
+
+    def positions(self):
+        """보유 종목 -> {"qty", "avg", "src"} (엔진 장부 우선, 없으면 bot.py 상태)"""
+        held = {}
+        book = self.engine.read().get(f"{self.strategy}.book") or {}
+        for ticker, pos in book.get("positions", {}).items():
+            if pos["qty"] > 0:
+                held[ticker] = {"qty": pos["qty"], "avg": pos["funds"] / pos["qty"], "src": "engine"}
+        self.bot.read()
+        for ticker, s in self.bot.group("states").items():
+            if s.get("holding") and s.get("purchase_price") and ticker not in held:
+                held[ticker] = {"qty": None, "avg": s["purchase_price"], "src": "bot"}
+        return held
+
+    # ------------------------------------------------------------------
+    # 화면
+    # ------------------------------------------------------------------
+    def render(self, snapshot, held, elapsed):
+        header = (f"{'Ticker':<12} | {'Current':>12} | {'Target':>12} | {'MA5':>12} | {'Trigger':>8} | "
+                  f"{'Status':<21} | {'Position':<22} | {'TP':>12} | {'SL':>12} | {'PnL':>7}")
+        lines = [header, "-" * len(header)]
+        for ticker in self.tickers:
+            curr = snapshot.get(ticker)
+            info = self.daily.get(ticker)
+            if curr is None or info is None:
+                lines.append(f"{ticker:<12} | {'(no data)':>12}")
+                continue
+            target, ma5 = info["target"], info["ma5"]
+            # 진입까지 남은 거리: 목표가와 MA5 를 모두 넘어야 하므로 둘 중 큰 값 기준
+            trigger = max(target, ma5) / curr - 1
+            status = "Needs Breakout"
+            if curr > target and curr > ma5:
+                status = "READY TO BUY"
+            elif curr <= ma5:
+                status = "Below MA5 (Downtrend)"
+
+            pos = held.get(ticker)
+            if pos is None:
+                position, tp, sl, pnl = "-", "-", "-", "-"
+            else:
+                qty = f"{pos['qty']:.6g}@" if pos["qty"] else ""
+                position = f"{qty}{fmt_price(pos['avg'])} ({pos['src']})"
+                tp, sl = fmt_price(pos["avg"] * (1 + TP)), fmt_price(pos["avg"] * (1 - SL))
+                pnl = f"{(curr / pos['avg'] - 1) * 100:+.2f}%"
+            lines.append(f"{ticker:<12} | {fmt_price(curr):>12} | {fmt_price(target):>12} | {fmt_price(ma5):>12} | "
+                         f"{trigger * 100:>+7.2f}% | {status:<21} | {position:<22} | {tp:>12} | {sl:>12} | {pnl:>7}")
+        start, end = candle_clock.session_window()
+        lines.append("")
+        lines.append(f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} | 세션 {start:%m-%d %H:%M} ~ {end:%m-%d %H:%M} | "
+                     f"{len(self.tickers)}종목 갱신 {elapsed * 1000:.0f}ms | 보유 {len(held)}")
+        return "\n".join(lines)
+
+    def refresh(self):
+        started = time.perf_counter()
+        self.scheduler.run_pending()
+        snapshot = quotes.fetch_quotes(self.tickers)
+        held = self.positions()
+        return self.render(snapshot, held, time.perf_counter() - started)
+
+    def run(self, interval=REFRESH, once=False):
+        live = sys.stdout.isatty() and not once
+        try:
+            while True:
+                started = time.time()
+                text = self.refresh()
+                if live:
+                    sys.stdout.write(CLEAR + text + "\n")
+                    sys.stdout.flush()
+                else:
+                    print(text)
+                if once:
+                    return
+                time.sleep(max(0.0, interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="변동성 돌파 현황판")
+    parser.add_argument("tickers", nargs="*", help="감시 종목 (없으면 기본 5종목)")
+    parser.add_argument("--all", action="store_true", help="KRW 마켓 전체")
+    parser.add_argument("--interval", type=float, default=REFRESH, help="갱신 주기(초)")
+    parser.add_argument("--once", action="store_true", help="한 번만 출력하고 종료")
+    parser.add_argument("--k", type=float, default=K_VALUE)
+    parser.add_argument("--strategy", default="bot", help="보유 현황을 읽을 엔진 전략 이름")
+    parser.add_argument("--state-dir", help="상태 저널 위치 (기본 STATE_DIR)")
+    args = parser.parse_args()
+    if args.state_dir:
+        state_journal.STATE_DIR = args.state_dir
+    rate_limiter.install()  # 실행 중인 봇과 같은 요청 예산 사용
+
+    tickers = args.tickers or TICKERS
+    if args.all:
+        tickers = sorted(quotes.get_krw_markets() or [])
+    StatusBoard(tickers, k=args.k, strategy=args.strategy).run(args.interval, once=args.once)
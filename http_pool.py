@@ -0,0 +1,146 @@
+import os
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from pyupbit import request_api
+import metrics
+
+# ---------------------------------------------------------------------
+# 공용 HTTP 연결 풀 (호스트별 keep-alive 세션)
+# - pyupbit 는 호출마다 requests.get/post 를 새로 불러 매번 TCP + TLS 연결을 새로 맺는다.
+#   install() 후에는 pyupbit 의 모든 요청(시세 / 계좌 / 주문)과 텔레그램 알림이
+#   호스트별 세션 하나씩을 나눠 쓰며 연결을 재사용한다.
+# - 연결 풀 크기는 스레드 풀(현황판, 엔진 주문 처리 등)이 동시에 요청해도 막히지 않게 잡는다.
+# - 타임아웃이 없는 요청에는 기본 (연결, 응답) 타임아웃을 붙인다 (pyupbit 는 타임아웃 없이 요청함)
+# - 요청 예산 조절은 그대로 rate_limiter 가 맡고, 이 모듈은 그 아래에서 전송만 담당한다.
+# ---------------------------------------------------------------------
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))  # 연결 타임아웃(초)
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))          # 응답 타임아웃(초)
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))                  # 호스트당 유지하는 연결 수
+
+
+class HttpPool:
+    def __init__(self, pool_size=POOL_SIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._sessions = {}  # (scheme, host) -> requests.Session
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "timeouts": 0, "errors": 0}
+
+    def session(self, url):
+        """url 호스트용 keep-alive 세션 (처음 요청할 때 만든다)"""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    # 재시도는 호출하는 쪽(rate_limiter / notifier)에서 판단 — 주문이 두 번 나가지 않게 0
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount(f"{parts.scheme}://", adapter)
+                    self._sessions[key] = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        self.stats["requests"] += 1
+        try:
+            return self.session(url).request(method, url, **kwargs)
+        except requests.exceptions.Timeout as e:
+            self.stats["timeouts"] += 1
+            metrics.incr("http_timeouts", host=host, kind=type(e).__name__)
+            raise
+        except requests.exceptions.RequestException as e:
+            self.stats["errors"] += 1
+            metrics.incr("http_errors", host=host, error=type(e).__name__)
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def connections(self):
+        """호스트별 {"requests", "opened", "reused"} (urllib3 연결 풀 기준)"""
+        result = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for (scheme, host), session in sessions:
+            pools = session.get_adapter(f"{scheme}://{host}").poolmanager.pools
+            sent = opened = 0
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    sent += pool.num_requests
+                    opened += pool.num_connections
+            result[host] = {"requests": sent, "opened": opened, "reused": max(0, sent - opened)}
+        return result
+
+    def report(self):
+        lines = [f"{host}: {c['requests']} req, {c['opened']} connections, {c['reused']} reused"
+                 for host, c in self.connections().items()]
+        lines.append(f"timeouts {self.stats['timeouts']}, errors {self.stats['errors']}")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+class _RequestsShim:
+    """pyupbit.request_api 안의 requests 모듈 자리에 넣는 대역 (get/post/delete 만 풀로 보냄)"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.get, self.post, self.delete = pool.get, pool.post, pool.delete
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+# 모든 봇이 같이 쓰는 기본 풀
+_default_pool = HttpPool()
+_installed = None
+
+
+def get_pool():
+    return _default_pool
+
+
+def session(url):
+    """기본 풀의 호스트별 세션 (텔레그램 등 pyupbit 밖의 요청용)"""
+    return _default_pool.session(url)
+
+
+def install(pool=None):
+    """pyupbit 의 HTTP 요청이 연결 풀을 거치도록 연결 (여러 번 불러도 한 번만 적용)
+
+    rate_limiter 는 request_api._call_get 등을 감싸고, 여기서는 그 안쪽의 requests 호출을 바꾸므로
+    설치 순서와 관계없이 둘 다 적용된다.
+    """
+    global _default_pool, _installed
+    if pool is not None:
+        _default_pool = pool
+    if _installed is None:
+        _installed = request_api.requests
+    request_api.requests = _RequestsShim(_default_pool)
+    logging.debug(f"[HttpPool] pyupbit 요청 연결 풀 사용 (호스트당 {_default_pool.pool_size}개)")
+    return _default_pool
+
+
+def uninstall():
+    global _installed
+    if _installed is not None:
+        request_api.requests = _installed
+        _installed = None
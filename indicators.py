@@ -0,0 +1,313 @@
+import math
+import numpy as np
+import ring_buffer
+
+# ---------------------------------------------------------------------
+# 증분(스트리밍) 지표 엔진
+# 캔들이 확정될 때 push(), 진행 중인 봉은 값 계산 시에만 임시로 반영한다.
+# 매 틱 DataFrame 을 새로 만들어 ewm/rolling 을 돌리던 계산을 O(1) 로 대체하며,
+# 같은 개수의 캔들로 pandas 가 계산한 값과 부동소수점 오차 내에서 일치한다.
+# 창 안의 값은 고정 크기 링 버퍼에, 나머지 상태는 __slots__ 객체에 두어 몇 주를 돌아도 크기가 그대로다.
+# ---------------------------------------------------------------------
+NAN = float("nan")
+
+
+class WilderRSI:
+    """pandas ewm(com=period-1, min_periods=period) 기반 RSI 의 증분 버전
+
+    window: 반영할 변화량 개수 (get_ohlcv 의 count - 1). None 이면 전체 히스토리.
+    """
+
+    __slots__ = ("period", "window", "beta", "_maxlen", "_tail", "_deltas", "_n",
+                 "_su", "_sd", "_w", "_last_close", "_since_resum")
+
+    def __init__(self, period=14, window=None):
+        self.period = period
+        self.window = window
+        self.beta = 1 - 1 / period
+        # 확정봉 변화량은 window-1 개까지만 보관 (나머지 1칸은 진행 중인 봉 몫)
+        self._maxlen = window - 1 if window else None
+        self._tail = self.beta ** self._maxlen if window else 0.0
+        # 전체 히스토리(window=None)는 합계만으로 계산되므로 변화량을 보관하지 않는다
+        self._deltas = ring_buffer.RingBuffer(self._maxlen) if window else None
+        self._n = 0      # 반영된 변화량 수 (창 크기 이하)
+        self._su = 0.0   # sum(beta^(n-i) * up_i)
+        self._sd = 0.0   # sum(beta^(n-i) * down_i)
+        self._w = 0.0    # sum(beta^(n-i))
+        self._last_close = None
+        self._since_resum = 0
+
+    def push(self, close):
+        """확정된 봉의 종가 반영"""
+        if self._last_close is not None:
+            d = close - self._last_close
+            up, down = (d, 0.0) if d > 0 else (0.0, -d)
+            b = self.beta
+            self._su = b * self._su + up
+            self._sd = b * self._sd + down
+            self._w = b * self._w + 1
+            if self._deltas is None:
+                self._n += 1
+            else:
+                old = self._deltas.push(d)
+                if old is None:
+                    self._n += 1
+                else:
+                    tail = self._tail
+                    if old > 0:
+                        self._su -= tail * old
+                    else:
+                        self._sd += tail * old
+                    self._w -= tail
+                    self._since_resum += 1
+                    # 빼기 누적 오차 방지를 위해 주기적으로 다시 합산
+                    if self._since_resum >= self._maxlen:
+                        self._resum()
+        self._last_close = close
+
+    def _resum(self):
+        su = sd = w = 0.0
+        b = self.beta
+        for d in self._deltas.view().tolist():
+            up, down = (d, 0.0) if d > 0 else (0.0, -d)
+            su = b * su + up
+            sd = b * sd + down
+            w = b * w + 1
+        self._su, self._sd, self._w = su, sd, w
+        self._since_resum = 0
+
+    def value(self, forming=None):
+        """현재 RSI (forming: 진행 중인 봉의 현재 종가)"""
+        su, sd, w, n = self._su, self._sd, self._w, self._n
+        if forming is not None and self._last_close is not None:
+            d = forming - self._last_close
+            up, down = (d, 0.0) if d > 0 else (0.0, -d)
+            b = self.beta
+            su, sd, w, n = b * su + up, b * sd + down, b * w + 1, n + 1
+        if n < self.period or w == 0:
+            return NAN
+        au, ad = su / w, sd / w
+        if ad == 0:
+            return 100.0 if au > 0 else NAN
+        return 100 - (100 / (1 + au / ad))
+
+
+class RollingStats:
+    """pandas rolling(window).mean() / .std() (ddof=1) 의 증분 버전"""
+
+    __slots__ = ("window", "_values", "_shift", "_s", "_ss", "_since_rebase")
+
+    def __init__(self, window=20):
+        self.window = window
+        # 진행 중인 봉 몫으로 확정봉은 window-1 개만 보관
+        self._values = ring_buffer.RingBuffer(window - 1)
+        self._shift = None  # 큰 가격(BTC 등)에서 제곱합 정밀도 손실을 막기 위한 기준값
+        self._s = 0.0
+        self._ss = 0.0
+        self._since_rebase = 0
+
+    def push(self, x):
+        """확정된 봉의 값 반영"""
+        if self._shift is None:
+            self._shift = x
+        y = x - self._shift
+        self._s += y
+        self._ss += y * y
+        old = self._values.push(x)
+        if old is not None:
+            old -= self._shift
+            self._s -= old
+            self._ss -= old * old
+            self._since_rebase += 1
+            if self._since_rebase >= self.window:
+                self._rebase()
+
+    def _rebase(self):
+        # 기준값을 최근 값으로 옮기고 합계를 다시 계산 (window 번에 한 번, 분할 상환 O(1))
+        values = self._values.view().tolist()
+        self._shift = values[-1] if values else self._shift
+        self._s = sum(v - self._shift for v in values)
+        self._ss = sum((v - self._shift) ** 2 for v in values)
+        self._since_rebase = 0
+
+    def stats(self, forming=None):
+        """(평균, 표준편차) — 값이 window 개 미만이면 NaN"""
+        s, ss, n = self._s, self._ss, len(self._values)
+        shift = self._shift
+        if forming is not None:
+            if shift is None:
+                shift = forming
+            y = forming - shift
+            s, ss, n = s + y, ss + y * y, n + 1
+        if n < self.window:
+            return NAN, NAN
+        mean = s / n
+        var = (ss - n * mean * mean) / (n - 1) if n > 1 else NAN
+        return mean + shift, math.sqrt(var) if var > 0 else 0.0
+
+
+class _CandleConsumer:
+    """candle_cache 의 DataFrame 을 받아 새로 확정된 봉만 push 하는 공통 로직
+
+    DataFrame 의 마지막 행은 진행 중인 봉으로 취급한다.
+    candle_cache 는 갱신 전까지 같은 DataFrame 객체를 돌려주므로, 직전과 같은 객체면 바로 반환한다.
+    장기 실행 모드의 CandleView(get_candles)도 받으며, 이때는 뷰의 버전이 그대로면 바로 반환한다.
+    한 상태에는 한 가지 입력(DataFrame 또는 CandleView)만 넣는다 (확정봉 시각 기준이 다름).
+    """
+
+    __slots__ = ("last_closed_ts", "forming", "_last_df", "_last_version")
+
+    def __init__(self):
+        self.last_closed_ts = None
+        self.forming = None
+        self._last_df = None
+        self._last_version = None
+
+    def push(self, close):
+        raise NotImplementedError
+
+    def update(self, df):
+        if isinstance(df, ring_buffer.CandleView):
+            return self._update_view(df)
+        if df is self._last_df or df is None or df.empty:
+            return self
+        index = df.index
+        closes = df['close']
+        start = 0 if self.last_closed_ts is None else index.searchsorted(self.last_closed_ts, side='right')
+        for i in range(start, len(index) - 1):
+            self.push(float(closes.iloc[i]))
+            self.last_closed_ts = index[i]
+        self.forming = float(closes.iloc[-1])
+        self._last_df = df
+        return self
+
+    def _update_view(self, view):
+        if view is self._last_df and view.version == self._last_version:
+            return self
+        n = len(view)
+        if n:
+            stamps = view.stamps()
+            closes = view.column('close')
+            start = 0 if self.last_closed_ts is None else int(stamps.searchsorted(self.last_closed_ts, side='right'))
+            for close in closes[start:n - 1].tolist():
+                self.push(close)
+            if start < n - 1:
+                self.last_closed_ts = stamps.item(n - 2)
+            self.forming = closes.item(n - 1)
+        self._last_df, self._last_version = view, view.version
+        return self
+
+
+class IndicatorState(_CandleConsumer):
+    """한 종목/봉 간격의 RSI + 볼린저 밴드 상태"""
+
+    __slots__ = ("rsi", "bb", "bb_k")
+
+    def __init__(self, rsi_period=14, rsi_window=None, bb_window=20, bb_k=2):
+        super().__init__()
+        self.rsi = WilderRSI(rsi_period, rsi_window)
+        self.bb = RollingStats(bb_window)
+        self.bb_k = bb_k
+
+    def push(self, close):
+        self.rsi.push(close)
+        self.bb.push(close)
+
+    def snapshot(self, forming=None):
+        """현재 지표 값 dict (진행 중인 봉 포함, forming: 실시간 가격으로 진행 중인 봉 종가 대체)"""
+        forming = self.forming if forming is None else forming
+        rsi = self.rsi.value(forming)
+        ma, std = self.bb.stats(forming)
+        upper = ma + std * self.bb_k
+        lower = ma - std * self.bb_k
+        return {
+            "current_price": forming,
+            "rsi": rsi,
+            "ma": ma,
+            "upper_band": upper,
+            "lower_band": lower,
+            "bandwidth": (upper - lower) / ma * 100 if ma else NAN,
+        }
+
+
+_states = {}
+
+
+def get_state(ticker, interval, **kwargs):
+    """(ticker, interval, 설정) 별로 하나씩 만들어 재사용하는 지표 상태"""
+    key = (ticker, interval, tuple(sorted(kwargs.items())))
+    state = _states.get(key)
+    if state is None:
+        state = _states[key] = IndicatorState(**kwargs)
+    return state
+
+
+def get_moving_average(ticker, interval, window):
+    """진행 중인 봉을 포함한 단순 이동평균 상태"""
+    key = (ticker, interval, "ma", window)
+    state = _states.get(key)
+    if state is None:
+        state = _states[key] = MovingAverageState(window)
+    return state
+
+
+class MovingAverageState(_CandleConsumer):
+    __slots__ = ("stats",)
+
+    def __init__(self, window):
+        super().__init__()
+        self.stats = RollingStats(window)
+
+    def push(self, close):
+        self.stats.push(close)
+
+    def value(self, forming=None):
+        return self.stats.stats(self.forming if forming is None else forming)[0]
+
+
+# ---------------------------------------------------------------------
+# 배열(벡터) 버전 — 백테스트에서 전체 히스토리를 한 번에 계산할 때 사용
+# 위 증분 버전과 같은 정의(같은 window)로 계산한다.
+# ---------------------------------------------------------------------
+ROLLING_BLOCK = 65536  # sliding window 계산 시 한 번에 처리하는 행 수 (메모리 제한)
+
+
+def rsi_array(close, period=14, window=99):
+    """각 시점의 RSI (직전 window 개 변화량 기준, pandas ewm adjust=True 와 동일)"""
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    out = np.full(n, np.nan)
+    if n < 2:
+        return out
+    delta = np.diff(close, prepend=close[0])
+    valid = np.ones(n)
+    valid[0] = 0.0  # 첫 변화량은 NaN 취급
+    ups = np.where(delta > 0, delta, 0.0) * valid
+    downs = np.where(delta < 0, -delta, 0.0) * valid
+
+    kernel = (1 - 1 / period) ** np.arange(window)
+    w = np.convolve(valid, kernel)[:n]
+    au = np.convolve(ups, kernel)[:n]
+    ad = np.convolve(downs, kernel)[:n]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + (au / w) / (ad / w)))
+    ready = np.arange(n) >= period
+    out[ready] = rsi[ready]
+    return out
+
+
+def rolling_mean_std(x, window=20):
+    """rolling(window).mean() / .std(ddof=1) — 창이 다 차기 전에는 NaN"""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n < window:
+        return mean, std
+    view = np.lib.stride_tricks.sliding_window_view(x, window)
+    for a in range(0, len(view), ROLLING_BLOCK):
+        block = view[a:a + ROLLING_BLOCK]
+        mean[window - 1 + a:window - 1 + a + len(block)] = block.mean(axis=1)
+        std[window - 1 + a:window - 1 + a + len(block)] = block.std(axis=1, ddof=1)
+    return mean, std
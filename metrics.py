@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------------------
+# 지연 시간 계측 (히스토그램 + 카운터)
+# - 루프 1회 / 종목 판단 / pyupbit 엔드포인트별 호출 / 지표 계산 / 신호 -> 주문 완료 시간
+# - 고정 로그 구간 히스토그램이라 기록 비용이 작다 (bisect 1회 + 덧셈)
+# - http://127.0.0.1:<METRICS_PORT>/metrics (Prometheus 텍스트) 또는 주기적 JSON 요약 파일로 확인
+# ---------------------------------------------------------------------
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))   # 0 이면 HTTP 엔드포인트를 열지 않음
+SUMMARY_INTERVAL = 60                                # 요약 파일 갱신 주기(초)
+
+# 구간 경계(초): 10µs ~ 약 100초, 구간마다 1.25배 (상대 오차 약 12% 이내)
+BOUNDS = [1e-5 * 1.25 ** i for i in range(73)]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(BOUNDS, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """q(0~1) 분위 추정값 — 해당 구간 안에서 선형 보간"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= target:
+                lower = BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BOUNDS[i] if i < len(BOUNDS) else self.max
+                value = lower + (upper - lower) * (target - seen) / c
+                return min(max(value, self.min), self.max)
+            seen += c
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def histogram(self, name, **labels):
+        key = self._key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    def incr(self, name, n=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """with metrics.timer("loop"): ... — 블록 실행 시간 기록 (예외가 나도 기록)"""
+        hist = self.histogram(name, **labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            hist.observe(time.perf_counter() - started)
+
+    def since(self, name, started_at, **labels):
+        """time.time() 기준 시각부터 지금까지 (신호 발생 -> 주문 완료 등 스레드를 넘는 구간)"""
+        self.observe(name, max(0.0, time.time() - started_at), **labels)
+
+    # ------------------------------------------------------------------
+    # 내보내기
+    # ------------------------------------------------------------------
+    def _items(self):
+        # 다른 스레드가 새 지표를 추가하는 중에도 안전하게 순회하도록 복사본 사용
+        with self._lock:
+            return sorted(self.histograms.items()), sorted(self.counters.items())
+
+    def summary(self):
+        def label(name, labels):
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        histograms, counters = self._items()
+        return {
+            "uptime": time.time() - self.started,
+            "histograms": {label(n, l): h.summary() for (n, l), h in histograms},
+            "counters": {label(n, l): c for (n, l), c in counters},
+        }
+
+    def prometheus(self):
+        """Prometheus 텍스트 형식 (히스토그램은 누적 버킷)"""
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        histograms, counters = self._items()
+        lines = []
+        for (name, labels), hist in histograms:
+            metric = f"upbit_bot_{name}_seconds"
+            cumulative = 0
+            for i, c in enumerate(hist.counts[:-1]):
+                cumulative += c
+                if c:
+                    lines.append(f"{metric}_bucket{fmt(labels, [('le', f'{BOUNDS[i]:.6g}')])} {cumulative}")
+            lines.append(f"{metric}_bucket{fmt(labels, [('le', '+Inf')])} {hist.count}")
+            lines.append(f"{metric}_sum{fmt(labels)} {hist.sum:.6f}")
+            lines.append(f"{metric}_count{fmt(labels)} {hist.count}")
+        for (name, labels), value in counters:
+            lines.append(f"upbit_bot_{name}_total{fmt(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.summary(), f, indent=1)
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+
+registry = Registry()
+observe = registry.observe
+incr = registry.incr
+timer = registry.timer
+since = registry.since
+summary = registry.summary
+
+
+def serve(port=METRICS_PORT, host="127.0.0.1"):
+    """/metrics (Prometheus 텍스트), /summary (JSON) 를 돌려주는 로컬 HTTP 서버 시작"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/summary"):
+                body, ctype = json.dumps(registry.summary(), indent=1).encode(), "application/json"
+            else:
+                body, ctype = registry.prometheus().encode(), "text/plain; version=0.0.4"
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"[Metrics] http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start(summary_path=None, port=METRICS_PORT, interval=SUMMARY_INTERVAL):
+    """봇 시작 시 호출: METRICS_PORT 가 있으면 HTTP 엔드포인트, summary_path 가 있으면 주기적 요약 파일"""
+    if port:
+        serve(port)
+    if summary_path:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    registry.write_summary(summary_path)
+                except Exception as e:
+                    logging.error(f"[Metrics] 요약 저장 실패: {e}")
+        threading.Thread(target=loop, name="metrics-summary", daemon=True).start()
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import http_pool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# ---------------------------------------------------------------------
+# 텔레그램 알림 파이프라인 (백그라운드 전송)
+# - send() 는 큐에 넣고 바로 돌아온다 (매매 루프가 텔레그램 응답을 기다리지 않음)
+# - 워커 스레드가 공용 연결 풀(http_pool)의 keep-alive 세션으로 전송하고, 짧은 시간 안에 몰린 메시지는 한 통으로 합친다
+# - 큐가 가득 차면 새 메시지는 버리고, 다음 전송에 "N건 생략" 요약을 붙인다
+# - 종료 시(atexit) 남은 메시지를 마저 보낸다
+# ---------------------------------------------------------------------
+TELEGRAM_API = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+MAX_MESSAGE = 4096      # 텔레그램 메시지 최대 길이
+BATCH_WINDOW = 1.0      # 첫 메시지 이후 이 시간(초) 동안 들어온 메시지를 합쳐 보낸다
+QUEUE_SIZE = 200
+SEND_TIMEOUT = 5
+
+
+class TelegramNotifier:
+    def __init__(self, token, chat_id, prefix="", base_url=TELEGRAM_API, max_queue=QUEUE_SIZE,
+                 batch_window=BATCH_WINDOW, timeout=SEND_TIMEOUT):
+        self.token = token
+        self.chat_id = chat_id
+        self.prefix = prefix
+        self.base_url = base_url.rstrip("/")
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.enabled = bool(token and chat_id)
+        self.stats = {"queued": 0, "sent": 0, "batches": 0, "dropped": 0, "failed": 0}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    # ------------------------------------------------------------------
+    # 생산자 쪽 (매매 루프에서 호출)
+    # ------------------------------------------------------------------
+    def send(self, message):
+        """알림 예약 (블로킹 없음). 큐가 가득 차면 버리고 개수만 센다"""
+        if not self.enabled or self._closed:
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+                self.stats["dropped"] += 1
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    __call__ = send
+
+    def flush(self, timeout=10):
+        """큐에 쌓인 메시지를 모두 보낼 때까지 대기 (최대 timeout 초)"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+        return self._queue.unfinished_tasks == 0
+
+    def close(self, timeout=10):
+        """새 메시지를 받지 않고, 남은 메시지를 보낸 뒤 종료"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # 워커
+    # ------------------------------------------------------------------
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            stop = first is None
+            # 창 안에 들어온 메시지를 모은다 (종료 신호를 받으면 남은 것만 즉시 모음)
+            deadline = time.time() + self.batch_window
+            while not stop:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                stop = item is None
+            if stop:
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            messages = [m for m in batch if m is not None]
+            try:
+                if messages:
+                    self._deliver(messages)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _deliver(self, messages):
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        self.stats["sent"] += len(messages)
+        if dropped:
+            messages = messages + [f"⚠️ 알림 {dropped}건이 밀려서 생략되었습니다"]
+        for text in _pack(messages, MAX_MESSAGE - len(self.prefix)):
+            if self._post(self.prefix + text):
+                self.stats["batches"] += 1
+
+    def _post(self, text):
+        url = f"{self.base_url}/bot{self.token}/sendMessage"
+        for attempt in range(3):
+            try:
+                # 보낼 때마다 현재 공용 풀을 거친다 (시간 초과 / 오류가 풀 통계와 http_* 지표에 잡히고, install() 로 바꾼 풀도 따라감)
+                resp = http_pool.get_pool().post(url, data={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+                if resp.status_code == 429:
+                    # 텔레그램 쪽 제한: 알려 준 시간만큼 쉬고 다시 보낸다
+                    retry_after = resp.json().get("parameters", {}).get("retry_after", 1)
+                    time.sleep(min(retry_after, 30))
+                    continue
+                if resp.ok:
+                    return True
+                logging.error(f"[Notifier] 전송 실패 ({resp.status_code}): {resp.text[:200]}")
+                break
+            except Exception as e:
+                logging.error(f"[Notifier] 전송 오류: {e}")
+                time.sleep(1 + attempt)
+        self.stats["failed"] += 1
+        return False
+
+
+def _pack(messages, limit):
+    """메시지들을 빈 줄로 이어 붙이되 limit 글자를 넘지 않게 나눈다"""
+    chunks, current = [], ""
+    for message in messages:
+        while len(message) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(message[:limit])
+            message = message[limit:]
+        joined = f"{current}\n\n{message}" if current else message
+        if len(joined) > limit:
+            chunks.append(current)
+            current = message
+        else:
+            current = joined
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------------------------------------------------------------
+# 로컬 텔레그램 대역 (테스트용): 받은 메시지를 기록만 한다
+#   with StubTelegramServer() as stub:
+#       n = TelegramNotifier("token", "chat", base_url=stub.url)
+# ---------------------------------------------------------------------
+class StubTelegramServer:
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, status=200):
+        self.messages = []
+        self.delay = delay
+        self.status = status
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive (연결 재사용 확인용)
+            wbufsize = -1                  # 헤더와 본문을 한 번에 보냄 (keep-alive 에서 Nagle 지연 방지)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                fields = {k: v[0] for k, v in parse_qs(body).items()}
+                time.sleep(stub.delay)
+                stub.messages.append(fields.get("text", ""))
+                payload = json.dumps({"ok": stub.status == 200, "result": {}}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,130 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import rate_limiter
+import order_tracker
+import metrics
+
+# ---------------------------------------------------------------------
+# 일괄 주문 (09:00 장정리 / 목표 달성 / 마감 전량 매도)
+# 여러 종목의 시장가 매도를 한 종목씩 보내면 마지막 종목은 앞 주문들의 왕복 시간만큼 늦게 나간다.
+# - 주문은 스레드 풀로 한 번에 보내고, 주문 버킷(rate_limiter)이 초당 예산을 넘지 않게 순서를 잡는다
+# - 전 주문을 보낸 뒤 체결을 동시에 기다려 하나의 결과(종목별 체결 + 합계)로 돌려준다
+# - callback 을 주면 체결 대기는 백그라운드에서 하고 결과를 callback 으로 넘긴다 (매매 루프를 막지 않음)
+# ---------------------------------------------------------------------
+WORKERS = int(rate_limiter.LIMITS["order"][1])  # 동시 주문 스레드 수 (주문 버킷 버스트만큼)
+FILL_WORKERS = 16                               # 체결 동시 대기 스레드 수 (조회는 계좌 버킷을 거친다)
+MIN_VALUE = 5000                                # 이 금액(원) 미만 잔고는 주문하지 않음 (업비트 최소 주문 금액)
+
+
+def exit_order(ticker, volume, reason="", price=None):
+    """일괄 매도 1건 (price: 판단 시점 가격, 최소 주문 금액 확인 / 기록용)"""
+    return {"ticker": ticker, "volume": volume, "reason": reason, "price": price}
+
+
+class BatchExecutor:
+    """batch = BatchExecutor(account, tracker, journal=trades)
+    result = batch.sell([exit_order("KRW-BTC", 0.01, "goal", price), ...])
+    """
+
+    def __init__(self, account, tracker, journal=None, workers=WORKERS, fill_workers=FILL_WORKERS, min_value=MIN_VALUE):
+        self.account = account      # account_state.AccountState (주문 후 잔고 무효화)
+        self.tracker = tracker      # order_tracker.OrderTracker
+        self.journal = journal      # trade_journal.TradeJournal — 있으면 주문 / 체결 기록
+        self.min_value = min_value
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        # 체결 대기는 따로 — 앞 배치가 체결을 기다리는 동안에도 다음 배치 주문이 바로 나가도록
+        self.waiters = ThreadPoolExecutor(max_workers=fill_workers, thread_name_prefix="batch-fill")
+        self.stats = {"batches": 0, "orders": 0, "failed": 0}
+
+    def sell(self, orders, timeout=None, callback=None):
+        """시장가 매도 일괄 실행
+
+        주문을 모두 보낸 뒤 반환한다. callback 이 없으면 체결까지 기다려 결과를 돌려주고,
+        있으면 체결 대기를 백그라운드로 넘기고 None 반환 (끝나면 callback(result)).
+        """
+        orders = [o for o in orders if self._valid(o)]
+        if not orders:
+            result = self._result([], time.time())
+            if callback is not None:
+                callback(result)
+                return None
+            return result
+        started = time.time()
+        placed = list(self.pool.map(self._submit, orders))
+        spread = max(p["sent_at"] for p in placed) - min(p["sent_at"] for p in placed)
+        metrics.observe("batch_spread", spread, size=len(placed))
+        self.stats["batches"] += 1
+        self.stats["orders"] += len(placed)
+        logging.info(f"[Batch] 매도 {len(placed)}건 전송 ({(time.time() - started) * 1000:.0f}ms, 첫 주문 -> 마지막 주문 {spread * 1000:.0f}ms)")
+        if callback is None:
+            return self._gather(placed, started, timeout)
+        thread = threading.Thread(target=lambda: callback(self._gather(placed, started, timeout)), daemon=True)
+        thread.start()
+        return None
+
+    def _valid(self, order):
+        if not order["volume"] or order["volume"] <= 0:
+            return False
+        price = order.get("price")
+        return not price or order["volume"] * price > self.min_value
+
+    def _submit(self, order):
+        ticker = order["ticker"]
+        try:
+            response = self.account.sell_market_order(ticker, order["volume"])
+        except Exception as e:
+            logging.error(f"[Batch] {ticker} 매도 주문 실패: {e}")
+            response = None
+        sent_at = time.time()
+        if self.journal is not None:
+            self.journal.order(ticker, "ask", response, reason=order["reason"],
+                               price=order.get("price") or float("nan"), volume=order["volume"])
+        return dict(order, response=response, uuid=order_tracker.order_uuid(response), sent_at=sent_at)
+
+    def _wait(self, placed, timeout):
+        fill = self.tracker.wait(placed["response"], timeout) if placed["uuid"] else None
+        if self.journal is not None:
+            self.journal.fill(fill, reason=placed["reason"], ticker=placed["ticker"])
+        return dict(placed, fill=fill)
+
+    def _gather(self, placed, started, timeout):
+        done = list(self.waiters.map(lambda p: self._wait(p, timeout), placed))
+        result = self._result(done, started)
+        metrics.observe("batch_fill", result["elapsed"], size=len(done))
+        return result
+
+    def _result(self, done, started):
+        fills = [d["fill"] for d in done if d["fill"] and d["fill"]["volume"]]
+        failed = sum(1 for d in done if d["uuid"] is None)
+        self.stats["failed"] += failed
+        return {
+            "orders": done,
+            "filled": len(fills),
+            "failed": failed,
+            "pending": sum(1 for d in done if d["fill"] and not d["fill"]["done"]),
+            "funds": sum(f["funds"] for f in fills),
+            "fee": sum(f["fee"] for f in fills),
+            "spread": max(d["sent_at"] for d in done) - min(d["sent_at"] for d in done) if done else 0.0,
+            "elapsed": time.time() - started,
+        }
+
+
+def report(result):
+    """일괄 매도 결과 -> 텔레그램 / 로그용 여러 줄 요약 (주문이 없었으면 빈 문자열)"""
+    if not result["orders"]:
+        return ""
+    lines = []
+    for d in result["orders"]:
+        fill = d["fill"]
+        if d["uuid"] is None:
+            lines.append(f"- {d['ticker']}: 주문 실패")
+        elif not fill or not fill["volume"]:
+            lines.append(f"- {d['ticker']}: 미체결")
+        else:
+            mark = "" if fill["done"] else " (부분 체결)"
+            lines.append(f"- {d['ticker']}: {fill['volume']:.8g} @ {fill['avg_price']:,.4f} = {fill['funds']:,.0f}원{mark}")
+    lines.append(f"합계 {result['funds']:,.0f}원 (수수료 {result['fee']:,.0f}원) | "
+                 f"{result['filled']}/{len(result['orders'])}건 체결, 주문 간격 {result['spread'] * 1000:.0f}ms")
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+import time
+import logging
+import threading
+
+# ---------------------------------------------------------------------
+# 주문 체결 추적
+# 주문 응답의 uuid 로 주문 상태(upbit.get_order)를 백오프 간격으로 조회해
+# 체결이 끝나면 실제 체결 평균가 / 수량 / 금액 / 수수료를 돌려준다.
+# (주문 후 고정 sleep + 전체 잔고 조회 대체)
+# ---------------------------------------------------------------------
+FILL_TIMEOUT = 10     # 체결 대기 최대 시간(초)
+FIRST_DELAY = 0.1     # 첫 조회까지 대기(초)
+MAX_DELAY = 1.0       # 조회 간격 상한(초)
+BACKOFF = 2.0
+
+# 시장가 매수(ord_type=price)는 남은 금액이 최소 단위보다 작으면 'cancel' 로 끝나므로 둘 다 종료 상태
+FINAL_STATES = ("done", "cancel")
+
+
+def order_uuid(order):
+    """주문 응답(dict) 또는 uuid 문자열 -> uuid (주문 실패 응답이면 None)"""
+    if isinstance(order, str):
+        return order
+    if isinstance(order, dict) and "uuid" in order:
+        return order["uuid"]
+    return None
+
+
+def summarize(order):
+    """주문 상세(get_order 결과) -> 체결 요약 dict"""
+    trades = order.get("trades") or []
+    volume = sum(float(t["volume"]) for t in trades) or float(order.get("executed_volume") or 0)
+    funds = sum(float(t["funds"]) for t in trades)
+    if not funds and volume and order.get("price"):
+        funds = volume * float(order["price"])
+    return {
+        "uuid": order.get("uuid"),
+        "ticker": order.get("market"),
+        "side": order.get("side"),
+        "state": order.get("state"),
+        "done": order.get("state") in FINAL_STATES,
+        "volume": volume,
+        "funds": funds,
+        "avg_price": funds / volume if volume else 0.0,
+        "fee": float(order.get("paid_fee") or 0),
+    }
+
+
+class OrderTracker:
+    def __init__(self, upbit, timeout=FILL_TIMEOUT, first_delay=FIRST_DELAY, max_delay=MAX_DELAY):
+        self.upbit = upbit
+        self.timeout = timeout
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.stats = {"orders": 0, "filled": 0, "timeouts": 0, "polls": 0}
+
+    def wait(self, order, timeout=None):
+        """체결이 끝날 때까지 대기 후 체결 요약 반환
+
+        주문이 실패했으면 None, 시간 안에 끝나지 않으면 그때까지의 부분 체결(done=False) 반환.
+        """
+        uuid = order_uuid(order)
+        if uuid is None:
+            logging.error(f"[OrderTracker] 주문 실패 응답: {order}")
+            return None
+        self.stats["orders"] += 1
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        delay = self.first_delay
+        detail = None
+        while True:
+            time.sleep(delay)
+            self.stats["polls"] += 1
+            result = self.upbit.get_order(uuid)
+            if isinstance(result, dict) and "uuid" in result:
+                detail = result
+                if detail.get("state") in FINAL_STATES:
+                    self.stats["filled"] += 1
+                    return summarize(detail)
+            if time.time() + delay > deadline:
+                break
+            delay = min(delay * BACKOFF, self.max_delay)
+
+        self.stats["timeouts"] += 1
+        logging.warning(f"[OrderTracker] {uuid} 체결 대기 시간 초과 (state={detail and detail.get('state')})")
+        if detail is not None:
+            return summarize(detail)
+        return {"uuid": uuid, "ticker": None, "side": None, "state": None, "done": False,
+                "volume": 0.0, "funds": 0.0, "avg_price": 0.0, "fee": 0.0}
+
+    def track(self, order, callback, timeout=None):
+        """백그라운드에서 체결을 기다렸다가 callback(fill) 호출 (매매 루프를 막지 않을 때)"""
+        thread = threading.Thread(target=lambda: callback(self.wait(order, timeout)), daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,95 @@
+import time
+import logging
+import pyupbit
+
+# ---------------------------------------------------------------------
+# 시세 스냅샷
+# 루프 한 번(틱)에 필요한 모든 종목의 현재가를 한 번의 요청으로 받아온다.
+# 같은 틱 안에서는 자산 계산 / 익절·손절 / 진입 판단이 모두 같은 가격을 본다.
+# ---------------------------------------------------------------------
+MARKET_LIST_TTL = 3600  # KRW 마켓 목록 캐시 시간(초)
+
+_krw_markets = None
+_krw_markets_at = 0
+
+
+class QuoteSnapshot:
+    """한 시점의 종목별 가격 묶음"""
+
+    def __init__(self, prices, ts=None):
+        self.prices = prices
+        self.ts = ts if ts is not None else time.time()
+
+    def get(self, ticker, default=None):
+        return self.prices.get(ticker, default)
+
+    def __contains__(self, ticker):
+        return ticker in self.prices
+
+    def __len__(self):
+        return len(self.prices)
+
+
+def get_krw_markets():
+    """KRW 마켓 목록 (1시간 캐시, 조회 실패 시 None)"""
+    global _krw_markets, _krw_markets_at
+    if _krw_markets is None or time.time() - _krw_markets_at > MARKET_LIST_TTL:
+        try:
+            tickers = pyupbit.get_tickers(fiat="KRW")
+            if tickers:
+                _krw_markets = set(tickers)
+                _krw_markets_at = time.time()
+        except Exception as e:
+            logging.error(f"[Quotes] 마켓 목록 조회 실패: {e}")
+    return _krw_markets
+
+
+def fetch_quotes(tickers, source="trade"):
+    """tickers 전체의 현재가를 한 번에 조회해 QuoteSnapshot 으로 반환
+
+    source="trade": 최근 체결가 (pyupbit.get_current_price)
+    source="ask":   최우선 매도호가 (pyupbit.get_orderbook)
+    """
+    wanted = list(dict.fromkeys(t for t in tickers if t))
+
+    # 상장되지 않은 종목(에어드랍 코인 등)이 섞이면 묶음 요청 전체가 실패하므로 미리 걸러낸다
+    markets = get_krw_markets()
+    if markets is not None:
+        wanted = [t for t in wanted if t in markets]
+    if not wanted:
+        return QuoteSnapshot({})
+
+    try:
+        if source == "ask":
+            books = pyupbit.get_orderbook(ticker=wanted)
+            if isinstance(books, dict):
+                books = [books]
+            prices = {b['market']: b['orderbook_units'][0]['ask_price'] for b in books}
+        else:
+            result = pyupbit.get_current_price(wanted)
+            # 종목이 하나면 pyupbit 가 dict 대신 숫자를 돌려준다
+            prices = result if isinstance(result, dict) else {wanted[0]: result}
+    except Exception as e:
+        logging.error(f"[Quotes] 시세 조회 실패: {e}")
+        prices = {}
+
+    return QuoteSnapshot({t: p for t, p in prices.items() if p})
+
+
+def calc_wealth(balances, snapshot):
+    """잔고 목록(upbit.get_balances 결과)과 스냅샷으로 총 자산(KRW) 계산"""
+    total = 0
+    for b in balances:
+        amount = float(b['balance']) + float(b['locked'])
+        if b['currency'] == "KRW":
+            total += amount
+        else:
+            price = snapshot.get(f"KRW-{b['currency']}")
+            if price:
+                total += amount * price
+    return total
+
+
+def held_tickers(balances):
+    """잔고 목록에서 KRW 를 제외한 보유 종목 티커 목록"""
+    return [f"KRW-{b['currency']}" for b in balances if b['currency'] != "KRW"]
@@ -0,0 +1,340 @@
+import os
+import re
+import time
+import heapq
+import struct
+import logging
+import tempfile
+import itertools
+import threading
+from concurrent.futures import Future
+import pyupbit
+from pyupbit import request_api
+import metrics
+import http_pool
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 공유 없이 프로세스 안에서만 제한
+    fcntl = None
+
+# ---------------------------------------------------------------------
+# 요청 스케줄러 (엔드포인트 그룹별 토큰 버킷)
+# pyupbit 의 HTTP 호출(request_api._call_get/_call_post/_call_delete)을 가로채
+# - 시세(quotation) / 계좌(exchange) / 주문(order) 예산을 따로 두고
+# - 같은 예산 안에서는 우선순위(주문 > 계좌 > 현재가/호가 > 캔들) 순으로 토큰을 주며
+# - 같은 시세 요청이 이미 진행 중이면 새로 보내지 않고 그 결과를 나눠 쓴다.
+# 버킷 상태는 파일(fcntl 잠금)에 두어 PM2 로 여러 봇을 띄워도 한 IP/계정 예산을 함께 쓴다.
+# ---------------------------------------------------------------------
+RATE_DIR = os.getenv("UPBIT_RATE_DIR", os.path.join(tempfile.gettempdir(), "upbit_rate"))
+
+# 그룹: (초당 요청 수, 최대 버스트) — 업비트 제한보다 약간 낮게 잡는다
+LIMITS = {
+    "quotation": (9.0, 9.0),
+    "exchange": (25.0, 25.0),
+    "order": (7.0, 7.0),
+}
+ACCOUNT_GROUPS = ("exchange", "order")  # API 키(계정)마다 따로 세는 그룹 — 시세 그룹은 IP 기준이라 모두 함께 쓴다
+
+# 우선순위 (작을수록 먼저): 주문 > 계좌/주문 조회 > 현재가/호가 > 마켓/체결 > 캔들
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_QUOTE = 2
+PRIORITY_MARKET = 3
+PRIORITY_CANDLE = 4
+
+# 낮은 우선순위 요청은 버킷에 이만큼의 토큰을 남겨 두고만 가져간다 (우선 요청용 여유분)
+RESERVE = {PRIORITY_MARKET: 1.0, PRIORITY_CANDLE: 2.0}
+
+THROTTLE_PENALTY = 1.0  # 429 / 남은 요청 0 응답을 받으면 이 시간(초)만큼 그룹 전체가 쉰다
+
+_REMAINING = re.compile(r"group=([a-z\-]+); min=([0-9]+); sec=([0-9]+)")
+_STATE = struct.Struct("dd")  # (토큰 수, 마지막 갱신 시각)
+
+
+def classify(method, url):
+    """(그룹, 우선순위) — URL 경로로 업비트 엔드포인트 종류를 판단"""
+    path = url.split("api.upbit.com", 1)[-1].split("?", 1)[0]
+    if path.startswith("/v1/order") and method in ("POST", "DELETE"):
+        return "order", PRIORITY_ORDER
+    if path.startswith("/v1/candles"):
+        return "quotation", PRIORITY_CANDLE
+    if path.startswith(("/v1/ticker", "/v1/orderbook")):
+        return "quotation", PRIORITY_QUOTE
+    if path.startswith(("/v1/market", "/v1/trades")):
+        return "quotation", PRIORITY_MARKET
+    return "exchange", PRIORITY_ACCOUNT
+
+
+def endpoint(url):
+    """계측용 엔드포인트 이름 (/v1/candles/minutes/15 -> /v1/candles/minutes)"""
+    path = url.split("api.upbit.com", 1)[-1].split("?", 1)[0]
+    return "/".join(p for p in path.split("/")[:4] if not p.isdigit()) or path
+
+
+class TokenBucket:
+    """초당 rate 개씩 채워지는 토큰 버킷 (path 가 있으면 파일로 프로세스 간 공유)"""
+
+    def __init__(self, name, rate, burst, path=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.path = path if fcntl is not None else None
+        self._tokens = burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _load(self, f):
+        f.seek(0)
+        raw = f.read(_STATE.size)
+        if len(raw) == _STATE.size:
+            return _STATE.unpack(raw)
+        return self.burst, time.time()
+
+    def _store(self, f, tokens, updated):
+        f.seek(0)
+        f.write(_STATE.pack(tokens, updated))
+        f.flush()
+
+    def _update(self, fn):
+        """잠금 상태에서 (tokens, updated) -> (tokens, 반환값) 적용"""
+        with self._lock:
+            if self.path is None:
+                self._tokens, result = fn(self._tokens, self._updated)
+                self._updated = time.time()
+                return result
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # 추가 모드(a)는 seek 을 무시하고 끝에 쓰므로 O_CREAT 로 열어 r+b 로 사용
+            with os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666), "r+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    tokens, updated = self._load(f)
+                    tokens, result = fn(tokens, updated)
+                    self._store(f, tokens, time.time())
+                    return result
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_take(self, reserve=0.0):
+        """토큰을 하나 가져오면 0, 아니면 다시 시도할 때까지 기다릴 시간(초)"""
+        def take(tokens, updated):
+            tokens = min(self.burst, tokens + max(0.0, time.time() - updated) * self.rate)
+            need = 1.0 + reserve
+            if tokens >= need:
+                return tokens - 1.0, 0.0
+            return tokens, (need - tokens) / self.rate
+        return self._update(take)
+
+    def clamp(self, remaining):
+        """서버가 알려 준 남은 요청 수(Remaining-Req sec)보다 많이 갖고 있지 않도록 맞춘다"""
+        def apply(tokens, updated):
+            tokens = min(self.burst, tokens + max(0.0, time.time() - updated) * self.rate)
+            return min(tokens, float(remaining)), None
+        self._update(apply)
+
+    def drain(self, penalty=THROTTLE_PENALTY):
+        """429 등으로 제한에 걸렸을 때: 토큰을 음수로 만들어 penalty 초 동안 모든 프로세스가 쉬게 한다"""
+        self._update(lambda tokens, updated: (-penalty * self.rate, None))
+
+    def tokens(self):
+        """현재 남은 토큰 수"""
+        def peek(tokens, updated):
+            tokens = min(self.burst, tokens + max(0.0, time.time() - updated) * self.rate)
+            return tokens, tokens
+        return self._update(peek)
+
+
+class RequestScheduler:
+    """account: 기본 키가 아닌 계정 이름 — 계좌/주문 버킷을 그 계정 몫의 파일로 나눈다 (supervisor 다계정)"""
+
+    def __init__(self, limits=None, shared_dir=RATE_DIR, account=None):
+        limits = limits or LIMITS
+        self.buckets = {}
+        for group, (rate, burst) in limits.items():
+            fname = f"{group}.{account}.bucket" if account and group in ACCOUNT_GROUPS else f"{group}.bucket"
+            self.buckets[group] = TokenBucket(group, rate, burst, os.path.join(shared_dir, fname) if shared_dir else None)
+        self._cond = threading.Condition()
+        self._queues = {group: [] for group in limits}  # 그룹별 대기열 (우선순위, 순번)
+        self._seq = itertools.count()
+        self._inflight = {}
+        self._stats = {group: {"requests": 0, "coalesced": 0, "waited": 0, "wait_total": 0.0,
+                               "max_wait": 0.0, "throttled": 0} for group in limits}
+
+    # ------------------------------------------------------------------
+    # 토큰 획득 (우선순위 대기열)
+    # ------------------------------------------------------------------
+    def acquire(self, group, priority=PRIORITY_ACCOUNT):
+        """토큰을 받을 때까지 대기하고 기다린 시간(초)을 반환"""
+        bucket = self.buckets[group]
+        queue = self._queues[group]
+        ticket = (priority, next(self._seq))
+        started = time.time()
+        with self._cond:
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    # 같은 그룹에서는 대기열 맨 앞(가장 높은 우선순위)만 토큰을 시도한다
+                    if queue[0] != ticket:
+                        self._cond.wait()
+                        continue
+                    wait = bucket.try_take(RESERVE.get(priority, 0.0))
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+
+            waited = time.time() - started
+            stats = self._stats[group]
+            stats["requests"] += 1
+            if waited > 0.001:
+                stats["waited"] += 1
+                stats["wait_total"] += waited
+                stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    def observe(self, group, resp):
+        """응답의 Remaining-Req 헤더로 버킷을 서버 기준에 맞춘다"""
+        headers = getattr(resp, "headers", None)
+        matched = _REMAINING.search(headers.get("Remaining-Req", "")) if headers is not None else None
+        if matched is None:
+            return
+        remaining = int(matched.group(3))
+        if remaining <= 0:
+            self.throttled(group)
+        else:
+            self.buckets[group].clamp(remaining)
+
+    def throttled(self, group):
+        with self._cond:
+            self._stats[group]["throttled"] += 1
+        self.buckets[group].drain()
+        logging.warning(f"[RateLimit] {group} 요청 제한 도달 - {THROTTLE_PENALTY}초 대기")
+
+    # ------------------------------------------------------------------
+    # 실행 (+ 중복 요청 합치기)
+    # ------------------------------------------------------------------
+    def call(self, group, priority, fn, *args, key=None, **kwargs):
+        """토큰을 받아 fn 실행. key 가 같은 요청이 진행 중이면 그 결과를 함께 받는다"""
+        if key is not None:
+            with self._cond:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = Future()
+                else:
+                    self._stats[group]["coalesced"] += 1
+            if not owner:
+                return future.result()
+        try:
+            result = self._call(group, priority, fn, *args, **kwargs)
+        except BaseException as e:
+            if key is not None:
+                self._finish(key, exception=e)
+            raise
+        if key is not None:
+            self._finish(key, result=result)
+        return result
+
+    def _finish(self, key, result=None, exception=None):
+        with self._cond:
+            future = self._inflight.pop(key)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def _call(self, group, priority, fn, *args, **kwargs):
+        name = endpoint(args[0]) if args and isinstance(args[0], str) else group
+        for attempt in range(2):
+            metrics.observe("ratelimit_wait", self.acquire(group, priority), group=group)
+            started = time.perf_counter()
+            try:
+                resp = fn(*args, **kwargs)
+            except pyupbit.errors.TooManyRequests:
+                metrics.incr("api_errors", endpoint=name, error="TooManyRequests")
+                self.throttled(group)
+                # 주문은 중복 체결 위험이 있으므로 다시 보내지 않는다
+                if group == "order" or attempt:
+                    raise
+                metrics.incr("api_retries", endpoint=name)
+                continue
+            except Exception as e:
+                metrics.incr("api_errors", endpoint=name, error=type(e).__name__)
+                raise
+            finally:
+                metrics.observe("api", time.perf_counter() - started, endpoint=name)
+            self.observe(group, resp)
+            return resp
+
+    # ------------------------------------------------------------------
+    # 통계
+    # ------------------------------------------------------------------
+    def stats(self):
+        """그룹별 요청 수 / 합쳐진 요청 수 / 대기 횟수·평균·최대 대기 시간 / 현재 대기열 길이"""
+        with self._cond:
+            depth = {group: len(queue) for group, queue in self._queues.items()}
+        result = {}
+        for group, s in self._stats.items():
+            result[group] = dict(s, queue_depth=depth[group],
+                                 avg_wait=s["wait_total"] / s["waited"] if s["waited"] else 0.0)
+        return result
+
+    def report(self):
+        lines = []
+        for group, s in self.stats().items():
+            lines.append(f"{group}: {s['requests']} req, {s['coalesced']} coalesced, queue {s['queue_depth']}, "
+                         f"wait avg {s['avg_wait'] * 1000:.0f}ms / max {s['max_wait'] * 1000:.0f}ms, "
+                         f"throttled {s['throttled']}")
+        return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------
+# pyupbit 연결
+# ---------------------------------------------------------------------
+_scheduler = None
+_originals = {}
+
+
+def _request_key(method, url, kwargs):
+    """같은 내용의 조회 요청을 식별하는 키 (주문/취소는 합치지 않음)"""
+    if method != "GET":
+        return None
+    params = kwargs.get("params") or kwargs.get("data") or {}
+    items = params.items() if isinstance(params, dict) else [("_", params)]
+    return (url, tuple(sorted((k, str(v)) for k, v in items)))
+
+
+def _wrap(method, original):
+    def wrapper(url, **kwargs):
+        group, priority = classify(method, url)
+        return _scheduler.call(group, priority, original, url, key=_request_key(method, url, kwargs), **kwargs)
+    wrapper.__wrapped__ = original
+    return wrapper
+
+
+def install(scheduler=None):
+    """pyupbit 의 모든 HTTP 호출이 스케줄러를 거치도록 연결 (여러 번 불러도 한 번만 적용)"""
+    global _scheduler
+    if scheduler is not None:
+        _scheduler = scheduler
+    elif _scheduler is None:
+        _scheduler = RequestScheduler()
+    if not _originals:
+        for method, name in (("GET", "_call_get"), ("POST", "_call_post"), ("DELETE", "_call_delete")):
+            _originals[name] = getattr(request_api, name)
+            setattr(request_api, name, _wrap(method, _originals[name]))
+    http_pool.install()  # 실제 전송은 호스트별 keep-alive 연결 풀로 (매 요청 TCP/TLS 연결 생략)
+    return _scheduler
+
+
+def uninstall():
+    for name, original in _originals.items():
+        setattr(request_api, name, original)
+    _originals.clear()
+
+
+def get_scheduler():
+    return _scheduler
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------
+# 고정 크기 링 버퍼 (장기 실행용)
+# - 처음에 capacity 만큼 배열을 잡아 두고 그 안에서만 덮어쓰므로, 몇 주를 돌아도
+#   봉이 쌓이거나 지표 상태가 커지면서 메모리가 늘지 않는다.
+# - 같은 값을 i 와 i + capacity 두 곳에 써 두어(미러링) 최근 n 개가 항상 연속 구간이다.
+#   view(n) 은 복사 없이 numpy 슬라이스를 돌려준다.
+# - CandleRing: 캔들 열(시각 + OHLCV)을 링 버퍼로 보관 (candle_cache 장기 실행 모드)
+# ---------------------------------------------------------------------
+
+
+class RingBuffer:
+    """최근 capacity 개 값만 보관하는 1차원 배열"""
+
+    __slots__ = ("capacity", "_buf", "_head", "_size")
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=dtype)
+        self._head = 0  # 다음에 쓸 위치
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _pos(self, i):
+        """논리 위치 i (0 = 가장 오래된 값, 음수는 끝에서부터) -> 배열 위치"""
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("ring index out of range")
+        return (self._head - self._size + i) % self.capacity
+
+    def __getitem__(self, i):
+        return self._buf[self._pos(i)]
+
+    def __setitem__(self, i, value):
+        p = self._pos(i)
+        self._buf[p] = value
+        self._buf[p + self.capacity] = value
+
+    def push(self, value):
+        """값 추가 — 가득 차 있었으면 밀려난 값, 아니면 None"""
+        cap = self.capacity
+        if cap == 0:
+            return value
+        p = self._head
+        old = self._buf.item(p) if self._size == cap else None
+        self._buf[p] = value
+        self._buf[p + cap] = value
+        self._head = p + 1 if p + 1 < cap else 0
+        if self._size < cap:
+            self._size += 1
+        return old
+
+    def extend(self, values):
+        """여러 값을 한 번에 추가 (넘치는 앞부분은 버림)"""
+        cap = self.capacity
+        values = np.asarray(values, dtype=self._buf.dtype)
+        if cap == 0 or not len(values):
+            return
+        values = values[-cap:]
+        n = len(values)
+        pos = (self._head + np.arange(n)) % cap
+        self._buf[pos] = values
+        self._buf[pos + cap] = values
+        self._head = (self._head + n) % cap
+        self._size = min(self._size + n, cap)
+
+    def pop(self, n=1):
+        """최근 값 n 개를 버림 (덮어쓸 봉을 되돌릴 때)"""
+        n = min(n, self._size)
+        self._head = (self._head - n) % self.capacity if self.capacity else 0
+        self._size -= n
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def view(self, n=None):
+        """최근 n 개 (오래된 것부터) — 복사 없는 읽기 전용 슬라이스, 다음 쓰기에서 값이 바뀐다"""
+        n = self._size if n is None else min(n, self._size)
+        start = (self._head - n) % self.capacity if self.capacity else 0
+        return self._buf[start:start + n]
+
+
+class CandleRing:
+    """캔들 열별 링 버퍼 (시각은 pyupbit 인덱스와 같은 KST 기준 datetime64[ns] 의 정수값)"""
+
+    __slots__ = ("columns", "ts", "data", "version")
+
+    def __init__(self, capacity, columns):
+        self.columns = tuple(columns)
+        self.ts = RingBuffer(capacity, np.int64)
+        self.data = {c: RingBuffer(capacity) for c in self.columns}
+        self.version = 0  # 내용이 바뀔 때마다 1 증가 (소비자가 같은 버전이면 바로 건너뜀)
+
+    @property
+    def capacity(self):
+        return self.ts.capacity
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def last_ts(self):
+        """마지막 봉 시각 (정수 ns, 비어 있으면 None)"""
+        return self.ts[-1].item() if len(self.ts) else None
+
+    def load(self, df):
+        """DataFrame 전체로 다시 채움"""
+        self.ts.clear()
+        for ring in self.data.values():
+            ring.clear()
+        self.merge(df)
+
+    def merge(self, df):
+        """DataFrame(시각 오름차순)을 반영 — 같은 시각 이후의 기존 봉은 새 값으로 교체"""
+        if df is None or df.empty:
+            return
+        stamps = df.index.as_unit("ns").asi8
+        first = stamps[0]
+        # 뒤에서부터 첫 시각 이상인 봉 수 (보통 진행 중인 봉 1~2개)
+        drop = 0
+        while drop < len(self.ts) and self.ts[-1 - drop] >= first:
+            drop += 1
+        self.ts.pop(drop)
+        self.ts.extend(stamps)
+        for c, ring in self.data.items():
+            ring.pop(drop)
+            ring.extend(df[c].to_numpy(dtype=np.float64))
+        self.version += 1
+
+    def frame(self, count=None):
+        """최근 count 개를 pyupbit 모양의 DataFrame 으로 (링 버퍼와 메모리를 공유하지 않는 복사본)"""
+        index = pd.DatetimeIndex(self.ts.view(count).astype("datetime64[ns]", copy=True))
+        return pd.DataFrame({c: self.data[c].view(count).copy() for c in self.columns}, index=index)
+
+
+class CandleView:
+    """CandleRing 의 최근 count 개 (지표 상태가 DataFrame 없이 바로 읽는 용도, 한 번 만들어 계속 재사용)"""
+
+    __slots__ = ("ring", "count")
+
+    def __init__(self, ring, count):
+        self.ring = ring
+        self.count = count
+
+    def __len__(self):
+        return min(self.count, len(self.ring))
+
+    @property
+    def version(self):
+        return self.ring.version
+
+    def column(self, name):
+        """최근 count 개 값 (복사 없는 슬라이스)"""
+        return self.ring.data[name].view(self.count)
+
+    def stamps(self):
+        return self.ring.ts.view(self.count)
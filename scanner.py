@@ -0,0 +1,203 @@
+import time
+import logging
+from collections import deque
+import numpy as np
+import candle_cache
+import candle_clock
+import quotes
+import metrics
+
+# ---------------------------------------------------------------------
+# KRW 전 종목 스캐너
+# - 종목별 DataFrame 대신 (종목 x 시간) 종가 배열 하나에 확정봉을 모아 두고,
+#   틱마다 실시간 가격을 마지막 칸(진행 중인 봉)으로 붙여 RSI / 볼린저 밴드 / 밴드폭 /
+#   60분봉 MA20(bot3 하락장 필터)을 전 종목 한 번에 계산한다.
+# - 봉 경계를 지나면 배열을 한 칸 밀고 새 확정봉은 직전 실시간 가격으로 임시로 채운 뒤,
+#   틱마다 몇 종목씩 캔들을 다시 받아 실제 종가로 고친다 (경계 직후 요청이 몰리지 않도록).
+# - 지표 정의는 indicators.IndicatorState / MovingAverageState 와 같다. 다만 거래가 없던 봉
+#   (업비트가 캔들을 만들지 않음)은 직전 종가로 채우므로, 최종 진입 판단은 후보 종목만
+#   봇의 기존 지표 함수로 다시 확인한다.
+# ---------------------------------------------------------------------
+SCAN_INTERVAL = "minute15"   # bot3 / bot4 진입 지표와 같은 봉
+SCAN_COUNT = 100             # 캔들 수 (진행 중인 봉 포함, bot3 / bot4 의 get_ohlcv count 와 같음)
+TREND_INTERVAL = "minute60"  # 하락장 필터 봉
+TREND_WINDOW = 20            # 하락장 필터 이동평균 기간
+REFRESH_BATCH = 8            # 틱마다 다시 받는 종목 수 (종목당 캔들 요청 1건)
+SHORTLIST = 10               # 한 틱에 넘기는 후보 최대 개수 (RSI 낮은 순)
+
+
+class CandleMatrix:
+    """한 봉 간격의 (종목 x 확정봉) 종가 배열 — 마지막 열이 가장 최근 확정봉"""
+
+    def __init__(self, tickers, interval, depth):
+        self.tickers = list(tickers)
+        self.interval = interval
+        self.depth = depth
+        self.seconds = candle_clock.interval_seconds(interval)
+        self.close = np.full((len(self.tickers), depth), np.nan)
+        self.bar = None  # 진행 중인 봉의 시작 시각 (epoch, 업비트 봉 경계)
+        self.stale = deque(range(len(self.tickers)))  # 캔들을 (다시) 받아야 하는 행
+        self.stats = {"rolls": 0, "rows": 0, "failed": 0}
+
+    def roll(self, now, prices):
+        """봉 경계를 지났으면 열을 밀고, 새로 확정된 봉은 prices 로 임시로 채운 뒤 전 종목을 갱신 대상으로"""
+        bar = candle_clock.bar_start(self.interval, now)
+        if self.bar is None:
+            self.bar = bar
+            return
+        k = int(round((bar - self.bar) / self.seconds))
+        if k <= 0:
+            return
+        self.bar = bar
+        k = min(k, self.depth)
+        self.close[:, :-k] = self.close[:, k:]
+        self.close[:, -k:] = prices[:, None]
+        self.stale = deque(range(len(self.tickers)))
+        self.stats["rolls"] += 1
+
+    def load_row(self, i, df):
+        """캔들 DataFrame 을 시각 기준으로 i 행에 채움 (진행 중인 봉 제외, 거래 없던 봉은 직전 종가)"""
+        if df is None or df.empty:
+            return False
+        epochs = df.index.values.astype("datetime64[s]").astype(np.int64) - candle_clock.KST_SECONDS
+        pos = self.depth - np.rint((self.bar - epochs) / self.seconds).astype(np.int64)
+        mask = (pos >= 0) & (pos < self.depth)
+        row = np.full(self.depth, np.nan)
+        row[pos[mask]] = df['close'].to_numpy(dtype=np.float64)[mask]
+        filled = np.where(np.isnan(row), 0, np.arange(self.depth))
+        np.maximum.accumulate(filled, out=filled)
+        self.close[i] = row[filled]
+        return True
+
+    def refresh(self, limit=None):
+        """갱신 대상 행을 최대 limit 개 다시 받음 (None 이면 전부)"""
+        n = len(self.stale) if limit is None else min(limit, len(self.stale))
+        for _ in range(n):
+            i = self.stale.popleft()
+            ticker = self.tickers[i]
+            try:
+                df = candle_cache.get_ohlcv(ticker, interval=self.interval, count=self.depth + 1, max_age=0)
+            except Exception as e:
+                logging.error(f"[Scanner] {ticker} {self.interval} 캔들 조회 실패: {e}")
+                df = None
+            if self.load_row(i, df):
+                self.stats["rows"] += 1
+            else:
+                self.stats["failed"] += 1  # 다음 봉 경계에서 다시 시도
+
+
+class MarketScanner:
+    """KRW 마켓 전체를 한 번에 계산하는 과매도 스캐너
+
+    tickers: 감시 종목 (없으면 KRW 마켓 전체). 나머지 인자는 indicators.IndicatorState 와 같은 뜻.
+    """
+
+    def __init__(self, tickers=None, interval=SCAN_INTERVAL, count=SCAN_COUNT, rsi_period=14, bb_window=20,
+                 bb_k=2, trend_interval=TREND_INTERVAL, trend_window=TREND_WINDOW, refresh_batch=REFRESH_BATCH,
+                 exclude=()):
+        if tickers is None:
+            tickers = sorted(quotes.get_krw_markets() or [])
+        self.tickers = [t for t in tickers if t not in set(exclude)]
+        if not self.tickers:
+            raise ValueError("스캔할 종목이 없습니다 (KRW 마켓 목록 조회 실패)")
+        self.rsi_period = rsi_period
+        self.bb_window = bb_window
+        self.bb_k = bb_k
+        self.refresh_batch = refresh_batch
+        self.candles = CandleMatrix(self.tickers, interval, count - 1)
+        self.trend = CandleMatrix(self.tickers, trend_interval, trend_window - 1) if trend_interval else None
+        self.trend_window = trend_window
+        # Wilder 가중치: 가장 최근 변화량이 1, 과거로 갈수록 (1 - 1/period) 배 (변화량 count-1 개)
+        self.kernel = (1 - 1 / rsi_period) ** np.arange(count - 2, -1, -1)
+        self.prices = np.full(len(self.tickers), np.nan)
+        self.last = None
+
+    def _matrices(self):
+        return [m for m in (self.candles, self.trend) if m is not None]
+
+    def warmup(self):
+        """전 종목 캔들을 한 번에 채움 (종목 수 x 봉 간격 수 만큼 요청, 시작 시 1회)"""
+        now = time.time()
+        for m in self._matrices():
+            m.roll(now, self.prices)
+            m.refresh()
+        logging.info(f"[Scanner] {len(self.tickers)}개 종목 캔들 준비 완료")
+
+    def update(self, snapshot):
+        """스냅샷 가격 반영 + 봉 경계 처리 + 밀린 캔들 일부 갱신"""
+        now = time.time()
+        for m in self._matrices():
+            # 방금 확정된 봉은 경계 직전 가격(없으면 마지막 확정봉 종가)으로 임시로 채운다
+            m.roll(now, np.where(np.isnan(self.prices), m.close[:, -1], self.prices))
+            m.refresh(self.refresh_batch)
+        prices = np.array([snapshot.get(t) or np.nan for t in self.tickers], dtype=np.float64)
+        # 이번 스냅샷에 없는 종목은 직전 가격 유지
+        self.prices = np.where(np.isnan(prices), self.prices, prices)
+
+    def scan(self, snapshot=None):
+        """전 종목 지표 배열 dict (snapshot 이 있으면 먼저 반영)"""
+        if snapshot is not None:
+            self.update(snapshot)
+        with metrics.timer("scan"):
+            price = self.prices
+            closes = np.concatenate([self.candles.close, price[:, None]], axis=1)
+
+            # RSI (indicators.WilderRSI 와 같은 정의: 최근 count-1 개 변화량의 Wilder 가중 평균)
+            delta = np.diff(closes, axis=1)
+            valid = ~np.isnan(delta)
+            ups = np.where(delta > 0, delta, 0.0)
+            downs = np.where(delta < 0, -delta, 0.0)
+            su, sd = ups @ self.kernel, downs @ self.kernel
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = 100 - 100 / (1 + su / sd)
+            rsi = np.where(sd == 0, np.where(su > 0, 100.0, np.nan), rsi)
+            rsi[valid.sum(axis=1) < self.rsi_period] = np.nan
+
+            # 볼린저 밴드 (진행 중인 봉 포함 최근 bb_window 개, 표본 표준편차)
+            window = closes[:, -self.bb_window:]
+            ma = window.mean(axis=1)
+            std = window.std(axis=1, ddof=1)
+            upper, lower = ma + std * self.bb_k, ma - std * self.bb_k
+            with np.errstate(divide='ignore', invalid='ignore'):
+                bandwidth = (upper - lower) / ma * 100
+
+            if self.trend is not None:
+                trend_ma = np.concatenate([self.trend.close, price[:, None]], axis=1)[:, -self.trend_window:].mean(axis=1)
+            else:
+                trend_ma = np.full(len(self.tickers), np.nan)
+
+        self.last = {
+            "tickers": self.tickers,
+            "current_price": price,
+            "rsi": rsi,
+            "ma": ma,
+            "upper_band": upper,
+            "lower_band": lower,
+            "bandwidth": bandwidth,
+            "trend_ma": trend_ma,
+            "is_falling_market": price < trend_ma,
+        }
+        return self.last
+
+    def candidates(self, snapshot=None, rsi_max=30, band=True, trend_filter=False, limit=SHORTLIST):
+        """과매도 후보 종목 (RSI <= rsi_max 또는 볼린저 하단 이하), RSI 낮은 순 최대 limit 개
+
+        trend_filter: True 면 60분봉 MA20 아래(하락장)인 종목 제외 (bot3 필터)
+        """
+        r = self.scan(snapshot)
+        with np.errstate(invalid='ignore'):
+            hit = r["rsi"] <= rsi_max
+            if band:
+                hit |= r["current_price"] <= r["lower_band"]
+            if trend_filter:
+                hit &= ~r["is_falling_market"]
+        idx = np.flatnonzero(hit)
+        idx = idx[np.argsort(np.nan_to_num(r["rsi"][idx], nan=100.0), kind="stable")][:limit]
+        return [self.tickers[i] for i in idx]
+
+    def row(self, ticker):
+        """마지막 스캔 결과 중 한 종목 (로그 / 알림용)"""
+        if self.last is None:
+            return None
+        i = self.tickers.index(ticker)
+        return {"ticker": ticker, **{k: float(v[i]) for k, v in self.last.items() if k != "tickers"}}
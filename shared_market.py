@@ -0,0 +1,295 @@
+import time
+import asyncio
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+import quotes
+import async_core
+import candle_cache
+import candle_store
+import shm_util
+
+# ---------------------------------------------------------------------
+# 공유 메모리 시세 / 캔들 게시판 (supervisor 샤드 워커용)
+# - 생산자 프로세스 하나가 전 종목 현재가와 구독 캔들을 공유 메모리 블록 하나에 쓰고,
+#   샤드 워커들은 같은 메모리를 NumPy 뷰로 바로 읽는다 (파이프 / 직렬화 / 중복 시세 조회 없음).
+# - 쓰는 쪽은 항상 하나이므로 잠금 대신 시퀀스 카운터(seqlock)를 쓴다:
+#   쓰기 전후로 1 씩 올려 홀수면 쓰는 중이고, 읽기 전후 값이 다르면 다시 읽는다.
+# - 워커 상태 행(자산 / 현금 / 보유 수 / 하트비트)과 전역 매수 중지 플래그도 같은 블록에 두어
+#   슈퍼바이저가 전 계정의 리스크를 한 곳에서 본다.
+# ---------------------------------------------------------------------
+COLUMNS = candle_store.COLUMNS
+STATUS_FIELDS = ("pid", "beat", "capital", "equity", "cash", "invested", "realized", "trades", "positions", "errors")
+READ_RETRIES = 1000    # 쓰는 중인 값을 만났을 때 다시 읽는 최대 횟수 (넘으면 값 없음으로 처리)
+FEED_POLL = 0.02       # SharedQuoteFeed 가 새 시세 게시를 확인하는 주기(초)
+CANDLE_CHECK = 1.0     # 생산자가 봉 경계를 확인하는 주기(초)
+
+_READY, _BEAT, _HALT = range(3)  # control 배열 위치: 첫 게시 완료 / 생산자 하트비트 / 신규 매수 중지
+
+
+def _layout(count, intervals, slots):
+    """(이름, dtype, shape) 목록 — 만드는 쪽과 붙는 쪽이 같은 메타데이터로 같은 배치를 계산한다"""
+    fields = [
+        ("control", np.float64, (3,)),
+        ("quote_seq", np.int64, (1,)),
+        ("quote_ts", np.float64, (1,)),
+        ("prices", np.float64, (count,)),
+        ("status_seq", np.int64, (slots,)),
+        ("status", np.float64, (slots, len(STATUS_FIELDS))),
+    ]
+    for interval, depth in intervals.items():
+        fields += [
+            (f"seq:{interval}", np.int64, (count,)),
+            (f"len:{interval}", np.int64, (count,)),
+            (f"ts:{interval}", np.int64, (count, depth)),
+            (f"ohlcv:{interval}", np.float64, (count, len(COLUMNS), depth)),
+        ]
+    return fields
+
+
+class MarketBoard:
+    """시세 / 캔들 / 워커 상태를 담는 공유 메모리 블록 하나
+
+    name 이 없으면 새 블록을 만들고(슈퍼바이저), 있으면 이미 있는 블록에 붙는다(생산자 / 워커).
+    intervals: {봉 간격: 보관 캔들 수}, slots: 워커 상태 행 수
+    """
+
+    def __init__(self, tickers, intervals, slots=0, name=None):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.intervals = dict(intervals)
+        self.slots = slots
+        self.owner = name is None
+        fields = _layout(len(self.tickers), self.intervals, slots)
+        offsets, size = [], 0
+        for _, dtype, shape in fields:
+            offsets.append(size)
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 8)) if self.owner else shm_util.attach(name)
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+                       for (key, dtype, shape), offset in zip(fields, offsets)}
+        self._control = self.arrays["control"]
+
+    @property
+    def meta(self):
+        """다른 프로세스에 넘겨 attach() 로 붙을 때 쓰는 정보"""
+        return {"name": self.shm.name, "tickers": self.tickers, "intervals": self.intervals, "slots": self.slots}
+
+    @classmethod
+    def attach(cls, meta):
+        return cls(meta["tickers"], meta["intervals"], meta["slots"], name=meta["name"])
+
+    def close(self):
+        self.arrays, self._control = {}, None  # 뷰를 먼저 놓아야 블록을 닫을 수 있다
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def _read(self, seq, i, fn):
+        """seqlock 읽기: 쓰는 중이 아닐 때 fn() 결과를 읽고, 그 사이 바뀌었으면 다시 (실패하면 None)"""
+        for _ in range(READ_RETRIES):
+            before = seq.item(i)
+            if before & 1:
+                time.sleep(0)
+                continue
+            value = fn()
+            if seq.item(i) == before:
+                return value
+        return None
+
+    def recover(self):
+        """쓰던 도중 죽은 이전 생산자가 남긴 홀수(쓰는 중) 카운터를 짝수로 돌린다 (새 생산자 시작 시)"""
+        for key, arr in self.arrays.items():
+            if key.startswith("seq:") or key == "quote_seq":
+                arr += arr & 1
+
+    # ------------------------------------------------------------------
+    # 시세
+    # ------------------------------------------------------------------
+    def publish_quotes(self, snapshot):
+        """QuoteSnapshot 게시 (스냅샷에 없는 종목은 NaN — 그 종목은 이번 틱에 판단하지 않음)"""
+        values = np.array([snapshot.get(t, np.nan) or np.nan for t in self.tickers], dtype=np.float64)
+        seq = self.arrays["quote_seq"]
+        seq[0] += 1
+        self.arrays["prices"][:] = values
+        self.arrays["quote_ts"][0] = snapshot.ts
+        seq[0] += 1
+
+    def quote_version(self):
+        """시세가 게시될 때마다 바뀌는 값 (홀수면 쓰는 중)"""
+        return self.arrays["quote_seq"].item(0)
+
+    def snapshot(self, tickers=None):
+        """게시된 시세의 QuoteSnapshot (tickers 가 있으면 그 종목만, 읽지 못하면 None)"""
+        prices, stamp = self.arrays["prices"], self.arrays["quote_ts"]
+        got = self._read(self.arrays["quote_seq"], 0, lambda: (prices.tolist(), stamp.item(0)))
+        if got is None:
+            return None
+        values, ts = got
+        index = self.index
+        out = {}
+        for t in (self.tickers if tickers is None else tickers):
+            i = index.get(t)
+            if i is not None and values[i] == values[i]:
+                out[t] = values[i]
+        return quotes.QuoteSnapshot(out, ts=ts)
+
+    # ------------------------------------------------------------------
+    # 캔들
+    # ------------------------------------------------------------------
+    def publish_candles(self, ticker, interval, df):
+        """pyupbit 모양 DataFrame 의 최근 (보관 캔들 수)개로 종목 칸을 덮어쓴다"""
+        i, depth = self.index[ticker], self.intervals[interval]
+        df = df.iloc[-depth:]
+        stamps = df.index.as_unit("ns").asi8
+        values = df[list(COLUMNS)].to_numpy(dtype=np.float64).T
+        n = len(stamps)
+        seq = self.arrays[f"seq:{interval}"]
+        seq[i] += 1
+        self.arrays[f"ts:{interval}"][i, :n] = stamps
+        self.arrays[f"ohlcv:{interval}"][i, :, :n] = values
+        self.arrays[f"len:{interval}"][i] = n
+        seq[i] += 1
+
+    def get_ohlcv(self, ticker, interval="day", count=200, **kwargs):
+        """pyupbit.get_ohlcv 와 같은 모양의 DataFrame (게시된 최근 count 개, 없으면 None)
+
+        candle_cache.CandleCache(fetch=board.get_ohlcv) 로 쓰면 워커의 캔들 조회가 네트워크 없이 여기서 끝난다.
+        """
+        i = self.index.get(ticker)
+        if i is None or interval not in self.intervals:
+            return None
+        lengths, stamps, ohlcv = (self.arrays[f"{k}:{interval}"] for k in ("len", "ts", "ohlcv"))
+
+        def read():
+            n = lengths.item(i)
+            start = max(0, n - count)
+            return stamps[i, start:n].copy(), ohlcv[i, :, start:n].copy()
+
+        got = self._read(self.arrays[f"seq:{interval}"], i, read)
+        if got is None or not len(got[0]):
+            return None
+        ts, values = got
+        return pd.DataFrame(dict(zip(COLUMNS, values)), index=pd.DatetimeIndex(ts.astype("datetime64[ns]")))
+
+    # ------------------------------------------------------------------
+    # 생산자 상태 / 전역 플래그
+    # ------------------------------------------------------------------
+    @property
+    def ready(self):
+        """생산자가 구독 캔들을 한 번 다 게시했는지"""
+        return bool(self._control[_READY])
+
+    def set_ready(self):
+        self._control[_READY] = 1.0
+
+    def beat(self):
+        """생산자 하트비트 (시세 조회 성공 여부와 관계없이 루프가 돌 때마다)"""
+        self._control[_BEAT] = time.time()
+
+    @property
+    def producer_beat(self):
+        return self._control[_BEAT].item()
+
+    @property
+    def halted(self):
+        """True 면 전 워커가 신규 매수를 하지 않는다 (청산은 계속)"""
+        return bool(self._control[_HALT])
+
+    def halt(self, on=True):
+        self._control[_HALT] = 1.0 if on else 0.0
+
+    # ------------------------------------------------------------------
+    # 워커 상태 행
+    # ------------------------------------------------------------------
+    def publish_status(self, slot, **values):
+        row = np.array([values.get(f, 0.0) for f in STATUS_FIELDS], dtype=np.float64)
+        seq = self.arrays["status_seq"]
+        seq[slot] += (seq[slot] & 1) + 1  # 이전 워커가 쓰다 죽었으면 홀수로 남아 있다
+        self.arrays["status"][slot] = row
+        seq[slot] += 1
+
+    def status(self, slot):
+        """워커 상태 dict (아직 한 번도 게시하지 않았으면 None)"""
+        rows = self.arrays["status"]
+        row = self._read(self.arrays["status_seq"], slot, lambda: rows[slot].tolist())
+        if row is None or not row[0]:
+            return None
+        return dict(zip(STATUS_FIELDS, row))
+
+
+class SharedQuoteFeed(async_core.PriceFeed):
+    """게시판을 읽는 가격 피드 — 새 시세가 게시될 때마다 스냅샷 (네트워크 요청 없음)"""
+
+    def __init__(self, board, interval=FEED_POLL):
+        self.board = board
+        self.interval = interval
+
+    async def snapshots(self, tickers_fn):
+        seen = None
+        while True:
+            version = self.board.quote_version()
+            if version != seen and not version & 1:
+                snapshot = self.board.snapshot(tickers_fn())
+                if snapshot is not None:
+                    seen = version
+                    yield snapshot
+            await asyncio.sleep(self.interval)
+
+
+class MarketProducer:
+    """게시판에 시세 / 캔들을 쓰는 유일한 프로세스 — 전 워커 몫의 조회를 여기서 한 번씩만 한다
+
+    subscriptions: {(ticker, interval): 개수}
+    """
+
+    def __init__(self, board, subscriptions, source="trade", interval=async_core.POLL_INTERVAL, cache=None):
+        self.board = board
+        self.subscriptions = dict(subscriptions)
+        self.source = source
+        self.interval = interval
+        self.cache = cache or candle_cache.CandleCache(
+            store=candle_store.default_store() if candle_store.STORE_DIR else None)
+        self._published = {}  # (ticker, interval) -> 마지막으로 게시한 DataFrame (같은 객체면 건너뜀)
+
+    def publish_candles(self):
+        """봉 경계를 지난 구독만 다시 받아 게시 (candle_cache 가 경계 전에는 같은 객체를 돌려준다)"""
+        for (ticker, interval), count in self.subscriptions.items():
+            key = (ticker, interval)
+            try:
+                df = self.cache.get_ohlcv(ticker, interval=interval, count=count, max_age=candle_cache.UNTIL_CLOSE)
+            except Exception as e:
+                logging.error(f"[Producer] {ticker} {interval} 캔들 조회 실패: {e}")
+                continue
+            if df is None or df.empty or df is self._published.get(key):
+                continue
+            self.board.publish_candles(ticker, interval, df)
+            self._published[key] = df
+
+    def publish_quotes(self):
+        snapshot = quotes.fetch_quotes(self.board.tickers, self.source)
+        if len(snapshot):
+            self.board.publish_quotes(snapshot)
+
+    def run(self, alive=None):
+        """캔들 워밍업 후 시세 폴링 (alive() 가 False 를 돌려주면 종료)"""
+        alive = alive or (lambda: True)
+        self.board.recover()
+        self.publish_candles()
+        self.board.set_ready()
+        logging.info(f"[Producer] 게시 시작: 종목 {len(self.board.tickers)}개, 캔들 구독 {len(self.subscriptions)}개")
+
+        def candles():
+            while alive():
+                time.sleep(CANDLE_CHECK)
+                self.publish_candles()
+
+        threading.Thread(target=candles, name="producer-candles", daemon=True).start()
+        deadline = time.monotonic()
+        while alive():
+            self.publish_quotes()
+            self.board.beat()
+            deadline = max(deadline + self.interval, time.monotonic())
+            time.sleep(deadline - time.monotonic())
@@ -0,0 +1,16 @@
+from multiprocessing import shared_memory
+
+# ---------------------------------------------------------------------
+# 공유 메모리 블록 도우미 (sweep 캔들 배열 / shared_market 게시판 공용)
+# 붙는 쪽 프로세스는 블록을 resource_tracker 에 등록하지 않는다 —
+# 등록하면 그 프로세스가 끝날 때 만든 쪽이 아직 쓰는 블록을 정리해 버린다. 정리(unlink)는 만든 쪽 몫.
+# ---------------------------------------------------------------------
+
+
+def attach(name):
+    """이미 만들어진 공유 메모리 블록에 붙기"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 이하는 track 인자가 없다 (블록 정리는 만든 쪽에서 unlink)
+        return shared_memory.SharedMemory(name=name)
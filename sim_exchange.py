@@ -0,0 +1,701 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import runpy
+import shutil
+import hashlib
+import argparse
+import datetime
+import threading
+import _thread
+import numpy as np
+import pandas as pd
+import pyupbit
+
+# ---------------------------------------------------------------------
+# 로컬 모의 거래소 (페이퍼 트레이딩 / 결정적 리플레이)
+# 저장된 1분봉을 가상 시계로 재생하면서 봇이 쓰는 pyupbit 호출을 그대로 흉내 낸다.
+#   시세: get_ohlcv / get_current_price / get_orderbook / get_tickers
+#   계좌: Upbit(...).get_balances / get_balance / get_order / buy_market_order / sell_market_order / cancel_order
+# - 봉 안의 가격은 시가 -> 저가 -> 고가 -> 종가(양봉) / 시가 -> 고가 -> 저가 -> 종가(음봉) 경로로 보간
+# - 수수료 / 호가 스프레드 / 요청 지연 / 분할(부분) 체결 / 슬리피지를 설정할 수 있다
+# - time.time / time.sleep / datetime.datetime.now 를 가상 시계로 바꿔, sleep 은 기다리지 않고 시간만 넘긴다
+#   (speed 를 주면 실제 시간의 speed 배속으로 흐른다 — asyncio 피드를 쓰는 실행 방식용)
+#
+#   python sim_exchange.py bot4.py --legacy --days 1
+#   python sim_exchange.py --speed 60 --start 2024-05-01 strategy_engine.py bot2=0.3 bot4=0.5
+# ---------------------------------------------------------------------
+SIM_FEE = 0.0005        # 매수/매도 각각의 수수료
+SIM_LATENCY = 0.05      # 요청 1건당 지연(초)
+SIM_SPREAD = 0.0004     # 매도/매수 1호가 간격 (현재가 대비 비율)
+FILL_SLICES = 1         # 시장가 주문을 몇 번에 나눠 체결할지 (2 이상이면 부분 체결 상태가 생긴다)
+FILL_INTERVAL = 0.3     # 분할 체결 사이 간격(초)
+SLIPPAGE = 0.0          # 분할 체결 한 번마다 불리하게 밀리는 비율
+MIN_ORDER = 5000
+INITIAL_KRW = 1_000_000
+WARMUP_DAYS = 3         # 시작 시각 이전에 준비할 히스토리 (지표 워밍업용)
+SIM_TZ = "Asia/Seoul"   # 봇 프로세스의 로컬 시간대
+# 실제 키 / 텔레그램 / 로컬 캔들 저장소를 쓰지 않도록 봇 실행 전에 넣는 환경 변수 (load_dotenv 는 이미 있는 값을 덮어쓰지 않음)
+SIM_ENV = {"UPBIT_ACCESS_KEY": "sim", "UPBIT_SECRET_KEY": "sim", "TELEGRAM_TOKEN": "", "CANDLE_STORE_DIR": ""}
+SIM_STATE_DIR = "state"  # 봇 상태 저널 위치 (workdir 기준, 실제 봇의 state/ 와 분리)
+SIM_JOURNAL_DIR = "journal"  # 거래 기록 위치 (workdir 기준)
+KST = datetime.timedelta(hours=9)
+
+_real_time = time.time
+_real_time_ns = time.time_ns
+_real_sleep = time.sleep
+_real_datetime = datetime.datetime
+
+
+class SimulationFinished(BaseException):
+    """리플레이 데이터 끝 (봇 루프의 except Exception 에 잡히지 않도록 BaseException)"""
+
+
+# ---------------------------------------------------------------------
+# 가상 시계
+# ---------------------------------------------------------------------
+class SimClock:
+    """speed=None: sleep 한 만큼만 시간이 흐르는 결정적 시계 / speed=N: 실제 시간의 N 배속
+
+    결정적 모드에서 메인 스레드가 아닌 스레드의 sleep 은 메인 스레드가 시계를 그만큼 넘길 때까지
+    (최대 실제 sleep 시간만큼) 기다린다. 메인 루프 하나가 시간을 끌고 가는 --legacy 방식에 맞춘 동작이다.
+    """
+
+    def __init__(self, start, end=None, speed=None):
+        self.start = start
+        self.end = end
+        self.speed = speed or None
+        self._now = start
+        self._anchor = _real_time()
+        self._cond = threading.Condition()
+
+    def time(self):
+        if self.speed:
+            return self.start + (_real_time() - self._anchor) * self.speed
+        return self._now
+
+    def sleep(self, seconds):
+        seconds = max(0.0, seconds)
+        if self.speed:
+            _real_sleep(seconds / self.speed)
+        elif threading.current_thread() is threading.main_thread():
+            with self._cond:
+                self._now += seconds
+                self._cond.notify_all()
+        else:
+            target = self._now + seconds
+            with self._cond:
+                self._cond.wait_for(lambda: self._now >= target, timeout=seconds)
+        if self.finished() and threading.current_thread() is threading.main_thread():
+            raise SimulationFinished()
+
+    def finished(self):
+        return self.end is not None and self.time() >= self.end
+
+
+class _SimDatetimeMeta(type):
+    # 실제 datetime 인스턴스도 isinstance(x, datetime.datetime) 검사를 통과하도록
+    def __instancecheck__(cls, obj):
+        return isinstance(obj, _real_datetime)
+
+    def __subclasscheck__(cls, sub):
+        return issubclass(sub, _real_datetime)
+
+
+class SimDatetime(_real_datetime, metaclass=_SimDatetimeMeta):
+    """datetime.datetime 대역: now() / utcnow() / today() 가 가상 시계를 따른다"""
+
+    clock = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return _real_datetime.fromtimestamp(cls.clock.time(), tz)
+
+    @classmethod
+    def utcnow(cls):
+        return _real_datetime.fromtimestamp(cls.clock.time(), datetime.timezone.utc).replace(tzinfo=None)
+
+    @classmethod
+    def today(cls):
+        return cls.now()
+
+
+# ---------------------------------------------------------------------
+# 모의 거래소
+# ---------------------------------------------------------------------
+def _path_points(o, h, l, c):
+    return (o, l, h, c) if c >= o else (o, h, l, c)
+
+
+def _path_price(o, h, l, c, frac):
+    """봉 진행률 frac(0~1) 시점의 가격 (세 구간 직선 보간)"""
+    pts = _path_points(o, h, l, c)
+    seg = min(max(frac, 0.0), 1.0) * 3
+    k = min(int(seg), 2)
+    return pts[k] + (pts[k + 1] - pts[k]) * (seg - k)
+
+
+def _epoch(ts):
+    """KST 기준(tz 없음) datetime64 배열 -> UTC epoch 초"""
+    return (np.asarray(ts).astype("datetime64[ns]") - np.timedelta64(9, "h")).astype(np.int64) / 1e9
+
+
+def _interval_seconds(interval):
+    if interval.startswith("minute"):
+        return int(interval[len("minute"):]) * 60
+    return {"day": 86400, "week": 604800}[interval]
+
+
+def _iso(t):
+    return (_real_datetime.fromtimestamp(t, datetime.timezone.utc) + KST).strftime("%Y-%m-%dT%H:%M:%S+09:00")
+
+
+def _error(name, message):
+    return {"error": {"name": name, "message": message}}
+
+
+class SimExchange:
+    """1분봉 배열 dict(backtest_engine 형식)를 재생하는 모의 거래소
+
+    datasets: {ticker: {"ts", "open", "high", "low", "close", "volume"[, "value"]}}
+    start/end: 시뮬레이션 구간 (UTC epoch 초). 기본은 데이터 시작 + 워밍업 ~ 데이터 끝
+    """
+
+    def __init__(self, datasets, start=None, end=None, initial_krw=INITIAL_KRW, fee=SIM_FEE,
+                 latency=SIM_LATENCY, spread=SIM_SPREAD, fill_slices=FILL_SLICES,
+                 fill_interval=FILL_INTERVAL, slippage=SLIPPAGE, speed=None):
+        self.data = {}
+        for ticker, d in datasets.items():
+            cols = {k: np.asarray(d[k], dtype=np.float64) for k in ("open", "high", "low", "close", "volume")}
+            cols["value"] = np.asarray(d["value"], dtype=np.float64) if "value" in d else cols["close"] * cols["volume"]
+            cols["epoch"] = _epoch(d["ts"])
+            self.data[ticker] = cols
+        first = max(d["epoch"][0] for d in self.data.values())
+        last = min(d["epoch"][-1] for d in self.data.values()) + 60
+        self.start = first + WARMUP_DAYS * 86400 if start is None else start
+        self.end = last if end is None else min(end, last)
+        if self.start >= self.end:
+            raise ValueError("시뮬레이션 구간에 데이터가 없습니다 (워밍업 기간 포함)")
+        self.initial_krw = initial_krw
+        self.fee = fee
+        self.latency = latency
+        self.spread = spread
+        self.fill_slices = max(1, int(fill_slices))
+        self.fill_interval = fill_interval
+        self.slippage = slippage
+        self.clock = SimClock(self.start, self.end, speed)
+        self.accounts = {"KRW": {"balance": float(initial_krw), "locked": 0.0, "avg_buy_price": 0.0}}
+        self.orders = {}
+        self.fills = []
+        self.stats = {"requests": 0, "orders": 0, "rejected": 0}
+        self.rejections = {}
+        self.calls = {}
+        self._open = []
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 가격
+    # ------------------------------------------------------------------
+    def _index(self, ticker, t):
+        d = self.data.get(ticker)
+        if d is None:
+            return None, -1
+        return d, int(np.searchsorted(d["epoch"], t, side="right")) - 1
+
+    def price(self, ticker, t=None):
+        """t 시점(기본: 현재 가상 시각)의 체결가"""
+        t = self.clock.time() if t is None else t
+        d, i = self._index(ticker, t)
+        if d is None or i < 0:
+            return None
+        frac = (t - d["epoch"][i]) / 60
+        return _path_price(d["open"][i], d["high"][i], d["low"][i], d["close"][i], frac)
+
+    def _request(self, path):
+        """요청 1건 처리: 엔드포인트별 집계 (rate_limiter.endpoint 와 같은 이름) + 지연 + 분할 체결 반영"""
+        self.stats["requests"] += 1
+        self.calls[path] = self.calls.get(path, 0) + 1
+        if self.latency:
+            self.clock.sleep(self.latency)
+        self._settle()
+
+    # ------------------------------------------------------------------
+    # 시세 API (pyupbit 모듈 함수와 같은 모양)
+    # ------------------------------------------------------------------
+    def get_tickers(self, fiat="", *args, **kwargs):
+        return [t for t in self.data if t.startswith(fiat)]
+
+    def get_current_price(self, ticker="KRW-BTC", limit_info=False, verbose=False):
+        self._request("/v1/ticker")
+        if isinstance(ticker, str):
+            return self.price(ticker)
+        prices = {t: self.price(t) for t in ticker}
+        return {t: p for t, p in prices.items() if p is not None}
+
+    def _orderbook(self, ticker):
+        p = self.price(ticker)
+        if p is None:
+            return None
+        return {
+            "market": ticker,
+            "timestamp": int(self.clock.time() * 1000),
+            "total_ask_size": 0.0,
+            "total_bid_size": 0.0,
+            "orderbook_units": [{
+                "ask_price": p * (1 + self.spread / 2), "bid_price": p * (1 - self.spread / 2),
+                "ask_size": 0.0, "bid_size": 0.0,
+            }],
+        }
+
+    def get_orderbook(self, ticker="KRW-BTC", limit_info=False):
+        self._request("/v1/orderbook")
+        if isinstance(ticker, str):
+            return self._orderbook(ticker)
+        return [b for b in map(self._orderbook, ticker) if b is not None]
+
+    def get_ohlcv(self, ticker="KRW-BTC", interval="day", count=200, to=None, period=0.1):
+        """현재 가상 시각까지의 캔들 (마지막 행은 진행 중인 봉)"""
+        self._request("/v1/candles/minutes" if interval.startswith("minute") else f"/v1/candles/{interval}s")
+        now = self.clock.time()
+        if to is not None:
+            # pyupbit 의 to 는 UTC 기준 (그 시각 직전 봉까지)
+            now = min(now, pd.Timestamp(to).timestamp() - 1e-6)
+        d, i = self._index(ticker, now)
+        if d is None or i < 0:
+            return None
+        step = _interval_seconds(interval)
+        epoch = d["epoch"]
+        first = (now // step - (count - 1)) * step
+        lo = int(np.searchsorted(epoch, first))
+        sl = slice(lo, i + 1)
+        o, h, l, c = d["open"][sl].copy(), d["high"][sl].copy(), d["low"][sl].copy(), d["close"][sl].copy()
+        v, val = d["volume"][sl].copy(), d["value"][sl].copy()
+
+        # 진행 중인 1분봉은 지금까지 지나온 경로만 반영
+        frac = min((now - epoch[i]) / 60, 1.0)
+        if frac < 1.0:
+            pts = _path_points(o[-1], h[-1], l[-1], c[-1])
+            p = _path_price(o[-1], h[-1], l[-1], c[-1], frac)
+            seen = pts[:min(int(frac * 3), 2) + 1] + (p,)
+            h[-1], l[-1], c[-1] = max(seen), min(seen), p
+            v[-1] *= frac
+            val[-1] *= frac
+
+        keys = (epoch[sl] // step).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+        index = pd.to_datetime((keys[starts] * step + 9 * 3600) * 1_000_000_000)
+        df = pd.DataFrame({
+            "open": o[starts],
+            "high": np.maximum.reduceat(h, starts),
+            "low": np.minimum.reduceat(l, starts),
+            "close": c[ends],
+            "volume": np.add.reduceat(v, starts),
+            "value": np.add.reduceat(val, starts),
+        }, index=index)
+        return df.iloc[-count:]
+
+    # ------------------------------------------------------------------
+    # 계좌 / 주문
+    # ------------------------------------------------------------------
+    def _account(self, currency):
+        return self.accounts.setdefault(currency, {"balance": 0.0, "locked": 0.0, "avg_buy_price": 0.0})
+
+    def balances(self):
+        self._request("/v1/accounts")
+        with self._lock:
+            return [{
+                "currency": cur,
+                "balance": f"{a['balance']:.8f}",
+                "locked": f"{a['locked']:.8f}",
+                "avg_buy_price": f"{a['avg_buy_price']:.8f}",
+                "avg_buy_price_modified": False,
+                "unit_currency": "KRW",
+            } for cur, a in self.accounts.items() if cur == "KRW" or a["balance"] + a["locked"] > 0]
+
+    def market_order(self, ticker, side, price=None, volume=None):
+        """시장가 주문 접수 (매수: price=원화 금액, 매도: volume=수량)"""
+        self._request("/v1/orders")
+        with self._lock:
+            now = self.clock.time()
+            p = self.price(ticker, now)
+            if p is None:
+                return self._reject("market_does_not_exist", f"{ticker} 시세 없음")
+            krw, coin = self._account("KRW"), self._account(ticker.split("-")[1])
+            if side == "bid":
+                reserve = price * (1 + self.fee)
+                if price < MIN_ORDER:
+                    return self._reject("under_min_total_bid", f"최소주문금액 이상으로 주문해주세요 ({MIN_ORDER} KRW)")
+                if reserve > krw["balance"] + 1e-6:
+                    return self._reject("insufficient_funds_bid", "주문가능한 금액(KRW)이 부족합니다.")
+                krw["balance"] -= reserve
+                krw["locked"] += reserve
+            else:
+                if volume * p < MIN_ORDER:
+                    return self._reject("under_min_total_ask", f"최소주문금액 이상으로 주문해주세요 ({MIN_ORDER} KRW)")
+                if volume > coin["balance"] + 1e-12:
+                    return self._reject("insufficient_funds_ask", "주문가능한 금액이 부족합니다.")
+                coin["balance"] -= volume
+                coin["locked"] += volume
+            order = {
+                "uuid": str(uuid.UUID(int=len(self.orders) + 1)),  # 재실행해도 같은 uuid (결과 비교용)
+                "side": side,
+                "ord_type": "price" if side == "bid" else "market",
+                "price": f"{price}" if side == "bid" else None,
+                "state": "wait",
+                "market": ticker,
+                "created_at": _iso(now),
+                "volume": None if side == "bid" else f"{volume}",
+                "remaining_volume": None if side == "bid" else f"{volume}",
+                "reserved_fee": f"{price * self.fee}" if side == "bid" else "0",
+                "paid_fee": "0",
+                "executed_volume": "0",
+                "trades_count": 0,
+                "trades": [],
+                "_amount": price if side == "bid" else volume,
+                "_slices": [now + k * self.fill_interval for k in range(self.fill_slices)],
+                "_done": 0,
+            }
+            self.orders[order["uuid"]] = order
+            self._open.append(order)
+            self.stats["orders"] += 1
+            self._settle(now)
+            return self._public(order, trades=False)
+
+    def _reject(self, name, message):
+        """업비트와 같은 모양의 오류 응답 (사유별 횟수 집계)"""
+        self.stats["rejected"] += 1
+        self.rejections[name] = self.rejections.get(name, 0) + 1
+        return _error(name, message)
+
+    def _settle(self, now=None):
+        """체결 시각이 지난 분할 체결분을 반영"""
+        now = self.clock.time() if now is None else now
+        with self._lock:
+            for order in list(self._open):
+                while order["_done"] < len(order["_slices"]) and order["_slices"][order["_done"]] <= now:
+                    self._execute(order, order["_slices"][order["_done"]])
+                if order["state"] != "wait":
+                    self._open.remove(order)
+
+    def _execute(self, order, t):
+        k, n = order["_done"], len(order["_slices"])
+        ticker, side = order["market"], order["side"]
+        p = self.price(ticker, t)
+        krw, coin = self._account("KRW"), self._account(ticker.split("-")[1])
+        if side == "bid":
+            exec_price = p * (1 + self.spread / 2) * (1 + self.slippage * k)
+            funds = order["_amount"] / n
+            volume = math.floor(funds / exec_price * 1e8) / 1e8  # 업비트 수량 단위 (소수 8자리)
+            fee = funds * self.fee
+            krw["locked"] -= funds + fee
+            held = coin["balance"] + coin["locked"]
+            coin["avg_buy_price"] = (coin["avg_buy_price"] * held + funds) / (held + volume)
+            coin["balance"] += volume
+        else:
+            exec_price = p * (1 - self.spread / 2) * (1 - self.slippage * k)
+            volume = order["_amount"] / n
+            funds = volume * exec_price
+            fee = funds * self.fee
+            coin["locked"] -= volume
+            krw["balance"] += funds - fee
+            if coin["balance"] + coin["locked"] <= 1e-12:
+                coin["avg_buy_price"] = 0.0
+        order["trades"].append({
+            "market": ticker, "uuid": f"{order['uuid']}-{k}", "price": f"{exec_price}",
+            "volume": f"{volume}", "funds": f"{funds}", "side": side, "created_at": _iso(t),
+        })
+        order["executed_volume"] = f"{float(order['executed_volume']) + volume}"
+        order["paid_fee"] = f"{float(order['paid_fee']) + fee}"
+        order["trades_count"] += 1
+        order["_done"] += 1
+        if side == "ask":
+            order["remaining_volume"] = f"{order['_amount'] - float(order['executed_volume'])}"
+        if order["_done"] == n:
+            order["state"] = "done"
+            if side == "bid":
+                krw["locked"] = max(krw["locked"], 0.0)
+        self.fills.append((round(t, 3), ticker, side, float(exec_price), float(volume), float(funds), float(fee)))
+
+    def cancel(self, order_uuid):
+        self._request("/v1/order")
+        with self._lock:
+            order = self.orders.get(order_uuid)
+            if order is None or order["state"] != "wait":
+                return _error("order_not_found", "주문을 찾지 못했습니다.")
+            remaining = len(order["_slices"]) - order["_done"]
+            share = order["_amount"] * remaining / len(order["_slices"])
+            if order["side"] == "bid":
+                krw = self._account("KRW")
+                krw["locked"] -= share * (1 + self.fee)
+                krw["balance"] += share * (1 + self.fee)
+            else:
+                coin = self._account(order["market"].split("-")[1])
+                coin["locked"] -= share
+                coin["balance"] += share
+            order["state"] = "cancel"
+            self._open.remove(order)
+            return self._public(order, trades=False)
+
+    def get_order(self, ticker_or_uuid, state="wait"):
+        self._request("/v1/order" if ticker_or_uuid in self.orders else "/v1/orders")
+        with self._lock:
+            order = self.orders.get(ticker_or_uuid)
+            if order is not None:
+                return self._public(order)
+            return [self._public(o, trades=False) for o in self.orders.values()
+                    if o["market"] == ticker_or_uuid and o["state"] == state]
+
+    @staticmethod
+    def _public(order, trades=True):
+        public = {k: v for k, v in order.items() if not k.startswith("_")}
+        public["trades"] = [dict(t) for t in order["trades"]] if trades else []
+        return public
+
+    # ------------------------------------------------------------------
+    # 결과
+    # ------------------------------------------------------------------
+    def equity(self):
+        with self._lock:
+            total = 0.0
+            for cur, a in self.accounts.items():
+                amount = a["balance"] + a["locked"]
+                total += amount if cur == "KRW" else amount * (self.price(f"KRW-{cur}") or 0.0)
+            return float(total)
+
+    def result(self):
+        equity = self.equity()
+        return {
+            "start": _iso(self.start),
+            "end": _iso(min(self.clock.time(), self.end)),
+            "initial_krw": self.initial_krw,
+            "equity": equity,
+            "return_pct": (equity / self.initial_krw - 1) * 100,
+            "fills": len(self.fills),
+            "fees": float(sum(f[6] for f in self.fills)),
+            "orders": self.stats["orders"],
+            "rejected": dict(self.rejections),
+            "requests": dict(self.calls),
+            # 체결 내역 해시 — 같은 데이터/설정이면 실행마다 같아야 한다
+            "fingerprint": hashlib.sha1(repr(self.fills).encode()).hexdigest()[:16],
+        }
+
+
+class SimUpbit:
+    """pyupbit.Upbit 대역 (키는 무시하고 설치된 모의 거래소 계좌를 쓴다)"""
+
+    def __init__(self, access=None, secret=None, exchange=None):
+        self.exchange = exchange or _active
+
+    def get_balances(self, contain_req=False):
+        return self.exchange.balances()
+
+    def get_balance(self, ticker="KRW", verbose=False, contain_req=False):
+        currency = ticker.split("-")[1] if "-" in ticker else ticker
+        for b in self.exchange.balances():
+            if b["currency"] == currency:
+                return float(b["balance"])
+        return 0.0
+
+    def get_order(self, ticker_or_uuid, state="wait", page=1, limit=100, contain_req=False):
+        return self.exchange.get_order(ticker_or_uuid, state)
+
+    def buy_market_order(self, ticker, price, contain_req=False):
+        return self.exchange.market_order(ticker, "bid", price=float(price))
+
+    def sell_market_order(self, ticker, volume, contain_req=False):
+        return self.exchange.market_order(ticker, "ask", volume=float(volume))
+
+    def cancel_order(self, uuid, contain_req=False):
+        return self.exchange.cancel(uuid)
+
+    def buy_limit_order(self, *args, **kwargs):
+        raise NotImplementedError("모의 거래소는 시장가 주문만 지원합니다")
+
+    sell_limit_order = buy_limit_order
+
+
+# ---------------------------------------------------------------------
+# 설치 (pyupbit / 시계 교체)
+# ---------------------------------------------------------------------
+_active = None
+_originals = {}
+
+
+def install(exchange):
+    """pyupbit 시세/계좌 API 와 time/datetime 시계를 모의 거래소로 교체"""
+    global _active
+    if _active is not None:
+        uninstall()
+    _active = exchange
+    patches = [
+        (pyupbit, "get_ohlcv", exchange.get_ohlcv),
+        (pyupbit, "get_current_price", exchange.get_current_price),
+        (pyupbit, "get_orderbook", exchange.get_orderbook),
+        (pyupbit, "get_tickers", exchange.get_tickers),
+        (pyupbit, "Upbit", SimUpbit),
+        (time, "time", exchange.clock.time),
+        (time, "time_ns", lambda: int(exchange.clock.time() * 1e9)),
+        (time, "sleep", exchange.clock.sleep),
+        (datetime, "datetime", SimDatetime),
+    ]
+    for module, name, value in patches:
+        _originals[(module, name)] = getattr(module, name)
+        setattr(module, name, value)
+    SimDatetime.clock = exchange.clock
+
+    # 이미 만들어진 캔들 캐시는 생성 시 pyupbit.get_ohlcv 를 잡아 두므로 직접 바꾼다.
+    # 로컬 캔들 저장소는 실제 데이터용이라 시뮬레이션 중에는 쓰지 않는다.
+    import candle_cache
+    _originals[(candle_cache._default_cache, "fetch")] = candle_cache._default_cache.fetch
+    _originals[(candle_cache._default_cache, "store")] = candle_cache._default_cache.store
+    candle_cache._default_cache.fetch = exchange.get_ohlcv
+    candle_cache._default_cache.store = None
+    candle_cache._default_cache.invalidate()
+    return exchange
+
+
+def uninstall():
+    global _active
+    for (target, name), value in _originals.items():
+        setattr(target, name, value)
+    _originals.clear()
+    _active = None
+
+
+def load_datasets(tickers, start=None, days=1, warmup=WARMUP_DAYS, store=None):
+    """로컬 캔들 저장소에서 1분봉 배열 로드 (start 가 없으면 최근 days 일, 모자라면 업비트에서 받아 저장)"""
+    import candle_store
+    store = store or candle_store.default_store()
+    count = (days + warmup) * 1440
+    datasets = {}
+    for ticker in tickers:
+        if start is None:
+            data = store.ensure(ticker, "minute1", count)
+        else:
+            begin = pd.Timestamp(start) - pd.Timedelta(days=warmup)
+            data = store.load(ticker, "minute1", start=begin, end=pd.Timestamp(start) + pd.Timedelta(days=days))
+        if data is None or not len(data["close"]):
+            raise ValueError(f"{ticker} 1분봉 데이터가 없습니다")
+        datasets[ticker] = data
+    return datasets
+
+
+def _set_tz(tz):
+    previous = os.environ.get("TZ")
+    if tz is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = tz
+    if hasattr(time, "tzset"):
+        time.tzset()
+    return previous
+
+
+def use_state_dir(path=SIM_STATE_DIR, resume=False):
+    """봇 상태 저널 위치를 path 로 바꾸고 이전 위치 반환 (resume=False 면 이전 실행의 상태 삭제)"""
+    import state_journal
+    previous = state_journal.STATE_DIR
+    if not resume:
+        shutil.rmtree(path, ignore_errors=True)
+    state_journal.STATE_DIR = path
+    return previous
+
+
+def use_journal_dir(path=SIM_JOURNAL_DIR, resume=False):
+    """거래 기록 위치를 path 로 바꾸고 이전 위치 반환 (resume=False 면 이전 실행의 기록 삭제)"""
+    import trade_journal
+    previous = trade_journal.JOURNAL_DIR
+    if not resume:
+        shutil.rmtree(path, ignore_errors=True)
+    trade_journal.JOURNAL_DIR = path
+    return previous
+
+
+def run_script(exchange, script, argv=(), workdir="sim_runs", tz=SIM_TZ, resume=False):
+    """봇 스크립트를 코드 수정 없이 모의 거래소 위에서 __main__ 으로 실행하고 결과 dict 반환
+
+    resume: 같은 workdir 의 직전 실행 상태 저널을 이어 받음 (재시작 재현용)
+    """
+    os.environ.update(SIM_ENV)
+    # 봇은 서버 시각이 KST 라고 가정한다 (9시 리셋, 일봉 세션 등)
+    saved_tz = _set_tz(tz)
+    script = os.path.abspath(script)
+    cwd, saved_argv, saved_path = os.getcwd(), sys.argv, list(sys.path)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    saved_state_dir = use_state_dir(resume=resume)
+    saved_journal_dir = use_journal_dir(resume=resume)
+    sys.path.insert(0, os.path.dirname(script))
+    sys.argv = [script] + list(argv)
+
+    def watchdog():
+        # asyncio 루프처럼 메인 스레드가 time.sleep 을 부르지 않는 실행 방식도 구간 끝에서 멈추게 한다
+        while not exchange.clock.finished():
+            _real_sleep(0.2)
+        _thread.interrupt_main()
+
+    install(exchange)
+    threading.Thread(target=watchdog, name="sim-watchdog", daemon=True).start()
+    started = _real_time()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except (SimulationFinished, KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        uninstall()
+        use_state_dir(saved_state_dir, resume=True)
+        use_journal_dir(saved_journal_dir, resume=True)
+        os.chdir(cwd)
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        _set_tz(saved_tz)
+
+    result = exchange.result()
+    result["elapsed"] = _real_time() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="모의 거래소에서 봇 실행 (봇 스크립트 뒤의 인자는 봇에 그대로 전달)",
+        usage="python sim_exchange.py [옵션] bot4.py [봇 인자...]",
+    )
+    parser.add_argument("script", help="실행할 봇 스크립트 (bot.py ~ bot4.py, strategy_engine.py)")
+    parser.add_argument("--tickers", nargs="+", default=["KRW-BTC", "KRW-ETH", "KRW-SOL", "KRW-DOGE"])
+    parser.add_argument("--start", help="시작 시각 (KST, 예: 2024-05-01 09:00). 없으면 최근 --days 일")
+    parser.add_argument("--days", type=int, default=1, help="시뮬레이션 기간(일)")
+    parser.add_argument("--krw", type=float, default=INITIAL_KRW, help="시작 원화 잔고")
+    parser.add_argument("--fee", type=float, default=SIM_FEE)
+    parser.add_argument("--latency", type=float, default=SIM_LATENCY, help="요청 1건당 지연(초)")
+    parser.add_argument("--spread", type=float, default=SIM_SPREAD)
+    parser.add_argument("--slices", type=int, default=FILL_SLICES, help="시장가 주문 분할 체결 횟수")
+    parser.add_argument("--slippage", type=float, default=SLIPPAGE)
+    parser.add_argument("--speed", type=float, default=0,
+                        help="0: 결정적 가상 시계 (--legacy 루프용), N: 실제 시간의 N 배속 (asyncio 피드 / 엔진용)")
+    parser.add_argument("--workdir", default="sim_runs", help="봇 로그 / 지표 파일이 쌓일 디렉터리")
+    parser.add_argument("--out", help="결과 JSON 경로")
+    parser.add_argument("--resume", action="store_true", help="workdir 에 남은 직전 실행의 봇 상태(state/)를 이어 받음")
+    args, bot_args = parser.parse_known_args()
+
+    datasets = load_datasets(args.tickers, args.start, args.days)
+    start = None
+    if args.start:
+        start = (pd.Timestamp(args.start) - pd.Timedelta(hours=9)).timestamp()
+    exchange = SimExchange(
+        datasets, start=start, end=start + args.days * 86400 if start else None, initial_krw=args.krw,
+        fee=args.fee, latency=args.latency, spread=args.spread, fill_slices=args.slices,
+        slippage=args.slippage, speed=args.speed,
+    )
+
+    result = run_script(exchange, args.script, bot_args, args.workdir, resume=args.resume)
+    print(json.dumps(result, indent=1, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({**result, "trades": exchange.fills}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
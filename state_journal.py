@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import atexit
+import logging
+import datetime
+import threading
+import candle_clock
+
+# ---------------------------------------------------------------------
+# 봇 상태 저널 (재시작 시 복원)
+# - 상태 변경은 <이름>.journal 에 한 줄(JSON)씩 덧붙이고, 값이 그대로면 기록하지 않는다.
+# - 기록은 바로 flush(프로세스가 죽어도 OS 버퍼에 남음)하고, fsync 는 백그라운드에서 묶어서 한다.
+# - 기록이 COMPACT_EVERY 개 쌓이면 전체 상태를 <이름>.snapshot.json 으로 압축하고 저널을 비운다.
+#   (기록마다 순번을 붙여, 압축 도중 죽어도 스냅샷에 이미 반영된 기록은 다시 적용하지 않음)
+# - 로드는 스냅샷 1개 + 짧은 저널 재생이라 수 ms. 마지막 줄이 잘려 있으면(쓰는 도중 종료) 버린다.
+# ---------------------------------------------------------------------
+STATE_DIR = os.getenv("STATE_DIR", "state")  # 저널 / 스냅샷 위치
+FSYNC_INTERVAL = 1.0                         # 묶음 fsync 주기(초)
+COMPACT_EVERY = 1000                         # 저널 기록이 이만큼 쌓이면 스냅샷으로 압축
+_SCALARS = (str, int, float, bool, type(None))  # 인코딩 없이 == 로 "값 그대로" 를 판정할 수 있는 타입
+_MISSING = object()
+
+
+def _default(obj):
+    """JSON 으로 못 쓰는 값(set / date / datetime) 인코딩"""
+    if isinstance(obj, (set, frozenset)):
+        return {"__set__": sorted(obj, key=str)}
+    if isinstance(obj, datetime.datetime):
+        return {"__datetime__": obj.isoformat()}
+    if isinstance(obj, datetime.date):
+        return {"__date__": obj.isoformat()}
+    if hasattr(obj, "item"):  # numpy 스칼라
+        return obj.item()
+    raise TypeError(f"저널에 쓸 수 없는 값: {type(obj).__name__}")
+
+
+def _hook(d):
+    if len(d) == 1:
+        if "__set__" in d:
+            return set(d["__set__"])
+        if "__datetime__" in d:
+            return datetime.datetime.fromisoformat(d["__datetime__"])
+        if "__date__" in d:
+            return datetime.date.fromisoformat(d["__date__"])
+    return d
+
+
+def dumps(value):
+    return json.dumps(value, default=_default, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(text):
+    return json.loads(text, object_hook=_hook)
+
+
+class StateJournal:
+    """키 -> 값 상태를 추가 전용 저널 + 주기적 스냅샷으로 보관
+
+    journal = StateJournal("bot4")
+    saved = journal.load()          # 재시작이면 마지막 상태, 처음이면 {}
+    journal.set("base_asset", 1e6)  # 값이 바뀐 경우에만 기록
+    journal.set("states/KRW-BTC", {"step": 1})  # 종목별 상태는 키를 나눠 바뀐 종목만 기록
+    """
+
+    def __init__(self, name, root=None, fsync_interval=FSYNC_INTERVAL, compact_every=COMPACT_EVERY):
+        self.name = name
+        self.root = root or STATE_DIR
+        self.snapshot_path = os.path.join(self.root, f"{name}.snapshot.json")
+        self.journal_path = os.path.join(self.root, f"{name}.journal")
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.state = {}
+        self.seq = 0
+        self.stats = {"writes": 0, "skipped": 0, "fsyncs": 0, "compactions": 0, "replayed": 0, "load_ms": 0.0}
+        self._encoded = {}   # key -> 마지막으로 기록한 JSON (변경 없는 값 생략용)
+        self._records = 0    # 마지막 스냅샷 이후 저널 기록 수
+        self._file = None
+        self._dirty = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 로드
+    # ------------------------------------------------------------------
+    def load(self):
+        """스냅샷 + 저널을 재생해 마지막 상태 dict 반환 (이후 set 가능)"""
+        started = time.perf_counter()
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            self._read_snapshot()
+            self._records = self._replay(self.seq)
+            self._encoded = {k: dumps(v) for k, v in self.state.items()}
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        self.stats["load_ms"] = (time.perf_counter() - started) * 1000
+        if self.fsync_interval:
+            threading.Thread(target=self._sync_loop, name=f"journal-{self.name}", daemon=True).start()
+        atexit.register(self.close)
+        if self.state:
+            logging.info(f"[Journal] {self.name} 상태 복원: 키 {len(self.state)}개, 저널 {self.stats['replayed']}건 "
+                         f"({self.stats['load_ms']:.1f}ms)")
+        return dict(self.state)
+
+    def read(self, retries=3):
+        """다른 프로세스(실행 중인 봇)가 쓰는 상태를 읽기 전용으로 읽어 dict 반환
+
+        파일을 고치거나 열어 두지 않는다. 읽는 도중 스냅샷이 바뀌면(압축) 다시 읽는다.
+        """
+        for _ in range(retries):
+            before = self._snapshot_stamp()
+            with self._lock:
+                self._read_snapshot()
+                self._replay(self.seq, truncate=False)
+            if self._snapshot_stamp() == before:
+                break
+        return dict(self.state)
+
+    def _snapshot_stamp(self):
+        try:
+            st = os.stat(self.snapshot_path)
+            return st.st_ino, st.st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_snapshot(self):
+        self.state, self.seq = {}, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snap = loads(f.read())
+            self.state, self.seq = snap["state"], snap["seq"]
+
+    def _replay(self, snap_seq, truncate=True):
+        """스냅샷 이후 기록 적용. 잘린 마지막 줄은 잘라 내고(truncate) 남은 기록 수 반환"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        records, good = 0, 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    rec = loads(line.decode("utf-8"))
+                    seq, key = rec["s"], rec["k"]
+                except (ValueError, KeyError, UnicodeDecodeError):
+                    if truncate:
+                        logging.warning(f"[Journal] {self.name} 저널 끝의 손상된 기록 무시 (위치 {good})")
+                    break
+                good += len(line)
+                records += 1
+                if seq <= snap_seq:
+                    continue
+                if "v" in rec:
+                    self.state[key] = rec["v"]
+                else:
+                    self.state.pop(key, None)
+                self.seq = seq
+                self.stats["replayed"] += 1
+        if truncate and good != os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+        return records
+
+    # ------------------------------------------------------------------
+    # 기록
+    # ------------------------------------------------------------------
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def group(self, prefix):
+        """"prefix/이름" 키들을 {이름: 값} 으로 (종목별 상태처럼 따로 기록하는 항목)"""
+        head = prefix + "/"
+        return {k[len(head):]: v for k, v in self.state.items() if k.startswith(head)}
+
+    def set(self, key, value):
+        """값 기록 (직전 기록과 같으면 생략하고 False)"""
+        # 매 틱 같은 값을 다시 넣는 경우가 대부분이라, 단순 값은 JSON 인코딩 없이 먼저 비교
+        if type(value) in _SCALARS:
+            with self._lock:
+                old = self.state.get(key, _MISSING)
+                if type(old) is type(value) and old == value:
+                    self.stats["skipped"] += 1
+                    return False
+        text = dumps(value)
+        with self._lock:
+            if self._encoded.get(key) == text:
+                self.stats["skipped"] += 1
+                return False
+            self._append(key, text)
+            self.state[key] = loads(text)  # 호출자가 나중에 원본을 바꿔도 저장된 값은 그대로
+            self._encoded[key] = text
+        return True
+
+    def update(self, mapping):
+        """여러 키 기록, 바뀐 키 수 반환"""
+        return sum(self.set(k, v) for k, v in mapping.items())
+
+    def delete(self, key):
+        with self._lock:
+            if key not in self.state:
+                return False
+            self._append(key, None)
+            del self.state[key]
+            self._encoded.pop(key, None)
+        return True
+
+    def _append(self, key, text):
+        if self._file is None:
+            raise RuntimeError("load() 를 먼저 호출해야 합니다")
+        self.seq += 1
+        value = "" if text is None else f',"v":{text}'
+        self._file.write(f'{{"s":{self.seq},"k":{json.dumps(key, ensure_ascii=False)}{value}}}\n')
+        self._file.flush()
+        self._dirty = True
+        self._records += 1
+        self.stats["writes"] += 1
+        if self._records >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        """전체 상태를 스냅샷으로 쓰고(임시 파일 -> fsync -> rename) 저널 비우기"""
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(dumps({"seq": self.seq, "state": self.state}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self._fsync_dir()
+        self._file.close()
+        self._file = open(self.journal_path, "w", encoding="utf-8")
+        self._records = 0
+        self._dirty = False
+        self.stats["compactions"] += 1
+
+    def _fsync_dir(self):
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.root, os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def compact(self):
+        with self._lock:
+            if self._file is not None:
+                self._compact()
+
+    # ------------------------------------------------------------------
+    # fsync / 종료
+    # ------------------------------------------------------------------
+    def sync(self):
+        """쌓인 기록을 디스크에 확정"""
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self.stats["fsyncs"] += 1
+
+    def _sync_loop(self):
+        while not self._closed:
+            time.sleep(self.fsync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logging.error(f"[Journal] {self.name} fsync 실패: {e}")
+
+    def close(self):
+        if self._closed:
+            return
+        self.sync()
+        self._closed = True
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def session_date(now=None):
+    """업비트 거래일(09:00 KST 시작) — 9시 전이면 전날
+
+    now: epoch 또는 로컬 시각 datetime (없으면 지금). 서버 시간대와 상관없이
+    candle_clock 의 일봉 경계(00:00 UTC)로 나눠 session_window / 일봉 캔들과 같은 날짜를 준다.
+    """
+    if isinstance(now, datetime.datetime):
+        now = now.timestamp()
+    return candle_clock.to_kst(candle_clock.bar_start("day", now)).date()
@@ -0,0 +1,297 @@
+import logging
+import datetime
+import indicators
+import state_journal
+from strategy_engine import Strategy
+
+# ---------------------------------------------------------------------
+# 실시간 전략 (strategy_engine 용)
+# bot ~ bot4 의 매매 규칙을 Strategy 인터페이스로 옮긴 것.
+# 지표는 봉 마감(on_candle_close) 때만 확정봉을 반영하고, 틱마다는 실시간 가격을 진행 중인 봉 종가로
+# 넣어 계산하므로 틱 판단에는 네트워크 요청이 없다.
+# 보유 수량 / 평단가 / 가용 자금은 실제 계좌가 아닌 전략별 장부(ctx.book) 기준이다.
+# ---------------------------------------------------------------------
+
+
+class VolatilityBreakout(Strategy):
+    """bot.py: 변동성 돌파 + MA2 필터, 익절 1.5% / 손절 2%, 세션 종료 10초 전 청산, 하루 한 번 거래"""
+
+    name = "bot"
+    tickers = ("KRW-BTC", "KRW-ETH", "KRW-SOL")
+    candles = (("day", 2),)
+    defaults = {"k": 0.5, "tp": 0.015, "sl": 0.02, "size": 0.3}
+    state_keys = ("completed",)
+
+    def __init__(self, allocation, tickers=None, **params):
+        super().__init__(allocation, tickers, **params)
+        self.states = {}
+        self.completed = {}  # ticker -> 거래를 마친 거래일 (재시작해도 같은 날 재진입하지 않도록)
+
+    def on_candle_close(self, ctx, ticker, interval, df):
+        # 새 거래일 시작: 전일 봉으로 목표가 / MA2 갱신, 당일 거래 완료 플래그 초기화
+        prev = df.iloc[-2]
+        start = df.index[-1].to_pydatetime()
+        self.states[ticker] = {
+            'target_price': prev['close'] + (prev['high'] - prev['low']) * self.params['k'],
+            'ma2': df['close'].iloc[-2:].mean(),
+            'trade_completed_today': self.completed.get(ticker) == start.date(),
+            'start_time': start,
+            'end_time': start + datetime.timedelta(days=1),
+        }
+        logging.info(f"[{self.name}] {ticker} Target={self.states[ticker]['target_price']}, MA2={self.states[ticker]['ma2']}")
+
+    def on_tick(self, ctx, ticker, price, snapshot):
+        state = self.states.get(ticker)
+        if state is None:
+            return
+        p, book = self.params, ctx.book
+        now = datetime.datetime.now()
+
+        # 09:00:00 ~ 다음날 08:59:50 (매수/보유 구간)
+        if state['start_time'] < now < state['end_time'] - datetime.timedelta(seconds=10):
+            if not book.holding(ticker):
+                if not state['trade_completed_today'] and state['target_price'] < price and state['ma2'] < price:
+                    fill = ctx.buy(ticker, book.cash * p['size'] * 0.9995)
+                    if fill is not None:
+                        logging.info(f"[{self.name}] Filled {ticker}: {fill['volume']:.8g} @ {fill['avg_price']:,.4f}")
+            else:
+                avg_price = book.avg_price(ticker)
+                if price >= avg_price * (1 + p['tp']):
+                    if ctx.sell(ticker, reason="tp", ts=snapshot.ts):
+                        state['trade_completed_today'] = True
+                        self.completed[ticker] = state['start_time'].date()
+                elif price <= avg_price * (1 - p['sl']):
+                    if ctx.sell(ticker, reason="sl", ts=snapshot.ts):
+                        state['trade_completed_today'] = True
+                        self.completed[ticker] = state['start_time'].date()
+        # 마감 전량 매도
+        elif book.holding(ticker):
+            ctx.sell(ticker, reason="session")
+
+
+class RsiBollinger(Strategy):
+    """bot2.py: RSI + 볼린저 밴드 하단 진입, 익절 1.5% 또는 RSI 과열, 손절 1.5%"""
+
+    name = "bot2"
+    tickers = ("KRW-BTC", "KRW-ETH", "KRW-SOL")
+    candles = (("minute15", 200),)
+    defaults = {"rsi_buy": 35, "rsi_sell": 65, "band_margin": 1.01, "tp": 0.015, "sl": 0.015, "size": 0.3}
+
+    def on_candle_close(self, ctx, ticker, interval, df):
+        indicators.get_state(ticker, interval, rsi_window=199).update(df)
+
+    def on_tick(self, ctx, ticker, price, snapshot):
+        p, book = self.params, ctx.book
+        snap = indicators.get_state(ticker, "minute15", rsi_window=199).snapshot(price)
+        rsi = snap['rsi']
+
+        if not book.holding(ticker):
+            if rsi <= p['rsi_buy'] and price <= snap['lower_band'] * p['band_margin']:
+                fill = ctx.buy(ticker, book.cash * p['size'] * 0.9995)
+                if fill is not None:
+                    logging.info(f"[{self.name}] BUY {ticker} | {fill['volume']:.8g} @ {fill['avg_price']:,.4f} | RSI: {rsi:.2f}")
+        else:
+            profit_rate = price / book.avg_price(ticker) - 1
+            if profit_rate >= p['tp'] or rsi >= p['rsi_sell']:
+                ctx.sell(ticker, reason="tp", ts=snapshot.ts)
+            elif profit_rate <= -p['sl']:
+                ctx.sell(ticker, reason="sl", ts=snapshot.ts)
+
+
+class SmartDca(Strategy):
+    """bot3.py: 하락장 필터 + 과매도 1차 진입, -3% & RSI 재과매도 시 2차 매수, 동적 익절, 2차 후 -5% 손절"""
+
+    name = "bot3"
+    tickers = ("KRW-BTC", "KRW-ETH", "KRW-SOL")
+    candles = (("minute15", 100), ("minute60", 40))
+    defaults = {
+        "rsi_buy": 35, "rsi_dca": 40, "band_margin": 1.005, "bw_mult": 0.7,
+        "tp_min": 1.2, "tp_max": 3.5, "dca_drop": 0.03, "sl": 0.05, "size": 0.2,
+    }
+    state_keys = ("steps",)
+
+    def __init__(self, allocation, tickers=None, **params):
+        super().__init__(allocation, tickers, **params)
+        self.steps = {t: 0 for t in self.tickers}
+
+    def on_candle_close(self, ctx, ticker, interval, df):
+        if interval == "minute15":
+            indicators.get_state(ticker, interval, rsi_window=99).update(df)
+        else:
+            indicators.get_moving_average(ticker, interval, 20).update(df)
+
+    def on_tick(self, ctx, ticker, price, snapshot):
+        p, book = self.params, ctx.book
+        snap = indicators.get_state(ticker, "minute15", rsi_window=99).snapshot(price)
+        ma20_60 = indicators.get_moving_average(ticker, "minute60", 20).value(price)
+        rsi = snap['rsi']
+        # 장이 조용하면 1.2%, 변동성이 크면 최대 3.5%까지 익절 목표 상향
+        dynamic_target = max(p['tp_min'], min(p['tp_max'], snap['bandwidth'] * p['bw_mult']))
+
+        if book.holding(ticker):
+            avg_price = book.avg_price(ticker)
+            profit_rate = (price / avg_price - 1) * 100
+        else:
+            self.steps[ticker] = 0
+            profit_rate = 0
+
+        # [1] 1차 매수 (하락장이 아닐 때 과매도 / 볼밴 하단 근처)
+        if self.steps[ticker] == 0:
+            if (rsi <= p['rsi_buy'] or price <= snap['lower_band'] * p['band_margin']) and not price < ma20_60:
+                fill = ctx.buy(ticker, book.cash * p['size'] * 0.9995)
+                if fill is not None:
+                    self.steps[ticker] = 1
+                    ctx.notify(f"🟢 [{ticker}] 진입\n체결가: {fill['avg_price']:,.4f}원 x {fill['volume']:.8g}\n목표익절: {dynamic_target:.1f}%")
+            return
+
+        # [2] 2차 매수 (평단가 대비 3% 이상 하락 & RSI 재과매도) — 1차 매수 금액만큼 더
+        if self.steps[ticker] == 1 and price <= avg_price * (1 - p['dca_drop']) and rsi <= p['rsi_dca']:
+            fill = ctx.buy(ticker, min(book.invested(ticker), book.cash * 0.95))
+            if fill is not None:
+                self.steps[ticker] = 2
+                ctx.notify(f"🟡 [{ticker}] 전략적 추매\n수익률: {profit_rate:.2f}%\n추매 체결가: {fill['avg_price']:,.4f}원\n새 평단가: {book.avg_price(ticker):,.4f}원")
+                return
+
+        # [3] 익절 / 2차 매수 후 손절
+        if profit_rate >= dynamic_target:
+            if ctx.sell(ticker, reason="tp", ts=snapshot.ts):
+                self.steps[ticker] = 0
+                ctx.notify(f"🔵 [{ticker}] 익절 완료!\n수익: +{profit_rate:.2f}% ✨")
+        elif self.steps[ticker] == 2 and profit_rate <= -p['sl'] * 100:  # sl 은 다른 전략 / backtest_engine 과 같은 비율
+            if ctx.sell(ticker, reason="sl", ts=snapshot.ts):
+                self.steps[ticker] = 0
+                ctx.notify(f"🔴 [{ticker}] 손절 완료 (원금보호)\n손실: {profit_rate:.2f}% 🚨")
+
+
+class SurvivalRegime(Strategy):
+    """bot4.py: BTC 6시간 평균 기준 BULL/BEAR 목표, 종목별 익절 / STRICT_SL 손절, 9시 정산, 전략 목표 달성 시 휴식"""
+
+    name = "bot4"
+    tickers = ("KRW-ETH", "KRW-SOL", "KRW-DOGE")
+    extra_tickers = ("KRW-BTC",)
+    candles = (("minute15", 100),)
+    defaults = {
+        "survivor_goal": 0.012, "bull_goal": 0.025, "strict_sl": -0.05, "fee": 0.0011,
+        "rsi_buy": 30, "regime_buffer": 0.002, "size": 0.2,
+    }
+    state_keys = ("m_state", "base_asset", "rebase", "target_achieved", "daily_profits_done", "last_reset_date")
+
+    def __init__(self, allocation, tickers=None, **params):
+        super().__init__(allocation, tickers, **params)
+        self.m_state = "BEAR"
+        self.base_asset = None
+        self.rebase = False
+        self.target_achieved = False
+        self.daily_profits_done = set()
+        self.last_reset_date = state_journal.session_date()  # 9시 전에 켜도 그날 9시 정산은 한다
+
+    def subscriptions(self):
+        return super().subscriptions() + [("KRW-BTC", "minute60", 6)]
+
+    @property
+    def goal(self):
+        return self.params['bull_goal'] if self.m_state == "BULL" else self.params['survivor_goal']
+
+    def on_start(self, ctx):
+        if self.base_asset is None:  # 복원된 기준 자산은 유지 (일일 손익 판정)
+            self.base_asset = ctx.book.equity()
+        ctx.notify(f"🔥 생존 프로토콜 V4.2 가동\n- 배정 자금: {self.base_asset:,.0f}원\n- 종목별 손절선: {self.params['strict_sl']*100}%")
+
+    def on_candle_close(self, ctx, ticker, interval, df):
+        if interval == "minute60":
+            indicators.get_moving_average(ticker, interval, 6).update(df)
+        else:
+            indicators.get_state(ticker, interval, rsi_window=99).update(df)
+
+    def _update_market_state(self, ctx, btc_price):
+        """BTC 가 1시간봉 6개 평균에서 0.2% 이상 벗어날 때만 BULL/BEAR 전환"""
+        ma6 = indicators.get_moving_average("KRW-BTC", "minute60", 6).value(btc_price)
+        buffer = self.params['regime_buffer']
+        new_state = self.m_state
+        if self.m_state == "BULL" and btc_price < ma6 * (1 - buffer):
+            new_state = "BEAR"
+        elif self.m_state == "BEAR" and btc_price > ma6 * (1 + buffer):
+            new_state = "BULL"
+        if new_state != self.m_state:
+            self.m_state = new_state
+            ctx.notify(f"📉 시장 추세 변화 감지: {new_state} 모드로 전환\n- 새로운 목표 수익률: {self.goal*100:.1f}%")
+
+    def on_snapshot(self, ctx, snapshot):
+        p, book = self.params, ctx.book
+        now = datetime.datetime.now()
+
+        # 9시 정산: 세후 수익 중이거나 손절선 아래인 종목은 매도, 나머지는 보유 (재시작 등으로 놓쳤으면 바로)
+        if state_journal.session_date(now) > self.last_reset_date:
+            self.last_reset_date = state_journal.session_date(now)
+            wealth = book.equity(snapshot)
+            daily = wealth / self.base_asset - 1 if self.base_asset else 0
+            if daily < p['survivor_goal']:
+                ctx.notify(f"⚠️ [생존 실패] 일일 수익률 {daily*100:.2f}%로 목표({p['survivor_goal']*100:.1f}%) 미달")
+            for ticker in list(book.positions):
+                curr_p = snapshot.get(ticker)
+                if not curr_p:
+                    continue
+                p_rate = curr_p / book.avg_price(ticker) - 1 - p['fee']
+                if p_rate >= 0 or p_rate <= p['strict_sl']:
+                    ctx.sell(ticker, reason="settle")
+                    ctx.notify(f"🌅 9시 장정리 매도: {ticker}\n수익률: {p_rate*100:.2f}%")
+            self.target_achieved = False
+            self.daily_profits_done = set()
+            self.rebase = True  # 정산 매도가 장부에 반영된 뒤 기준 자산 재설정
+
+        if self.rebase and not book.pending:
+            self.rebase = False
+            self.base_asset = book.equity(snapshot)
+            ctx.notify(f"📅 새 날 시작\n- 자산 기준: {self.base_asset:,.0f}원")
+
+        btc_price = snapshot.get("KRW-BTC")
+        if btc_price:
+            self._update_market_state(ctx, btc_price)
+
+        # 전략 장부 기준 목표 달성 시 전량 매도 후 다음 9시까지 휴식
+        wealth = book.equity(snapshot)
+        profit_rate = wealth / self.base_asset - 1 if self.base_asset else 0
+        if profit_rate >= self.goal and not self.target_achieved:
+            self.target_achieved = True
+            for ticker in list(book.positions):
+                ctx.sell(ticker, reason="goal")
+            ctx.notify(f"✅ {self.m_state} 목표 달성! ({profit_rate*100:.2f}%)\n현 자산: {wealth:,.0f}원\n내일까지 휴식합니다.")
+
+    def on_tick(self, ctx, ticker, price, snapshot):
+        if self.target_achieved:
+            return
+        p, book = self.params, ctx.book
+
+        # 매수: RSI 30 이하 또는 볼밴 하단 (오늘 익절하지 않은 종목만)
+        if not book.holding(ticker):
+            if ticker in self.daily_profits_done:
+                return
+            snap = indicators.get_state(ticker, "minute15", rsi_window=99).snapshot(price)
+            if snap['rsi'] <= p['rsi_buy'] or price <= snap['lower_band']:
+                fill = ctx.buy(ticker, book.cash * p['size'])
+                if fill is None:
+                    return
+                avg_p = book.avg_price(ticker)
+                ctx.notify(f"🎣 [{ticker}] 매수 완료\n- 매수가: {fill['avg_price']:,.4f}원 x {fill['volume']:.8g} (RSI:{snap['rsi']:.1f})\n"
+                           f"- 익절 목표: {avg_p * (1 + self.goal + p['fee']):,.0f}원\n- 손절 기준: {avg_p * (1 + p['strict_sl'] + p['fee']):,.0f}원")
+            return
+
+        # 매도: 장부 평단가 기준 세후 익절 / 손절
+        avg_price = book.avg_price(ticker)
+        actual_p_rate = price / avg_price - 1 - p['fee']
+        if actual_p_rate >= self.goal:
+            if ctx.sell(ticker, reason="tp", ts=snapshot.ts):
+                self.daily_profits_done.add(ticker)
+                ctx.notify(f"💰 [{ticker}] 익절 완료\n- 평단가: {avg_price:,.4f}원\n- 매도가: {price:,}원\n- 세후 수익률: +{actual_p_rate*100:.2f}%")
+        elif actual_p_rate <= p['strict_sl']:
+            if ctx.sell(ticker, reason="sl", ts=snapshot.ts):
+                ctx.notify(f"💀 [{ticker}] 방어적 손절\n- 평단가: {avg_price:,.4f}원\n- 매도가: {price:,}원\n- 세후 수익률: {actual_p_rate*100:.2f}%")
+
+
+STRATEGIES = {cls.name: cls for cls in (VolatilityBreakout, RsiBollinger, SmartDca, SurvivalRegime)}
+
+
+def make_strategy(name, allocation, **params):
+    if name not in STRATEGIES:
+        raise ValueError(f"알 수 없는 전략: {name} (가능: {', '.join(STRATEGIES)})")
+    return STRATEGIES[name](allocation, **params)
@@ -0,0 +1,542 @@
+import time
+import logging
+import datetime
+import threading
+import async_core
+import account_state
+import order_tracker
+import candle_cache
+import candle_clock
+import metrics
+import trade_journal
+
+# ---------------------------------------------------------------------
+# 단일 프로세스 멀티 전략 엔진
+# 여러 전략을 한 프로세스에서 돌리며 시세 / 캔들 / 잔고 / 주문 계층을 함께 쓴다.
+# - 시세: 전 전략의 종목을 합쳐 피드 하나로 받는다 (전략이 늘어도 시세 요청 수는 그대로)
+# - 캔들: (종목, 봉 간격)별로 새 봉이 시작될 때만 한 번 받아 구독한 전략 모두에 on_candle_close 로 전달
+# - 잔고/주문: AccountState / OrderTracker 를 하나만 두고, 전략별 배정 자금과 보유 수량은 Book 장부로 나눠 관리
+# ---------------------------------------------------------------------
+MIN_ORDER = 5000        # 업비트 최소 주문 금액(KRW)
+UPBIT_FEE = 0.0005      # 매수/매도 각각의 수수료 (매수 금액 상한 계산용)
+CANDLE_CHECK = 1.0      # 봉 경계 확인 주기(초) — 시각 계산만 하고, 경계를 지났을 때만 조회
+CANDLE_RETRY = 5.0      # 경계를 지났는데 새 봉이 아직 없으면(거래 없음) 다시 조회할 간격(초)
+REPORT_INTERVAL = 600   # 전략별 장부 로그 주기(초)
+
+
+class Strategy:
+    """실시간 전략 인터페이스
+
+    엔진이 아래 콜백을 부른다. 한 전략의 콜백은 동시에 호출되지 않는다. (전략 내부 상태에 잠금 불필요)
+      on_start(ctx)                               : 가동 직후 한 번
+      on_candle_close(ctx, ticker, interval, df)  : 구독한 봉이 마감되고 새 봉이 시작될 때 (가동 시 워밍업 1회 포함)
+                                                    df 는 candle_cache 와 같은 모양, 마지막 행은 새로 시작된 봉
+      on_tick(ctx, ticker, price, snapshot)       : 담당 종목 가격이 들어올 때마다
+      on_snapshot(ctx, snapshot)                  : 스냅샷마다 한 번 (일일 리셋, 전략 전체 목표 등)
+      on_fill(ctx, fill)                          : 이 전략의 주문이 체결되어 장부에 반영된 뒤
+    """
+
+    name = ""
+    tickers = ()
+    extra_tickers = ()       # 판단에 시세만 필요한 종목 (KRW-BTC 등)
+    candles = ()             # 담당 종목마다 구독할 (봉 간격, 개수)
+    defaults = {}
+    state_keys = ()          # 재시작 시 복원할 인스턴스 속성 (엔진에 저널이 있을 때)
+
+    def __init__(self, allocation, tickers=None, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"{self.name}: 알 수 없는 파라미터 {sorted(unknown)}")
+        self.allocation = allocation
+        self.tickers = list(tickers or self.tickers)
+        self.params = {**self.defaults, **params}
+        self.book = None
+
+    def subscriptions(self):
+        """(종목, 봉 간격, 개수) 목록 — 다른 종목 캔들이 필요하면 덮어쓴다"""
+        return [(t, interval, count) for t in self.tickers for interval, count in self.candles]
+
+    def on_start(self, ctx):
+        pass
+
+    def on_candle_close(self, ctx, ticker, interval, df):
+        pass
+
+    def on_tick(self, ctx, ticker, price, snapshot):
+        pass
+
+    def on_snapshot(self, ctx, snapshot):
+        pass
+
+    def on_fill(self, ctx, fill):
+        pass
+
+    def state(self):
+        return {k: getattr(self, k) for k in self.state_keys}
+
+    def load_state(self, data):
+        for k in self.state_keys:
+            if k in data:
+                setattr(self, k, data[k])
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.allocation}, {self.params})"
+
+
+class Book:
+    """전략 하나의 가상 계좌 (배정 자금 / 종목별 보유 / 실현 손익)
+
+    실제 계좌는 여러 전략이 나눠 쓰므로, 각 전략은 자기 주문의 체결만 반영한 이 장부로 판단한다.
+    평단가는 업비트 avg_buy_price 와 같이 수수료를 빼고 계산한다.
+    """
+
+    def __init__(self, name, capital):
+        self.name = name
+        self.capital = capital
+        self.cash = capital
+        self.positions = {}     # ticker -> {"qty", "funds", "fee"}
+        self.pending = set()    # 주문이 체결 대기 중인 종목
+        self.realized = 0.0
+        self.fees = 0.0
+        self.trades = 0
+        self._lock = threading.Lock()
+
+    def qty(self, ticker):
+        return self.positions.get(ticker, {}).get("qty", 0.0)
+
+    def holding(self, ticker):
+        return self.qty(ticker) > 0
+
+    def avg_price(self, ticker):
+        pos = self.positions.get(ticker)
+        return pos["funds"] / pos["qty"] if pos and pos["qty"] else 0.0
+
+    def invested(self, ticker):
+        """매수에 쓴 금액 (수수료 제외)"""
+        return self.positions.get(ticker, {}).get("funds", 0.0)
+
+    def equity(self, snapshot=None):
+        """현금 + 보유 평가액 (시세가 없는 종목은 평단가로 평가)"""
+        total = self.cash
+        for ticker, pos in list(self.positions.items()):
+            price = snapshot.get(ticker) if snapshot is not None else None
+            total += pos["qty"] * (price or self.avg_price(ticker))
+        return total
+
+    def apply(self, fill, close=False):
+        """체결 요약(order_tracker.summarize) 반영. close=True 면 매도 후 남은 수량(잔량/찌꺼기)도 정리"""
+        volume, funds, fee = fill['volume'], fill['funds'], fill['fee']
+        with self._lock:
+            if fill['side'] == "bid":
+                pos = self.positions.setdefault(fill['ticker'], {"qty": 0.0, "funds": 0.0, "fee": 0.0})
+                pos["qty"] += volume
+                pos["funds"] += funds
+                pos["fee"] += fee
+                self.cash -= funds + fee
+            else:
+                pos = self.positions.get(fill['ticker'])
+                if pos is None or pos["qty"] <= 0:
+                    return
+                ratio = min(volume / pos["qty"], 1.0)
+                cost = (pos["funds"] + pos["fee"]) * ratio
+                self.cash += funds - fee
+                self.realized += funds - fee - cost
+                if close or ratio >= 1.0:
+                    del self.positions[fill['ticker']]
+                else:
+                    for key in pos:
+                        pos[key] *= 1 - ratio
+            self.fees += fee
+            self.trades += 1
+
+    def state(self):
+        """저널 기록용 장부 상태 (체결 대기 목록 제외)"""
+        with self._lock:
+            return {
+                "capital": self.capital, "cash": self.cash, "realized": self.realized,
+                "fees": self.fees, "trades": self.trades,
+                "positions": {t: dict(p) for t, p in self.positions.items()},
+            }
+
+    @classmethod
+    def restore(cls, name, data):
+        book = cls(name, data["capital"])
+        book.cash, book.realized = data["cash"], data["realized"]
+        book.fees, book.trades = data["fees"], data["trades"]
+        book.positions = {t: dict(p) for t, p in data["positions"].items()}
+        return book
+
+    def summary(self, snapshot=None):
+        equity = self.equity(snapshot)
+        return {
+            "name": self.name,
+            "capital": self.capital,
+            "cash": self.cash,
+            "equity": equity,
+            "return_pct": (equity / self.capital - 1) * 100 if self.capital else 0.0,
+            "realized": self.realized,
+            "fees": self.fees,
+            "trades": self.trades,
+            "positions": {t: {"qty": p["qty"], "avg_price": self.avg_price(t)} for t, p in list(self.positions.items())},
+        }
+
+
+class StrategyContext:
+    """전략이 엔진에 접근하는 창구 (주문 / 알림 / 시세)"""
+
+    def __init__(self, engine, strategy):
+        self.engine = engine
+        self.strategy = strategy
+
+    @property
+    def book(self):
+        return self.strategy.book
+
+    @property
+    def snapshot(self):
+        return self.engine.snapshot
+
+    def price(self, ticker):
+        snapshot = self.engine.snapshot
+        return snapshot.get(ticker) if snapshot is not None else None
+
+    def notify(self, message):
+        self.engine.notify(f"[{self.strategy.name}] {message}")
+
+    def buy(self, ticker, krw):
+        """배정 자금 안에서 시장가 매수 후 체결까지 대기 (체결 요약 반환, 주문하지 않았거나 실패하면 None)"""
+        engine, book = self.engine, self.book
+        if ticker in book.pending:
+            return None
+        if engine.buy_gate is not None and not engine.buy_gate(self.strategy.name, ticker, krw):
+            return None
+        # 여러 전략/종목이 동시에 진입해도 같은 원화를 나눠 쓰지 않도록 주문은 하나씩
+        with async_core.order_lock:
+            budget = min(book.cash, engine.account.balance("KRW")) / (1 + UPBIT_FEE)
+            krw = min(krw, budget)
+            if krw < MIN_ORDER:
+                return None
+            book.pending.add(ticker)
+            try:
+                order = engine.account.buy_market_order(ticker, krw)
+                trades = engine.trades.get(self.strategy.name)
+                if trades is not None:
+                    trades.order(ticker, "bid", order, price=self.price(ticker) or trade_journal.NAN, funds=krw)
+                fill = engine.tracker.wait(order)
+                if trades is not None:
+                    trades.fill(fill, ticker=ticker)
+                if fill is not None and fill['volume']:
+                    book.apply({**fill, "ticker": ticker, "side": "bid"})
+            finally:
+                book.pending.discard(ticker)
+        if fill is None or not fill['volume']:
+            return None
+        if not fill['done']:
+            logging.warning(f"[Engine] {self.strategy.name} {ticker} 매수 체결 확인 시간 초과, 확인된 {fill['volume']:.8g} 만 장부 반영")
+        metrics.incr("strategy_orders", strategy=self.strategy.name, side="bid")
+        engine._dispatch(self.strategy, "on_fill", fill)
+        return fill
+
+    def sell(self, ticker, reason=None, ts=None):
+        """장부상 보유 전량 시장가 매도 (체결은 백그라운드에서 장부에 반영)
+
+        ts: 신호가 된 시세 시각 — 있으면 신호 -> 주문 지연(tick_to_order) 기록
+        """
+        engine, book = self.engine, self.book
+        qty = book.qty(ticker)
+        if qty <= 0 or ticker in book.pending:
+            return None
+        price = self.price(ticker)
+        if price and qty * price < MIN_ORDER:
+            return None  # 최소 주문 금액 미만은 팔 수 없음
+        # 실제 잔고가 장부보다 적으면(수동 매도 등) 있는 만큼만
+        volume = min(qty, engine.account.balance(ticker))
+        if volume <= 0:
+            logging.warning(f"[Engine] {self.strategy.name} {ticker} 장부 수량 {qty:.8g} 이 있으나 실제 잔고 없음")
+            return None
+        book.pending.add(ticker)
+        order = engine.account.sell_market_order(ticker, volume)
+        trades = engine.trades.get(self.strategy.name)
+        if trades is not None:
+            trades.order(ticker, "ask", order, reason=reason or "exit", price=price or trade_journal.NAN, volume=volume)
+        if ts is not None:
+            metrics.since("tick_to_order", ts, reason=reason or "exit", strategy=self.strategy.name)
+        if order_tracker.order_uuid(order) is None:
+            book.pending.discard(ticker)
+            logging.error(f"[Engine] {self.strategy.name} {ticker} 매도 주문 실패: {order}")
+            return None
+        metrics.incr("strategy_orders", strategy=self.strategy.name, side="ask")
+        engine.tracker.track(order, lambda fill: engine._settle_sell(self.strategy, ticker, fill))
+        return order
+
+
+class StrategyEngine:
+    """여러 전략을 하나의 피드 / 캔들 캐시 / 잔고 캐시 / 주문 추적기 위에서 실행"""
+
+    def __init__(self, upbit, strategies, feed=None, notifier=None, account=None, tracker=None, journal=None,
+                 trades=None, buy_gate=None):
+        self.upbit = upbit
+        self.strategies = list(strategies)
+        names = [s.name for s in self.strategies]
+        if len(set(names)) != len(names):
+            raise ValueError(f"전략 이름이 겹칩니다: {names}")
+        self.feed = feed
+        self.notifier = notifier
+        self.account = account or account_state.AccountState(upbit)
+        self.tracker = tracker or order_tracker.OrderTracker(upbit)
+        self.journal = journal  # state_journal.StateJournal — 있으면 장부 / 전략 상태를 재시작 후 복원
+        # 거래 기록 이름 — 있으면 전략별로 journal/<trades>.<전략>/ 에 주문 / 체결 / 9시 정산 기록
+        self.trades = {s.name: trade_journal.TradeJournal(f"{trades}.{s.name}") for s in self.strategies} if trades else {}
+        # (전략 이름, 종목, 금액) -> False 면 신규 매수 보류 (supervisor 전역 리스크 한도 등, 청산은 막지 않음)
+        self.buy_gate = buy_gate
+        self.jobs = []
+        self.snapshot = None
+        self.core = None
+        self.contexts = {s.name: StrategyContext(self, s) for s in self.strategies}
+        self._locks = {s.name: threading.RLock() for s in self.strategies}
+        self._by_ticker = {}
+        self._candles = {}
+        self._report_date = None
+        for s in self.strategies:
+            for ticker in s.tickers:
+                self._by_ticker.setdefault(ticker, []).append(s)
+            for ticker, interval, count in s.subscriptions():
+                sub = self._candles.setdefault((ticker, interval), {
+                    "count": 0, "strategies": [], "last": None, "bar": None, "retry_at": 0.0,
+                })
+                sub["count"] = max(sub["count"], count)
+                sub["strategies"].append(s)
+
+    # ------------------------------------------------------------------
+    # 자금 배정
+    # ------------------------------------------------------------------
+    def allocate(self, krw=None):
+        """장부가 없는 전략의 장부 생성: allocation 이 1 이하면 가동 시 원화 잔고 대비 비율, 그보다 크면 원화 금액
+
+        복원된 장부가 있으면 그 현금을 뺀 나머지 원화 잔고에서 배정한다.
+        """
+        if krw is None:
+            krw = self.account.balance("KRW") - sum(s.book.cash for s in self.strategies if s.book is not None)
+        todo = [s for s in self.strategies if s.book is None]
+        capitals = {s.name: s.allocation * krw if s.allocation <= 1 else float(s.allocation) for s in todo}
+        if sum(capitals.values()) > krw * 1.0001:
+            raise ValueError(f"배정 자금 합계 {sum(capitals.values()):,.0f}원이 원화 잔고 {krw:,.0f}원보다 큽니다")
+        for s in todo:
+            s.book = Book(s.name, capitals[s.name])
+        if capitals:
+            logging.info("[Engine] 자금 배정: " + ", ".join(f"{n} {c:,.0f}원" for n, c in capitals.items()))
+        return capitals
+
+    def restore(self):
+        """저널에서 전략별 장부 / 상태 복원 (복원한 전략 이름 목록)"""
+        saved = self.journal.load()
+        restored = []
+        for s in self.strategies:
+            book = saved.get(f"{s.name}.book")
+            if book is None:
+                continue
+            s.book = Book.restore(s.name, book)
+            s.load_state(saved.get(f"{s.name}.state", {}))
+            restored.append(s.name)
+        if restored:
+            self._reconcile()
+            self.notify("♻️ 상태 복원\n" + self.report())
+        return restored
+
+    def _reconcile(self):
+        """꺼져 있는 동안 체결된 매도 등으로 장부 수량 합이 실제 잔고보다 많으면 장부를 비율대로 줄인다"""
+        held = {}
+        for s in self.strategies:
+            if s.book is not None:
+                for ticker, pos in s.book.positions.items():
+                    held[ticker] = held.get(ticker, 0.0) + pos["qty"]
+        for ticker, qty in held.items():
+            actual = self.account.balance(ticker)
+            if qty <= actual * 1.0001:
+                continue
+            ratio = actual / qty
+            logging.warning(f"[Engine] {ticker} 장부 수량 {qty:.8g} > 실제 잔고 {actual:.8g}, 장부를 {ratio:.4f} 배로 조정")
+            for s in self.strategies:
+                pos = s.book.positions.get(ticker) if s.book is not None else None
+                if pos is None:
+                    continue
+                if ratio <= 0:
+                    del s.book.positions[ticker]
+                else:
+                    for key in pos:
+                        pos[key] *= ratio
+
+    def _save(self, strategy):
+        """장부 / 전략 상태 저널 기록 (바뀐 경우에만 기록)"""
+        if self.journal is not None and strategy.book is not None:
+            self.journal.set(f"{strategy.name}.book", strategy.book.state())
+            self.journal.set(f"{strategy.name}.state", strategy.state())
+
+    # ------------------------------------------------------------------
+    # 콜백 전달
+    # ------------------------------------------------------------------
+    def _dispatch(self, strategy, hook, *args):
+        try:
+            with self._locks[strategy.name], metrics.timer("strategy", strategy=strategy.name, hook=hook):
+                try:
+                    return getattr(strategy, hook)(self.contexts[strategy.name], *args)
+                finally:
+                    self._save(strategy)
+        except Exception as e:
+            metrics.incr("strategy_errors", strategy=strategy.name, hook=hook)
+            logging.error(f"[Engine] {strategy.name}.{hook} 오류: {e}")
+
+    def _on_price(self, ticker, price, snapshot):
+        if not price:
+            return
+        for strategy in self._by_ticker.get(ticker, ()):
+            self._dispatch(strategy, "on_tick", ticker, price, snapshot)
+
+    def _on_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        for strategy in self.strategies:
+            self._dispatch(strategy, "on_snapshot", snapshot)
+        # 매일 9시 전략별 장부 보고
+        now = datetime.datetime.now()
+        if now.hour == 9 and self._report_date != now.date():
+            self._report_date = now.date()
+            for strategy in self.strategies:
+                if strategy.name in self.trades:
+                    self.trades[strategy.name].settle(strategy.book.equity(snapshot))
+            self.notify(f"📅 전략별 일일 요약\n{self.report()}")
+
+    def _settle_sell(self, strategy, ticker, fill):
+        """매도 체결 확인 후 장부 반영 (OrderTracker 백그라운드 스레드)"""
+        book = strategy.book
+        if strategy.name in self.trades:
+            self.trades[strategy.name].fill(fill, ticker=ticker)
+        try:
+            if fill is not None and fill['volume']:
+                book.apply({**fill, "ticker": ticker, "side": "ask"}, close=fill['done'])
+        finally:
+            book.pending.discard(ticker)
+        if fill is not None and fill['volume']:
+            self._dispatch(strategy, "on_fill", fill)
+        else:
+            with self._locks[strategy.name]:
+                self._save(strategy)
+
+    def check_candles(self):
+        """새 봉이 시작된 (종목, 간격)만 캔들을 받아 구독 전략의 on_candle_close 호출"""
+        now = time.time()
+        for (ticker, interval), sub in self._candles.items():
+            bar = candle_clock.bar_start(interval, now)
+            if sub["bar"] == bar or now < sub["retry_at"]:
+                continue
+            df = candle_cache.get_ohlcv(ticker, interval=interval, count=sub["count"], max_age=0)
+            if df is None or df.empty or df.index[-1] == sub["last"]:
+                # 경계 직후 거래가 없어 새 봉이 아직 안 생겼으면 잠시 뒤 다시 확인
+                sub["retry_at"] = now + CANDLE_RETRY
+                continue
+            sub["last"], sub["bar"] = df.index[-1], bar
+            for strategy in sub["strategies"]:
+                self._dispatch(strategy, "on_candle_close", ticker, interval, df)
+
+    def _watch_list(self):
+        """피드에 추가로 필요한 종목: 전략별 참고 종목 + 장부에 남은 보유 종목"""
+        extra = []
+        for s in self.strategies:
+            extra += list(s.extra_tickers)
+            if s.book is not None:
+                extra += list(s.book.positions)
+        return extra
+
+    # ------------------------------------------------------------------
+    # 알림 / 보고
+    # ------------------------------------------------------------------
+    def notify(self, message):
+        logging.info(f"[Notify] {message}")
+        if self.notifier is not None:
+            self.notifier(message)
+
+    def report(self):
+        lines = []
+        for s in self.strategies:
+            b = s.book.summary(self.snapshot)
+            held = ", ".join(f"{t.split('-')[1]} {p['qty']:.6g}@{p['avg_price']:,.4g}" for t, p in b['positions'].items()) or "-"
+            lines.append(f"{b['name']}: {b['equity']:,.0f}원 ({b['return_pct']:+.2f}%) | 실현 {b['realized']:+,.0f} | "
+                         f"거래 {b['trades']} | 보유 {held}")
+        return "\n".join(lines)
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def start(self):
+        """장부 복원/배정 + 전략 on_start + 캔들 워밍업 (run 전에 따로 불러도 됨)"""
+        if self.journal is not None:
+            self.restore()
+        if any(s.book is None for s in self.strategies):
+            self.allocate()
+        for strategy in self.strategies:
+            self._dispatch(strategy, "on_start")
+        self.check_candles()
+
+    def add_job(self, fn, interval, name=None):
+        """run() 때 코어에 함께 등록할 주기 작업 (상태 게시 등)"""
+        self.jobs.append((fn, interval, name))
+
+    def run(self):
+        self.start()
+        self.core = async_core.AsyncTradingCore(
+            list(self._by_ticker),
+            feed=self.feed,
+            on_price=self._on_price,
+            on_snapshot=self._on_snapshot,
+            extra_tickers=self._watch_list,
+        )
+        self.core.add_job(self.check_candles, CANDLE_CHECK, name="candles")
+        self.core.add_job(lambda: logging.info(f"[Engine]\n{self.report()}"), REPORT_INTERVAL, name="report")
+        for job in self.jobs:
+            self.core.add_job(*job)
+        async_core.run(self.core)
+        return self.core
+
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    import pyupbit
+    from dotenv import load_dotenv
+    import rate_limiter
+    import notifier
+    import strategies
+    import state_journal
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("engine_trading.log", encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    load_dotenv()
+
+    def parse_allocation(text):
+        name, value = text.split("=", 1)
+        return name, float(value)
+
+    parser = argparse.ArgumentParser(description="멀티 전략 엔진 (시세/잔고/주문 계층 공유)")
+    parser.add_argument("allocations", nargs="+", type=parse_allocation,
+                        help="전략=배정 (예: bot2=0.3 bot4=0.5 — 1 이하는 원화 잔고 대비 비율, 그보다 크면 원화 금액)")
+    parser.add_argument("--feed", choices=["rest", "ws"], default="rest", help="가격 피드 (rest: 0.5초 폴링, ws: 웹소켓)")
+    args = parser.parse_args()
+
+    rate_limiter.install()
+    upbit = pyupbit.Upbit(os.getenv("UPBIT_ACCESS_KEY"), os.getenv("UPBIT_SECRET_KEY"))
+    telegram = notifier.TelegramNotifier(os.getenv("TELEGRAM_TOKEN"), os.getenv("TELEGRAM_CHAT_ID"), prefix="🧠 [Engine]\n")
+    engine = StrategyEngine(
+        upbit,
+        [strategies.make_strategy(name, allocation) for name, allocation in args.allocations],
+        feed=async_core.UpbitWebSocketFeed() if args.feed == "ws" else None,
+        notifier=telegram.send,
+        journal=state_journal.StateJournal("engine"),  # 재시작 시 전략별 장부 / 상태 복원
+        trades="engine",                               # journal/engine.<전략>/ 거래 기록
+    )
+    metrics.start(summary_path="engine_metrics.json")
+    engine.run()
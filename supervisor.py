@@ -0,0 +1,412 @@
+import os
+import time
+import signal
+import logging
+import argparse
+import multiprocessing
+import pyupbit
+from dotenv import load_dotenv
+import rate_limiter
+import notifier
+import metrics
+import candle_cache
+import strategies
+import state_journal
+import shared_market
+import strategy_engine
+
+# ---------------------------------------------------------------------
+# 멀티 프로세스 슈퍼바이저 (종목 / 계정 샤딩)
+# - 계정(업비트 API 키)별로, 또 종목 묶음(샤드)별로 워커 프로세스를 하나씩 띄워 StrategyEngine 을 나눠 돌린다.
+#   종목이 늘어도 샤드를 코어 수만큼 늘리면 틱 판단이 여러 코어에서 동시에 처리된다.
+# - 시세 / 캔들 조회는 생산자 프로세스 하나가 전 워커 몫을 한 번씩만 하고 공유 메모리(shared_market)에 게시,
+#   워커는 네트워크 요청 없이 그 메모리를 읽는다.
+# - 생산자 / 워커가 죽거나 하트비트가 끊기면 점점 긴 간격으로 다시 띄운다 (장부는 샤드별 저널에서 복원).
+# - 워커가 게시하는 상태 행을 모아 계정별 / 전체 자산·노출을 보고, 전체 한도를 넘으면 모든 워커의 신규 매수를 멈춘다.
+# ---------------------------------------------------------------------
+MAIN_ACCOUNT = "main"      # UPBIT_ACCESS_KEY / UPBIT_SECRET_KEY 를 쓰는 기본 계정 이름
+SUPERVISE_INTERVAL = 1.0   # 프로세스 / 리스크 확인 주기(초)
+STATUS_INTERVAL = 1.0      # 워커 상태 게시 주기(초)
+HEARTBEAT_TIMEOUT = 60     # 하트비트가 이 시간(초) 넘게 없으면 멈춘 것으로 보고 재시작
+RESTART_MIN = 1.0          # 첫 재시작 대기(초) — 연속으로 죽으면 2배씩
+RESTART_MAX = 60.0         # 재시작 대기 상한(초)
+RESTART_RESET = 300        # 이 시간(초) 이상 정상 동작하면 재시작 대기를 처음 값으로
+READY_TIMEOUT = 120        # 워커를 띄우기 전 생산자의 첫 캔들 게시를 기다리는 최대 시간(초)
+RISK_REPORT = 600          # 전체 자산 현황 로그 주기(초)
+MAX_DRAWDOWN = float(os.getenv("SUPERVISOR_MAX_DRAWDOWN", "0.05"))  # 거래일 고점 대비 전체 자산 하락 한도 (0 이면 끔)
+MAX_EXPOSURE = float(os.getenv("SUPERVISOR_MAX_EXPOSURE", "0.9"))   # 전체 자산 대비 보유 평가액 상한 (0 이면 끔)
+
+
+def account_keys(account):
+    """계정 이름 -> (access, secret) — main 이 아니면 UPBIT_ACCESS_KEY_<이름> / UPBIT_SECRET_KEY_<이름>"""
+    suffix = "" if account == MAIN_ACCOUNT else f"_{account.upper()}"
+    return os.getenv(f"UPBIT_ACCESS_KEY{suffix}"), os.getenv(f"UPBIT_SECRET_KEY{suffix}")
+
+
+def parse_allocation(text):
+    """'[계정:]전략=배정' -> (계정, 전략, 배정)"""
+    account, _, rest = text.rpartition(":")
+    name, value = rest.split("=", 1)
+    return account or MAIN_ACCOUNT, name, float(value)
+
+
+def plan_shards(allocations, shards, tickers=None):
+    """계정마다 전략 종목을 합쳐 shards 개 묶음으로 나눈 워커 명세 목록
+
+    종목은 정렬 후 번갈아 배정하므로 종목 목록 / 샤드 수가 같으면 재시작해도 같은 묶음(같은 저널)이 된다.
+    한 종목을 다루는 전략들은 항상 같은 워커에 있어, 장부 수량 합과 실제 잔고 대조를 워커 안에서 할 수 있다.
+    """
+    by_account = {}
+    for account, name, allocation in allocations:
+        by_account.setdefault(account, []).append((name, allocation))
+    specs = []
+    for account, items in by_account.items():
+        owned = {name: strategies.make_strategy(name, allocation, tickers=tickers).tickers for name, allocation in items}
+        universe = sorted({t for ts in owned.values() for t in ts})
+        count = max(1, min(shards, len(universe)))
+        for index in range(count):
+            part = set(universe[index::count])
+            specs.append({
+                "account": account,
+                "index": index,
+                "slot": len(specs),  # 게시판 상태 행 위치
+                "journal": f"shard.{account}.{index}of{count}",
+                "strategies": [
+                    {"name": name, "allocation": allocation, "tickers": [t for t in owned[name] if t in part],
+                     "share": sum(t in part for t in owned[name]) / len(owned[name])}
+                    for name, allocation in items if any(t in part for t in owned[name])
+                ],
+            })
+    return specs
+
+
+def assign_capital(specs, balances):
+    """샤드별 전략 배정 금액(원): 1 이하면 가동 시 원화 잔고 대비 비율, 그보다 크면 원화 금액 — 각각 종목 수 비율만큼
+
+    저널에 장부가 남아 있는 전략은 복원되므로 건너뛰고(capital=None), 그 장부들의 현금은 나눌 잔고에서 뺀다.
+    (한 계정의 샤드들이 같은 원화를 나눠 쓰므로 워커가 각자 잔고를 읽어 배정하면 겹친다)
+    """
+    for account, balance in balances.items():
+        mine = [s for s in specs if s["account"] == account]
+        saved = {s["journal"]: state_journal.StateJournal(s["journal"]).read() for s in mine}
+        claimed = sum(v["cash"] for data in saved.values() for k, v in data.items() if k.endswith(".book"))
+        krw = balance - claimed
+        total = 0.0
+        for spec in mine:
+            for item in spec["strategies"]:
+                if f"{item['name']}.book" in saved[spec["journal"]]:
+                    item["capital"] = None
+                    continue
+                allocation = item["allocation"]
+                item["capital"] = (allocation * krw if allocation <= 1 else allocation) * item["share"]
+                total += item["capital"]
+        if total > krw * 1.0001:
+            raise ValueError(f"{account}: 배정 자금 합계 {total:,.0f}원이 원화 잔고 {krw:,.0f}원보다 큽니다")
+        logging.info(f"[Supervisor] {account} 원화 {balance:,.0f}원 (복원 장부 현금 {claimed:,.0f}원), 신규 배정 {total:,.0f}원")
+
+
+def krw_balances(accounts):
+    """계정별 가동 시 원화 잔고"""
+    balances = {}
+    for account in accounts:
+        access, secret = account_keys(account)
+        if not access or not secret:
+            raise ValueError(f"{account} 계정 API 키가 없습니다")
+        balances[account] = float(pyupbit.Upbit(access, secret).get_balance("KRW") or 0.0)
+    return balances
+
+
+def market_plan(specs):
+    """생산자가 게시할 (종목 목록, {봉 간격: 보관 수}, {(종목, 봉 간격): 개수}) — 전 워커 구독의 합"""
+    tickers, subscriptions = set(), {}
+    for spec in specs:
+        for item in spec["strategies"]:
+            s = strategies.make_strategy(item["name"], 0.0, tickers=item["tickers"])
+            tickers.update(s.tickers, s.extra_tickers)
+            for ticker, interval, count in s.subscriptions():
+                tickers.add(ticker)
+                subscriptions[(ticker, interval)] = max(subscriptions.get((ticker, interval), 0), count)
+    intervals = {}
+    for (_, interval), count in subscriptions.items():
+        intervals[interval] = max(intervals.get(interval, 0), count)
+    return sorted(tickers), intervals, subscriptions
+
+
+class RiskView:
+    """워커 상태 행을 모은 계정별 / 전체 자산 현황과 전역 한도 판정"""
+
+    KEYS = ("capital", "equity", "cash", "invested", "realized", "trades", "positions")
+
+    def __init__(self, max_drawdown=MAX_DRAWDOWN, max_exposure=MAX_EXPOSURE):
+        self.max_drawdown = max_drawdown
+        self.max_exposure = max_exposure
+        self.accounts = {}
+        self.total = dict.fromkeys(self.KEYS, 0.0)
+        self.peak = None
+        self.session = None
+        self.stopped_session = None  # 손실 한도로 매수를 멈춘 거래일 (다음 거래일 9시에 풀림)
+        self.reason = None
+
+    def update(self, specs, statuses):
+        """매수를 멈춰야 하면 사유, 아니면 None (모든 워커가 한 번씩 게시하기 전에는 이전 판정 유지)"""
+        accounts = {}
+        for spec, status in zip(specs, statuses):
+            row = accounts.setdefault(spec["account"], dict.fromkeys(self.KEYS, 0.0))
+            if status is not None:
+                for k in self.KEYS:
+                    row[k] += status[k]
+        self.accounts = accounts
+        self.total = {k: sum(row[k] for row in accounts.values()) for k in self.KEYS}
+        equity = self.total["equity"]
+        if any(status is None for status in statuses) or equity <= 0:
+            return self.reason
+
+        session = state_journal.session_date()
+        if session != self.session:
+            self.session, self.peak = session, equity
+        self.peak = max(self.peak, equity)
+        drawdown = 1 - equity / self.peak
+        exposure = self.total["invested"] / equity
+        self.total.update(drawdown=drawdown, exposure=exposure)
+        if self.max_drawdown and drawdown >= self.max_drawdown:
+            self.stopped_session = session
+        if self.stopped_session == session:
+            self.reason = (f"거래일 손실 한도 {self.max_drawdown * 100:.1f}% 도달 - 다음 거래일까지 "
+                           f"(고점 {self.peak:,.0f}원, 현재 -{drawdown * 100:.2f}%)")
+        elif self.max_exposure and exposure >= self.max_exposure:
+            self.reason = f"보유 비중 {exposure * 100:.1f}% (한도 {self.max_exposure * 100:.0f}%)"
+        else:
+            self.reason = None
+        return self.reason
+
+    def report(self):
+        lines = []
+        for account, row in list(self.accounts.items()) + [("전체", self.total)]:
+            ret = (row["equity"] / row["capital"] - 1) * 100 if row["capital"] else 0.0
+            lines.append(f"{account}: {row['equity']:,.0f}원 ({ret:+.2f}%) | 현금 {row['cash']:,.0f} | 보유 {row['invested']:,.0f} "
+                         f"({row['positions']:.0f}종목) | 실현 {row['realized']:+,.0f} | 거래 {row['trades']:.0f}")
+        if "drawdown" in self.total:
+            lines.append(f"고점 대비 -{self.total['drawdown'] * 100:.2f}% | 보유 비중 {self.total['exposure'] * 100:.1f}%")
+        return "\n".join(lines)
+
+
+class _Child:
+    """감시하는 자식 프로세스 하나 — 죽거나 하트비트가 끊기면 점점 긴 간격으로 다시 띄운다"""
+
+    def __init__(self, name, target, args, beat):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.beat = beat  # 마지막 하트비트 시각을 돌려주는 함수 (게시판에서 읽음)
+        self.process = None
+        self.started = 0.0
+        self.delay = RESTART_MIN
+        self.restart_at = 0.0
+        self.restarts = 0
+
+    def start(self, ctx):
+        self.process = ctx.Process(target=self.target, args=self.args, name=self.name, daemon=True)
+        self.process.start()
+        self.started = time.time()
+        logging.info(f"[Supervisor] {self.name} 시작 (pid {self.process.pid})")
+
+    def poll(self, ctx, now):
+        """상태 확인 후 필요하면 (대기 시간이 지난 뒤) 재시작 — 이번에 중단을 발견했으면 알림 문구"""
+        p = self.process
+        if p is None:
+            if now >= self.restart_at:
+                self.start(ctx)
+            return None
+        if p.is_alive():
+            if now - max(self.beat() or 0.0, self.started) <= HEARTBEAT_TIMEOUT:
+                if now - self.started >= RESTART_RESET:
+                    self.delay = RESTART_MIN
+                return None
+            reason = f"하트비트 {HEARTBEAT_TIMEOUT}초 없음"
+            self.stop()
+        else:
+            reason = f"종료 코드 {p.exitcode}"
+        self.process = None
+        self.restarts += 1
+        self.restart_at = now + self.delay
+        message = f"{self.name} 중단 ({reason}) - {self.delay:.0f}초 뒤 재시작 (누적 {self.restarts}회)"
+        self.delay = min(self.delay * 2, RESTART_MAX)
+        return message
+
+    def stop(self, timeout=10):
+        """Ctrl+C 와 같은 SIGINT 로 정리(저널 기록)할 시간을 주고, 그래도 남아 있으면 강제 종료"""
+        p = self.process
+        if p is None or not p.is_alive():
+            return
+        os.kill(p.pid, signal.SIGINT)
+        p.join(timeout)
+        if p.is_alive():
+            p.terminate()
+            p.join(timeout)
+
+
+def _setup_logging(name):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(f"{name}_trading.log", encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def _run_producer(meta, subscriptions, source, parent):
+    """생산자 프로세스: 전 종목 시세 / 구독 캔들을 게시판에 게시 (슈퍼바이저가 사라지면 종료)"""
+    _setup_logging("producer")
+    load_dotenv()
+    rate_limiter.install()
+    board = shared_market.MarketBoard.attach(meta)
+    try:
+        shared_market.MarketProducer(board, subscriptions, source=source).run(alive=lambda: os.getppid() == parent)
+    except KeyboardInterrupt:
+        logging.info("[Producer] 종료")
+
+
+def _run_worker(spec, meta, parent):
+    """샤드 워커 프로세스: 담당 종목만 맡은 StrategyEngine (시세 / 캔들은 게시판에서 읽음)"""
+    name = f"shard_{spec['account']}_{spec['index']}"
+    _setup_logging(name)
+    load_dotenv()
+    account = spec["account"]
+    rate_limiter.install(rate_limiter.RequestScheduler(account=None if account == MAIN_ACCOUNT else account))
+    board = shared_market.MarketBoard.attach(meta)
+    # 캔들은 게시판에서 읽는다 (워커는 시세 / 캔들을 직접 조회하지 않음)
+    cache = candle_cache._default_cache
+    cache.fetch, cache.store = board.get_ohlcv, None
+
+    telegram = notifier.TelegramNotifier(os.getenv("TELEGRAM_TOKEN"), os.getenv("TELEGRAM_CHAT_ID"),
+                                         prefix=f"🧩 [{account}#{spec['index']}]\n")
+    engine = strategy_engine.StrategyEngine(
+        pyupbit.Upbit(*account_keys(account)),
+        [strategies.make_strategy(item["name"], item["capital"] or 0.0, tickers=item["tickers"])
+         for item in spec["strategies"]],
+        feed=shared_market.SharedQuoteFeed(board),
+        notifier=telegram.send,
+        journal=state_journal.StateJournal(spec["journal"]),  # 재시작 시 샤드 장부 / 전략 상태 복원
+        trades=spec["journal"],                               # journal/<샤드>.<전략>/ 거래 기록
+        buy_gate=lambda strategy, ticker, krw: not board.halted,
+    )
+    engine.add_job(lambda: _publish_status(engine, board, spec["slot"], parent), STATUS_INTERVAL, name="status")
+    metrics.start(summary_path=f"{name}_metrics.json", port=None)
+    engine.run()
+
+
+def _publish_status(engine, board, slot, parent):
+    """워커 상태 행 게시 (하트비트 겸용) — 슈퍼바이저가 사라졌으면 엔진 종료"""
+    if os.getppid() != parent:
+        logging.error("[Shard] 슈퍼바이저 종료 감지 - 워커 종료")
+        engine.core.stop()
+        return
+    snapshot = engine.snapshot
+    books = [s.book for s in engine.strategies if s.book is not None]
+    equity = sum(b.equity(snapshot) for b in books)
+    cash = sum(b.cash for b in books)
+    board.publish_status(
+        slot, pid=os.getpid(), beat=time.time(), capital=sum(b.capital for b in books), equity=equity, cash=cash,
+        invested=equity - cash, realized=sum(b.realized for b in books), trades=sum(b.trades for b in books),
+        positions=sum(len(b.positions) for b in books), errors=engine.core.stats["errors"],
+    )
+
+
+class Supervisor:
+    """생산자 1개 + 샤드 워커들을 띄우고 감시 (재시작 / 전역 리스크)"""
+
+    def __init__(self, board, specs, subscriptions, source="trade", notifier=None, risk=None):
+        self.board = board
+        self.specs = specs
+        self.notifier = notifier
+        self.risk = risk or RiskView()
+        self.ctx = multiprocessing.get_context("spawn")  # 스레드를 가진 부모를 fork 하지 않는다
+        parent = os.getpid()
+        self.producer = _Child("producer", _run_producer, (board.meta, subscriptions, source, parent),
+                               lambda: board.producer_beat)
+        self.workers = [
+            _Child(f"{s['account']}#{s['index']}", _run_worker, (s, board.meta, parent),
+                   lambda slot=s["slot"]: (board.status(slot) or {}).get("beat"))
+            for s in specs
+        ]
+        self._reported = time.time()
+
+    def notify(self, message):
+        logging.info(f"[Notify] {message}")
+        if self.notifier is not None:
+            self.notifier(message)
+
+    def start(self):
+        self.producer.start(self.ctx)
+        deadline = time.time() + READY_TIMEOUT
+        while not self.board.ready and time.time() < deadline and self.producer.process.is_alive():
+            time.sleep(0.2)
+        if not self.board.ready:
+            logging.warning("[Supervisor] 생산자 첫 게시 전에 워커 시작 (캔들은 게시되는 대로 반영)")
+        for worker in self.workers:
+            worker.start(self.ctx)
+        self.notify(f"🚀 가동: 워커 {len(self.workers)}개, 종목 {len(self.board.tickers)}개\n"
+                    + "\n".join(f"{w.name}: " + ", ".join(f"{i['name']}({len(i['tickers'])})" for i in s["strategies"])
+                                for w, s in zip(self.workers, self.specs)))
+
+    def check(self):
+        now = time.time()
+        for child in [self.producer] + self.workers:
+            message = child.poll(self.ctx, now)
+            if message:
+                logging.error(f"[Supervisor] {message}")
+                self.notify(f"⚠️ {message}")
+        self.check_risk(now)
+
+    def check_risk(self, now):
+        reason = self.risk.update(self.specs, [self.board.status(s["slot"]) for s in self.specs])
+        if (reason is not None) != self.board.halted:
+            self.board.halt(reason is not None)
+            self.notify(f"⛔ 전체 신규 매수 중지: {reason}\n{self.risk.report()}" if reason
+                        else f"✅ 신규 매수 재개\n{self.risk.report()}")
+        if now - self._reported >= RISK_REPORT:
+            self._reported = now
+            logging.info(f"[Supervisor]\n{self.risk.report()}")
+
+    def stop(self):
+        for child in self.workers + [self.producer]:
+            child.stop()
+
+    def run(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(SUPERVISE_INTERVAL)
+                self.check()
+        except KeyboardInterrupt:
+            logging.info("[Supervisor] 종료")
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    _setup_logging("supervisor")
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="멀티 프로세스 슈퍼바이저 (종목 / 계정 샤딩, 공유 메모리 시세)")
+    parser.add_argument("allocations", nargs="+", type=parse_allocation,
+                        help="[계정:]전략=배정 (예: bot4=0.5 sub:bot2=0.3 — sub 계정 키는 UPBIT_ACCESS_KEY_SUB / UPBIT_SECRET_KEY_SUB)")
+    parser.add_argument("--shards", type=int, help="계정별 워커 수 (기본: 생산자 몫 1개를 뺀 코어 수를 계정 수로 나눈 값)")
+    parser.add_argument("--tickers", nargs="+", help="전 전략 담당 종목 (기본: 전략별 기본 종목)")
+    parser.add_argument("--source", choices=["trade", "ask"], default="trade", help="시세 기준 (체결가 / 최우선 매도호가)")
+    args = parser.parse_args()
+
+    accounts = list(dict.fromkeys(account for account, _, _ in args.allocations))
+    shards = args.shards or max(1, ((os.cpu_count() or 2) - 1) // len(accounts))
+    rate_limiter.install()
+    specs = plan_shards(args.allocations, shards, args.tickers)
+    assign_capital(specs, krw_balances(accounts))
+    tickers, intervals, subscriptions = market_plan(specs)
+    board = shared_market.MarketBoard(tickers, intervals, slots=len(specs))
+    telegram = notifier.TelegramNotifier(os.getenv("TELEGRAM_TOKEN"), os.getenv("TELEGRAM_CHAT_ID"), prefix="🛡️ [Supervisor]\n")
+    try:
+        Supervisor(board, specs, subscriptions, source=args.source, notifier=telegram.send).run()
+    finally:
+        board.close()
@@ -0,0 +1,188 @@
+import os
+import csv
+import time
+import random
+import argparse
+import itertools
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import backtest_engine as engine
+import shm_util
+
+# ---------------------------------------------------------------------
+# 전략 파라미터 스윕 (그리드 / 랜덤 탐색)
+# 캔들 배열은 공유 메모리에 한 번만 올리고, 워커 프로세스는 복사 없이 NumPy 뷰로 읽는다.
+# 파라미터와 무관한 지표(RSI, 볼밴 등)는 워커마다 한 번만 계산된다. (backtest_engine.feature)
+# ---------------------------------------------------------------------
+COLUMNS = ("ts", "open", "high", "low", "close")
+SORT_KEYS = {
+    "return": lambda r: -r['return_pct'],
+    "mdd": lambda r: r['mdd_pct'],
+    "trades": lambda r: -r['trades'],
+}
+
+_worker = {}  # 워커 프로세스 전역 상태 (전략 이름, 데이터 뷰, 공유 메모리 핸들)
+
+
+class SharedCandles:
+    """{ticker: 배열 dict} 를 공유 메모리로 옮기고 워커에 넘길 메타데이터를 만든다"""
+
+    def __init__(self, datasets):
+        self.blocks = []
+        self.meta = {}
+        for ticker, data in datasets.items():
+            self.meta[ticker] = {}
+            for col in COLUMNS:
+                arr = np.ascontiguousarray(data[col])
+                shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+                self.blocks.append(shm)
+                self.meta[ticker][col] = (shm.name, arr.shape, arr.dtype.str)
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+
+def _init_worker(strategy_name, meta, ref_ticker, targets):
+    handles, datasets = [], {}
+    for ticker, cols in meta.items():
+        data = {}
+        for col, (name, shape, dtype) in cols.items():
+            shm = shm_util.attach(name)
+            handles.append(shm)
+            data[col] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        datasets[ticker] = data
+    _worker.update(strategy=strategy_name, handles=handles,
+                   datasets={t: datasets[t] for t in targets},
+                   ref=datasets.get(ref_ticker) if ref_ticker else None)
+
+
+def _evaluate(batch):
+    """워커: 파라미터 묶음을 전 종목에 돌려 요약 행 목록 반환"""
+    rows = []
+    for params in batch:
+        strategy = engine.make_strategy(_worker['strategy'], **params)
+        summaries = [engine.run_backtest(strategy, data, ref=_worker['ref'], ticker=t).summary()
+                     for t, data in _worker['datasets'].items()]
+        rows.append({
+            **params,
+            "return_pct": float(np.mean([s['return_pct'] for s in summaries])),
+            "mdd_pct": float(max(s['mdd_pct'] for s in summaries)),
+            "trades": int(sum(s['trades'] for s in summaries)),
+            "win_rate": float(np.mean([s['win_rate'] for s in summaries])),
+        })
+    return rows
+
+
+def parse_space(text):
+    """'name=a:b:step' (범위) 또는 'name=v1,v2,...' (목록) -> (name, 값 목록 또는 (lo, hi))"""
+    name, spec = text.split("=", 1)
+    if ":" in spec:
+        lo, hi, *step = (float(x) for x in spec.split(":"))
+        if step:
+            return name, [float(v) for v in np.round(np.arange(lo, hi + step[0] / 2, step[0]), 10)]
+        return name, (lo, hi)
+    return name, [float(x) for x in spec.split(",")]
+
+
+def grid(space):
+    names = list(space)
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"그리드 탐색에는 간격이 필요합니다: {name}=lo:hi:step")
+    for combo in itertools.product(*(space[n] for n in names)):
+        yield dict(zip(names, combo))
+
+
+def random_search(space, count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield {name: (rng.uniform(*values) if isinstance(values, tuple) else rng.choice(values))
+               for name, values in space.items()}
+
+
+def run_sweep(strategy_name, datasets, combos, ref_ticker=None, targets=None, workers=None,
+              batch_size=None, sort="return"):
+    """파라미터 조합 목록을 프로세스 풀로 평가해 정렬된 결과 반환
+
+    targets: 결과를 집계할 종목 (기본: datasets 전체, 기준 종목만 필요한 경우 제외 가능)
+    """
+    combos = list(combos)
+    targets = list(targets or datasets)
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or max(1, len(combos) // (workers * 8))
+    batches = [combos[i:i + batch_size] for i in range(0, len(combos), batch_size)]
+
+    shared = SharedCandles(datasets)
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(strategy_name, shared.meta, ref_ticker, targets)) as pool:
+            for future in as_completed([pool.submit(_evaluate, b) for b in batches]):
+                rows.extend(future.result())
+    finally:
+        shared.close()
+
+    keys = [SORT_KEYS[k] for k in sort.split(",")]
+    rows.sort(key=lambda r: tuple(k(r) for k in keys))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전략 파라미터 스윕")
+    parser.add_argument("--strategy", required=True, choices=list(engine.STRATEGIES))
+    parser.add_argument("--tickers", nargs="+", default=["KRW-ETH"])
+    parser.add_argument("--interval", help="봉 간격 (기본: 전략별 설정)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--space", type=parse_space, action="append", required=True,
+                        help="탐색 범위 (예: --space survivor_goal=0.008:0.02:0.002 --space strict_sl=-0.05,-0.03)")
+    parser.add_argument("--random", type=int, default=0, help="랜덤 탐색 횟수 (0 이면 그리드 탐색)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--sort", default="return", help="정렬 기준: return, mdd, trades (쉼표로 여러 개)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="전체 결과 CSV 저장 경로")
+    args = parser.parse_args()
+
+    strategy_cls = engine.STRATEGIES[args.strategy]
+    space = dict(args.space)
+    engine.make_strategy(args.strategy, **{n: 0 for n in space})  # 파라미터 이름 검증
+    interval = args.interval or strategy_cls.interval
+    count = args.days * 1440 // engine.interval_minutes(interval)
+
+    t0 = time.perf_counter()
+    tickers = list(args.tickers)
+    ref_ticker = None
+    if strategy_cls.needs_ref:
+        ref_ticker = "KRW-BTC"
+        if ref_ticker not in tickers:
+            tickers.append(ref_ticker)
+    datasets = {t: engine.load_candles(t, interval, count) for t in tickers}
+    combos = list(random_search(space, args.random, args.seed) if args.random else grid(space))
+    t1 = time.perf_counter()
+
+    # 기준 종목만 필요한 경우(bot4 의 BTC)는 결과 집계에서 제외
+    rows = run_sweep(args.strategy, datasets, combos, ref_ticker=ref_ticker, targets=args.tickers,
+                     workers=args.workers, sort=args.sort)
+    t2 = time.perf_counter()
+
+    names = list(space)
+    print(" | ".join(f"{n:>14}" for n in names) + f" | {'Return(%)':>10} | {'MDD(%)':>8} | {'Trades':>6}")
+    for row in rows[:args.top]:
+        print(" | ".join(f"{row[n]:>14.4f}" for n in names) +
+              f" | {row['return_pct']:>10.2f} | {row['mdd_pct']:>8.2f} | {row['trades']:>6}")
+    print(f"\n{len(combos)} combinations | load {t1 - t0:.1f}s | sweep {t2 - t1:.1f}s")
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=names + ["return_pct", "mdd_pct", "trades", "win_rate"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import os
+import sys
+import glob
+import gzip
+import time
+import atexit
+import logging
+import argparse
+import datetime
+import threading
+import numpy as np
+
+# ---------------------------------------------------------------------
+# 거래 / 판단 기록 (고정 길이 이진 레코드)
+#   journal/<봇>/<YYYYMMDD>.trades   주문 / 체결 / 09:00 정산
+#   journal/<봇>/<YYYYMMDD>.signals  신호 판단 (틱마다 종목별 매수/매도/관망 + 지표값)
+# - 판단 기록은 메모리 버퍼에 모았다가 FLUSH_EVERY 개 또는 FLUSH_INTERVAL 초마다 한 번에 덧붙이고,
+#   주문 / 체결 / 정산은 드물고 중요하므로 바로 기록한다.
+# - 파일은 거래일(09:00 KST) 단위로 나뉘고, 지난 거래일 파일은 백그라운드에서 .gz 로 압축한다.
+# - 읽기는 압축 해제 + np.frombuffer 뿐이라 수개월치 체결도 수십 ms 안에 집계된다.
+#   (텍스트 로그를 정규식으로 긁어 손익을 계산하던 방식 대체)
+# - 시각은 time.time() 기준 (모의 거래소의 가상 시계를 그대로 따름)
+# ---------------------------------------------------------------------
+JOURNAL_DIR = os.getenv("TRADE_JOURNAL_DIR", "journal")
+FLUSH_EVERY = 4096       # 판단 기록이 이만큼 쌓이면 바로 기록
+FLUSH_INTERVAL = 5.0     # 마지막 기록 후 이 시간(초)이 지나면 기록
+
+# 레코드 종류 / 매매 방향
+ORDER, FILL, SETTLE = 1, 2, 3
+KINDS = {ORDER: "order", FILL: "fill", SETTLE: "settle"}
+BUY, SELL, NONE = 1, -1, 0
+SIDES = {"bid": BUY, "buy": BUY, "ask": SELL, "sell": SELL}
+DECISIONS = {"hold": 0, "buy": 1, "sell": -1, "skip": 2}
+
+TRADE_DTYPE = np.dtype([
+    ("ts", "<f8"), ("kind", "u1"), ("side", "i1"), ("ticker", "S16"),
+    ("price", "<f8"), ("volume", "<f8"), ("funds", "<f8"), ("fee", "<f8"),
+    ("equity", "<f8"),   # 정산 레코드: 총자산
+    ("reason", "S16"), ("uuid", "S36"),
+])
+SIGNAL_DTYPE = np.dtype([
+    ("ts", "<f8"), ("ticker", "S16"), ("decision", "i1"), ("price", "<f8"),
+    ("value", "<f4"), ("ref", "<f4"),   # 판단에 쓴 주 지표 / 비교 기준 (봇마다 다름, 예: RSI / 밴드 하단)
+    ("reason", "S16"),
+])
+STREAMS = {"trades": TRADE_DTYPE, "signals": SIGNAL_DTYPE}
+NAN = float("nan")
+
+
+def _session(ts):
+    """epoch -> 거래일 (YYYYMMDD) — 09:00 KST 시작 = UTC 날짜와 같다"""
+    return (datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=ts)).strftime("%Y%m%d")
+
+
+class _Stream:
+    """레코드 종류 하나의 버퍼(미리 잡아 둔 레코드 배열) + 거래일별 파일"""
+
+    def __init__(self, root, name, dtype, capacity):
+        self.root = root
+        self.name = name
+        self.buf = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+        self.written = 0
+        self.session = None
+        self.file = None  # 현재 거래일 파일 (추가 모드로 열어 둠)
+
+    def append(self, row):
+        """레코드 1건 추가 — 버퍼가 가득 차면 True"""
+        self.buf[self.size] = row
+        self.size += 1
+        return self.size >= len(self.buf)
+
+    def flush(self):
+        if not self.size:
+            return []
+        data, self.size = self.buf[:self.size], 0
+        # 버퍼가 거래일 경계를 넘었으면 나눠서 각 날짜 파일에 기록
+        sessions = [_session(ts) for ts in (data["ts"][0], data["ts"][-1])]
+        rotated = []
+        if sessions[0] == sessions[1]:
+            chunks = [(sessions[0], data)]
+        else:
+            keys = np.array([_session(ts) for ts in data["ts"]])
+            chunks = [(s, data[keys == s]) for s in dict.fromkeys(keys)]
+        for session, chunk in chunks:
+            if session != self.session:
+                if self.file is not None:
+                    self.file.close()
+                    rotated.append(self.path(self.session))
+                os.makedirs(self.root, exist_ok=True)
+                self.file = open(self.path(session), "ab", buffering=0)
+                self.session = session
+            self.file.write(chunk)  # 버퍼를 복사 없이 그대로 기록
+            self.written += len(chunk)
+        return rotated
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.session = None
+
+    def path(self, session):
+        return os.path.join(self.root, f"{session}.{self.name}")
+
+
+class TradeJournal:
+    """봇 하나의 거래 / 판단 기록
+
+    trades = TradeJournal("bot4")
+    trades.signal(ticker, "buy", price, value=rsi, ref=lower_band)
+    trades.fill(tracker.wait(account.buy_market_order(...)), reason="entry")
+    trades.order(ticker, "ask", account.sell_market_order(...), reason="tp", tracker=tracker)  # 체결은 백그라운드 기록
+    trades.settle(equity, reason="daily")
+    """
+
+    def __init__(self, name, root=None, flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL):
+        self.name = name
+        self.root = os.path.abspath(os.path.join(root or JOURNAL_DIR, name))
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._streams = {s: _Stream(self.root, s, dtype, flush_every) for s, dtype in STREAMS.items()}
+        self._lock = threading.Lock()
+        self._flushed_at = time.time()
+        self._closed = False
+        # 지난번 실행에서 압축하지 못하고 남은 지난 거래일 파일 정리
+        today = _session(time.time())
+        os.makedirs(self.root, exist_ok=True)
+        stale = [p for s in STREAMS for p in glob.glob(os.path.join(self.root, f"*.{s}"))
+                 if os.path.basename(p).split(".")[0] < today]
+        if stale:
+            self._compress_later(stale)
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # 기록
+    # ------------------------------------------------------------------
+    def signal(self, ticker, decision, price, value=NAN, ref=NAN, reason="", ts=None):
+        """신호 판단 1건 (decision: "hold" / "buy" / "sell" / "skip")"""
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                return
+            full = self._streams["signals"].append((ts or now, ticker, DECISIONS[decision], price or NAN,
+                                                    NAN if value is None else value, NAN if ref is None else ref, reason))
+            due = full or now - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def order(self, ticker, side, response, reason="", price=NAN, volume=NAN, funds=NAN, tracker=None):
+        """주문 1건. tracker(OrderTracker)를 주면 체결을 백그라운드에서 기다려 fill 로 기록"""
+        uuid = response.get("uuid", "") if isinstance(response, dict) else ""
+        self._add((time.time(), ORDER, SIDES.get(side, NONE), ticker, price, volume, funds, 0.0, NAN, reason, uuid or ""))
+        if tracker is not None and uuid:
+            tracker.track(response, lambda fill: self.fill(fill, reason=reason, ticker=ticker))
+
+    def fill(self, fill, reason="", ticker=None):
+        """체결 1건 (order_tracker 체결 요약 dict). 체결량이 없으면 기록하지 않음"""
+        if not fill or not fill.get("volume"):
+            return
+        self._add((time.time(), FILL, SIDES.get(fill.get("side"), NONE), fill.get("ticker") or ticker or "",
+                   fill["avg_price"], fill["volume"], fill["funds"], fill["fee"], NAN, reason, fill.get("uuid") or ""))
+
+    def settle(self, equity, reason="daily"):
+        """09:00 정산 (총자산)"""
+        self._add((time.time(), SETTLE, NONE, "", NAN, NAN, NAN, 0.0, equity, reason, ""))
+
+    def _add(self, row):
+        """주문 / 체결 / 정산 레코드는 쌓아 둔 판단 기록과 함께 바로 기록"""
+        with self._lock:
+            if self._closed:
+                return
+            self._streams["trades"].append(row)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            rotated = []
+            for stream in self._streams.values():
+                try:
+                    rotated += stream.flush()
+                except Exception as e:
+                    logging.error(f"[TradeJournal] {self.name} {stream.name} 기록 실패: {e}")
+            self._flushed_at = time.time()
+        if rotated:
+            self._compress_later(rotated)
+
+    def close(self):
+        if not self._closed:
+            self.flush()
+            with self._lock:
+                self._closed = True
+                for stream in self._streams.values():
+                    stream.close()
+
+    def _compress_later(self, paths):
+        threading.Thread(target=_compress, args=(paths,), name="journal-gzip", daemon=True).start()
+
+
+def _compress(paths):
+    for path in paths:
+        try:
+            with open(path, "rb") as src, gzip.open(path + ".gz.tmp", "wb", compresslevel=6) as dst:
+                dst.write(src.read())
+            os.replace(path + ".gz.tmp", path + ".gz")
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"[TradeJournal] 압축 실패 ({path}): {e}")
+
+
+# ---------------------------------------------------------------------
+# 조회 / 집계
+# ---------------------------------------------------------------------
+def load(name, stream="trades", start=None, end=None, root=None):
+    """거래일 [start, end] (YYYYMMDD 또는 date) 레코드를 시각 순 배열로"""
+    dtype = STREAMS[stream]
+    folder = os.path.join(root or JOURNAL_DIR, name)
+    start, end = (d.strftime("%Y%m%d") if isinstance(d, datetime.date) else d for d in (start, end))
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(folder, f"*.{stream}")) + glob.glob(os.path.join(folder, f"*.{stream}.gz"))):
+        session = os.path.basename(path).split(".")[0]
+        if (start and session < start) or (end and session > end):
+            continue
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                raw = f.read()
+        else:
+            with open(path, "rb") as f:
+                raw = f.read()
+        # 쓰는 도중 읽었으면 마지막 불완전 레코드는 버린다
+        raw = raw[:len(raw) - len(raw) % dtype.itemsize]
+        chunks.append(np.frombuffer(raw, dtype=dtype))
+    if not chunks:
+        return np.empty(0, dtype=dtype)
+    data = np.concatenate(chunks)
+    return data[np.argsort(data["ts"], kind="stable")]
+
+
+def session_ids(ts):
+    """epoch -> 거래일 번호 (09:00 KST = 00:00 UTC 시작)"""
+    return np.floor(ts / 86400).astype(np.int64)
+
+
+def daily_report(trades):
+    """거래일별 {date, buys, sells, wins, pnl, fees, equity} — 평균 단가 기준 실현 손익
+
+    equity 는 그 거래일 09:00 정산 때 기록한 총자산 (= 전날 마감 / 당일 시작 자산)
+
+    체결은 보통 하루 수십 건이라 종목별 평균 단가 추적만 순서대로 하고, 나머지는 배열 연산으로 집계
+    """
+    fills = trades[trades["kind"] == FILL]
+    pnl = np.zeros(len(fills))
+    positions = {}  # ticker -> [수량, 원가(수수료 포함)]
+    for i, (side, ticker, volume, funds, fee) in enumerate(
+            zip(fills["side"].tolist(), fills["ticker"].tolist(), fills["volume"].tolist(),
+                fills["funds"].tolist(), fills["fee"].tolist())):
+        qty, cost = positions.get(ticker, (0.0, 0.0))
+        if side == BUY:
+            positions[ticker] = (qty + volume, cost + funds + fee)
+        elif side == SELL and qty > 0:
+            sold = min(volume, qty)
+            basis = cost * sold / qty
+            pnl[i] = funds - fee - basis
+            positions[ticker] = (qty - sold, cost - basis)
+
+    settles = trades[trades["kind"] == SETTLE]
+    days = np.union1d(session_ids(fills["ts"]), session_ids(settles["ts"]))
+    if not len(days):
+        return []
+    fill_day = np.searchsorted(days, session_ids(fills["ts"]))
+    sells = fills["side"] == SELL
+    n = len(days)
+    count = lambda mask: np.bincount(fill_day[mask], minlength=n)
+    buys, sold, wins = count(fills["side"] == BUY), count(sells), count(sells & (pnl > 0))
+    day_pnl = np.bincount(fill_day, weights=pnl, minlength=n)
+    fees = np.bincount(fill_day, weights=fills["fee"], minlength=n)
+    equity = np.full(n, np.nan)
+    equity[np.searchsorted(days, session_ids(settles["ts"]))] = settles["equity"]  # 같은 날이면 마지막 정산
+
+    epoch = datetime.date(1970, 1, 1)
+    return [{"date": epoch + datetime.timedelta(days=int(d)), "buys": int(buys[i]), "sells": int(sold[i]),
+             "wins": int(wins[i]), "pnl": float(day_pnl[i]), "fees": float(fees[i]), "equity": float(equity[i])}
+            for i, d in enumerate(days)]
+
+
+def summary(report):
+    sells = sum(r["sells"] for r in report)
+    return {
+        "days": len(report),
+        "trades": sells,
+        "win_rate": sum(r["wins"] for r in report) / sells if sells else 0.0,
+        "pnl": sum(r["pnl"] for r in report),
+        "fees": sum(r["fees"] for r in report),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="거래 기록 집계 (거래일별 실현 손익 / 승률 / 수수료)")
+    parser.add_argument("bot", help="봇 이름 (journal/<이름>)")
+    parser.add_argument("--days", type=int, default=30, help="최근 N 거래일")
+    parser.add_argument("--start", help="시작 거래일 (YYYYMMDD)")
+    parser.add_argument("--end", help="끝 거래일 (YYYYMMDD)")
+    parser.add_argument("--dir", help="기록 위치 (기본 JOURNAL_DIR)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    start = args.start
+    if start is None:
+        start = _session(time.time() - (args.days - 1) * 86400)
+    trades = load(args.bot, "trades", start, args.end, root=args.dir)
+    report = daily_report(trades)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'Date':<10} | {'Buys':>5} | {'Sells':>5} | {'Win':>6} | {'PnL':>14} | {'Fees':>10} | {'Equity@09':>14}")
+    print("-" * 82)
+    for r in report:
+        win = f"{r['wins'] / r['sells'] * 100:.1f}%" if r["sells"] else "-"
+        equity = f"{r['equity']:,.0f}" if r["equity"] == r["equity"] else "-"
+        print(f"{r['date']:%Y-%m-%d} | {r['buys']:>5} | {r['sells']:>5} | {win:>6} | {r['pnl']:>+14,.0f} | "
+              f"{r['fees']:>10,.0f} | {equity:>14}")
+    s = summary(report)
+    print(f"\n{s['days']}일 | 매도 {s['trades']}건 | 승률 {s['win_rate'] * 100:.1f}% | 실현 손익 {s['pnl']:+,.0f}원 | "
+          f"수수료 {s['fees']:,.0f}원 | 레코드 {len(trades):,}건 집계 {elapsed * 1000:.0f}ms")
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])